@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Local stand-ins for the OpenAI, Stormglass and Google Maps APIs used by the benchmarks.
+Each service has its own latency (ms, with jitter) and error rate (share of requests answered
+with HTTP 500). Responses are shaped like the real ones, with just enough content for the app:
+
+    OpenAI      POST /v1/chat/completions  (plain and stream=true)
+    Stormglass  GET  /v2/weather/point
+    Google      GET  /maps/api/geocode/json, /maps/api/directions/json, /maps/api/distancematrix/json
+
+    python benchmarks/fake_apis.py --port 8765 --openai-latency-ms 300
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+SERVICES = ('openai', 'stormglass', 'google')
+DEFAULT_LATENCY_MS = {'openai': 300.0, 'stormglass': 150.0, 'google': 60.0}
+JITTER = 0.2  # Latencies are drawn uniformly within ±20% of the configured value
+FORECAST_REQUEST = re.compile(r"Generate a 7-day forecast starting from (\d{4}-\d{2}-\d{2})")
+STREAM_CHUNK_WORDS = 4
+GEOCODE_LOCATION = {'lat': 38.7223, 'lng': -9.1393}  # Every address geocodes to Lisbon
+
+class FakeAPIConfig:
+    """Latency and error rate per service, plus request counters; shared by the handler threads."""
+
+    def __init__(self, latency_ms: Optional[Dict[str, float]] = None, error_rate: Optional[Dict[str, float]] = None,
+                 seed: int = 0):
+        self.latency_ms = dict(DEFAULT_LATENCY_MS, **(latency_ms or {}))
+        self.error_rate = {service: 0.0 for service in SERVICES}
+        self.error_rate.update(error_rate or {})
+        self.requests = {service: 0 for service in SERVICES}
+        self.errors = {service: 0 for service in SERVICES}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def admit(self, service: str) -> bool:
+        """Count a request, wait for the service latency and tell whether it should fail."""
+        with self._lock:
+            self.requests[service] += 1
+            delay = self.latency_ms[service] * self._random.uniform(1 - JITTER, 1 + JITTER) / 1000
+            failed = self._random.random() < self.error_rate[service]
+            if failed:
+                self.errors[service] += 1
+        time.sleep(delay)
+        return not failed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'requests': dict(self.requests), 'errors': dict(self.errors)}
+
+def fake_forecast(start_date: str, seed: str) -> dict:
+    """7 days of GPT-style forecast, varying per spot so ratings differ."""
+    rng = random.Random(seed)
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    days = []
+    for i in range(7):
+        average = round(rng.uniform(0.5, 2.5), 1)
+        days.append({
+            'date': (start + timedelta(days=i)).strftime('%Y-%m-%d'),
+            'wave_height_m': {'min': round(average * 0.7, 1), 'max': round(average * 1.3, 1), 'average': average},
+            'wave_period_s': rng.randint(7, 14),
+            'wave_energy_kj_m2': rng.randint(50, 600),
+            'wind_speed_m_s': round(rng.uniform(1, 9), 1),
+            'wind_direction': rng.choice(['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']),
+            'tide_state': rng.choice(['low', 'rising', 'high', 'falling']),
+            'daily_rating': round(rng.uniform(3, 9), 1),
+        })
+    return {'forecast': days}
+
+def fake_stormglass_hours(start: int, lat: float, lon: float) -> list:
+    """Hourly Stormglass points for 7 days from start (unix time)."""
+    rng = random.Random(f"{lat},{lon}")
+    first_hour = datetime.fromtimestamp(start - start % 3600, tz=timezone.utc)
+    return [{
+        'time': (first_hour + timedelta(hours=h)).strftime('%Y-%m-%dT%H:%M:%S+00:00'),
+        'waveHeight': {'noaa': round(rng.uniform(0.6, 2.5), 2)},
+        'wavePeriod': {'noaa': round(rng.uniform(7, 14), 1)},
+        'waveDirection': {'noaa': round(rng.uniform(250, 320), 1)},
+        'windSpeed': {'noaa': round(rng.uniform(1, 9), 1)},
+        'windDirection': {'noaa': round(rng.uniform(0, 360), 1)},
+    } for h in range(7 * 24)]
+
+def fake_route_element(origin: str, destination: str) -> dict:
+    """Distance/duration of a fake drive: 1.3 × the straight line at 70 km/h."""
+    try:
+        (lat1, lon1), (lat2, lon2) = ([float(x) for x in point.split(',')] for point in (origin, destination))
+        km = 1.3 * 111 * ((lat1 - lat2) ** 2 + ((lon1 - lon2) * 0.78) ** 2) ** 0.5
+    except ValueError:
+        km = 50.0
+    return {'distance': {'value': int(km * 1000), 'text': f"{km:.0f} km"},
+            'duration': {'value': int(km / 70 * 3600), 'text': f"{km / 70 * 60:.0f} mins"},
+            'status': 'OK'}
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: FakeAPIConfig = None
+
+    def log_message(self, format, *args):  # Keep benchmark output readable
+        pass
+
+    def _send_json(self, payload: dict, status: int = 200) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, service: str) -> None:
+        self._send_json({'error': {'message': f"Simulated {service} failure", 'type': 'server_error'}}, status=500)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)) or 0)
+        if urlparse(self.path).path.rstrip('/') != '/v1/chat/completions':
+            return self._send_json({'error': 'not found'}, status=404)
+        if not self.config.admit('openai'):
+            return self._send_error('openai')
+        request = json.loads(body or b'{}')
+        prompt = "\n".join(str(message.get('content', '')) for message in request.get('messages', []))
+        match = FORECAST_REQUEST.search(prompt)
+        if match:
+            content = json.dumps(fake_forecast(match.group(1), prompt))
+        else:
+            content = ("Clean 1-1.5 m swell with light offshore wind in the morning; "
+                       "best around mid tide, getting choppy after the afternoon sea breeze.")
+        if request.get('stream'):
+            return self._stream_completion(request, content)
+        self._send_json({
+            'id': 'chatcmpl-bench', 'object': 'chat.completion', 'created': int(time.time()),
+            'model': request.get('model', 'gpt-4o'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(content) // 4,
+                      'total_tokens': (len(prompt) + len(content)) // 4},
+        })
+
+    def _stream_completion(self, request: dict, content: str) -> None:
+        """Server-sent events, a few words per chunk, then [DONE]; the connection is closed at the end."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        words = content.split(' ')
+        pieces = [' '.join(words[i:i + STREAM_CHUNK_WORDS]) + ' ' for i in range(0, len(words), STREAM_CHUNK_WORDS)]
+        for i, piece in enumerate(pieces + [None]):
+            chunk = {'id': 'chatcmpl-bench', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                     'model': request.get('model', 'gpt-4o'),
+                     'choices': [{'index': 0, 'delta': {'content': piece} if piece else {},
+                                  'finish_reason': None if piece else 'stop'}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path == '/v2/weather/point':
+            if not self.config.admit('stormglass'):
+                return self._send_error('stormglass')
+            start = int(float(query.get('start', time.time())))
+            return self._send_json({'hours': fake_stormglass_hours(start, float(query.get('lat', 0)),
+                                                                   float(query.get('lng', 0))),
+                                    'meta': {'dailyQuota': 10000, 'requestCount': 1}})
+        if url.path.startswith('/maps/api/'):
+            if not self.config.admit('google'):
+                return self._send_error('google')
+            if url.path == '/maps/api/geocode/json':
+                return self._send_json({'status': 'OK', 'results': [{
+                    'formatted_address': query.get('address', 'Lisbon, Portugal'),
+                    'geometry': {'location': GEOCODE_LOCATION, 'location_type': 'APPROXIMATE'},
+                    'place_id': 'bench-place', 'types': ['locality'],
+                    'address_components': [{'long_name': '1100-148', 'types': ['postal_code']}],
+                }]})
+            if url.path == '/maps/api/directions/json':
+                element = fake_route_element(query.get('origin', ''), query.get('destination', ''))
+                return self._send_json({'status': 'OK', 'routes': [{
+                    'summary': 'A1', 'legs': [dict(element, steps=[])], 'warnings': []}]})
+            if url.path == '/maps/api/distancematrix/json':
+                origins, destinations = query.get('origins', '').split('|'), query.get('destinations', '').split('|')
+                return self._send_json({'status': 'OK', 'origin_addresses': origins,
+                                        'destination_addresses': destinations,
+                                        'rows': [{'elements': [fake_route_element(o, d) for d in destinations]}
+                                                 for o in origins]})
+        self._send_json({'error': 'not found'}, status=404)
+
+def start_server(config: FakeAPIConfig, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """Serve the fake APIs from a daemon thread; port 0 picks a free port (server.server_port)."""
+    handler = type('BoundFakeAPIHandler', (FakeAPIHandler,), {'config': config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def base_urls(server: ThreadingHTTPServer) -> Dict[str, str]:
+    """Environment variables pointing the app at a running fake server."""
+    root = f"http://{server.server_address[0]}:{server.server_port}"
+    return {'OPENAI_BASE_URL': f"{root}/v1", 'STORMGLASS_BASE_URL': f"{root}/v2", 'GOOGLE_MAPS_BASE_URL': root}
+
+def add_service_arguments(parser: argparse.ArgumentParser) -> None:
+    for service in SERVICES:
+        parser.add_argument(f'--{service}-latency-ms', type=float, default=DEFAULT_LATENCY_MS[service],
+                            help=f"{service} latency (default: {DEFAULT_LATENCY_MS[service]:g})")
+        parser.add_argument(f'--{service}-error-rate', type=float, default=0.0,
+                            help=f"Share of {service} requests failing with HTTP 500 (default: 0)")
+
+def config_from_args(args: argparse.Namespace) -> FakeAPIConfig:
+    return FakeAPIConfig({service: getattr(args, f'{service}_latency_ms') for service in SERVICES},
+                         {service: getattr(args, f'{service}_error_rate') for service in SERVICES},
+                         seed=getattr(args, 'seed', 0))
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake OpenAI, Stormglass and Google Maps APIs.")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=0)
+    add_service_arguments(parser)
+    args = parser.parse_args()
+    server = start_server(config_from_args(args), port=args.port)
+    for name, value in base_urls(server).items():
+        print(f"export {name}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
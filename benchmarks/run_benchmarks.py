@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+End-to-end benchmarks of the forecast pipeline and the page rendering against local fake APIs
+(see fake_apis.py), at several catalog sizes. Each size runs in its own process with a fresh
+persistent cache, so the first load is cold and the next ones are served by the caches.
+
+    python benchmarks/run_benchmarks.py                          # 16, 200 and 2000 spots
+    python benchmarks/run_benchmarks.py --sizes 16,200 --openai-latency-ms 800 --openai-error-rate 0.05
+    python benchmarks/run_benchmarks.py --out bench.json --baseline previous.json
+
+Results are printed (and written with --out) as JSON: per function, the first (cold) call and
+min/median/max of the next (warm) ones. With --baseline, timings slower than the baseline by more
+than --tolerance are reported and the exit code is 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import fake_apis  # noqa: E402
+
+RESULTS_FORMAT_VERSION = 1
+DEFAULT_SIZES = (16, 200, 2000)
+TEMPLATE_CATALOG = os.path.join(REPO_DIR, "data", "lisbon_area_lean.json")
+CENTER = (38.7223, -9.1393)  # Lisbon, where fake_apis geocodes every address
+SPREAD_DEG = 0.35  # Synthetic spots lie within ~40 km of the center, inside the search radius
+SEARCH_ADDRESS = "Lisbon, Portugal"
+MIN_REGRESSION_MS = 10.0  # Smaller slowdowns are timer noise, never reported
+MEASURED = ('load_forecast_data', 'create_suggestions_section', 'create_pydeck_map', 'add_spot_markers')
+
+def write_synthetic_catalog(size: int, path: str, seed: int = 0) -> None:
+    """A catalog of size spots cloned from the Lisbon catalog, with unique names and jittered coordinates."""
+    with open(TEMPLATE_CATALOG, 'r', encoding='utf-8') as f:
+        templates = json.load(f)['spots']
+    rng = random.Random(seed)
+    spots = []
+    for i in range(size):
+        spot = dict(templates[i % len(templates)])
+        spot['name'] = f"{spot.get('name', 'Spot')} #{i}"
+        spot.pop('id', None)
+        spot['latitude'] = round(CENTER[0] + rng.uniform(-SPREAD_DEG, SPREAD_DEG), 5)
+        spot['longitude'] = round(CENTER[1] + rng.uniform(-SPREAD_DEG, SPREAD_DEG), 5)
+        spots.append(spot)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'spots': spots}, f, ensure_ascii=False)
+
+def timing_stats(durations_ms: List[float]) -> dict:
+    """First (cold) call, then min/median/max of the following (warm) calls, in ms."""
+    warm = durations_ms[1:] or durations_ms
+    return {
+        'runs': len(durations_ms),
+        'first_ms': round(durations_ms[0], 1),
+        'min_ms': round(min(warm), 1),
+        'median_ms': round(statistics.median(warm), 1),
+        'max_ms': round(max(warm), 1),
+    }
+
+def measure(func: Callable, repeat: int) -> dict:
+    """Time repeat calls of func; the pipeline metrics of the first call are kept alongside."""
+    from surfmap_config import metrics_config
+    durations, first_run, result = [], None, None
+    for i in range(repeat):
+        with metrics_config.run('benchmark', log=False) as run_metrics:
+            started = time.perf_counter()
+            result = func()
+            durations.append((time.perf_counter() - started) * 1000)
+        if i == 0:
+            first_run = run_metrics.summary()
+    stats = timing_stats(durations)
+    stats['first_run'] = {'counters': first_run['counters'], 'stages': first_run['stages']}
+    return stats, result
+
+def run_worker(size: int, repeat: int) -> dict:
+    """Benchmark one catalog size in this process (environment prepared by run_size)."""
+    import folium
+    import surf_map
+    from surfmap_config import forecast_config
+
+    day_list = forecast_config.get_dayList_forecast()
+    selected = day_list[0]
+    lat, lon = forecast_config.get_coordinates(SEARCH_ADDRESS)
+    results = {'spots': size}
+
+    results['load_forecast_data'], forecasts = measure(lambda: forecast_config.load_forecast_data(
+        address=SEARCH_ADDRESS, day_list=[day['value'] for day in day_list], coordinates=[lat, lon],
+        selected_date=selected['value']), repeat)
+    results['spots_with_forecast'] = len(forecasts or [])
+    day_forecasts = forecast_config.select_forecast_day(forecasts or [], selected['value'])
+
+    # The first call streams the analyses of the top spots, the next ones find them in the cache
+    results['create_suggestions_section'], _ = measure(
+        lambda: surf_map.create_suggestions_section(day_forecasts, selected['display']), repeat)
+    results['create_pydeck_map'], _ = measure(lambda: surf_map.create_pydeck_map(day_forecasts, lat, lon), repeat)
+    results['add_spot_markers'], _ = measure(
+        lambda: surf_map.add_spot_markers(folium.Map(location=[lat, lon], zoom_start=10), day_forecasts,
+                                          selected['display']), repeat)
+    return results
+
+def run_size(size: int, args: argparse.Namespace, urls: Dict[str, str], work_dir: str) -> dict:
+    """Run the worker for one size in a subprocess with its own catalog, caches and fake API endpoints."""
+    size_dir = os.path.join(work_dir, str(size))
+    os.makedirs(size_dir, exist_ok=True)
+    catalog_path = os.path.join(size_dir, f"bench_{size}.json")
+    write_synthetic_catalog(size, catalog_path, args.seed)
+    env = dict(os.environ, **urls)
+    env.update({
+        'SURFMAP_CATALOG_SOURCES': catalog_path,
+        'SURFMAP_CATALOG_DIR': os.path.join(size_dir, 'catalog'),
+        'SURFMAP_CACHE_DIR': os.path.join(size_dir, 'cache'),
+        'SURFMAP_SNAPSHOT': '',
+        'PYTHONPATH': os.pathsep.join(filter(None, [REPO_DIR, os.environ.get('PYTHONPATH')])),
+    })
+    # Only used when no secrets file provides them; every call goes to the fake servers anyway
+    for name in ('OPENAI_API_KEY', 'stormglass_api', 'google_maps_api_key'):
+        env.setdefault(name, 'benchmark')
+    command = [sys.executable, os.path.abspath(__file__), '--worker', str(size), '--repeat', str(args.repeat)]
+    print(f"[bench] {size} spots...", file=sys.stderr, flush=True)
+    started = time.time()
+    completed = subprocess.run(command, cwd=REPO_DIR, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        sys.stderr.write(completed.stderr[-4000:])
+        return {'spots': size, 'error': f"worker exited with code {completed.returncode}"}
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    print(f"[bench] {size} spots done in {time.time() - started:.1f}s", file=sys.stderr, flush=True)
+    return result
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True).stdout.strip() or 'unknown'
+    except OSError:
+        return 'unknown'
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Cold (first) or warm (median) timings slower than in the baseline by more than tolerance (a ratio)."""
+    previous = {entry['spots']: entry for entry in baseline.get('results', [])}
+    regressions = []
+    for entry in results['results']:
+        reference = previous.get(entry['spots'])
+        if not reference:
+            continue
+        for name in MEASURED:
+            if name not in entry or name not in reference:
+                continue
+            for timing in ('first_ms', 'median_ms'):
+                before, after = reference[name][timing], entry[name][timing]
+                if before > 0 and after > before * (1 + tolerance) and after - before > MIN_REGRESSION_MS:
+                    regressions.append(f"{name} @ {entry['spots']} spots, {timing}: {before:.1f} -> {after:.1f} ms")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Surfmap pipeline against fake APIs.")
+    parser.add_argument('--sizes', default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated catalog sizes (default: 16,200,2000)")
+    parser.add_argument('--repeat', type=int, default=3, help="Calls per measured function (default: 3)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="Also write the JSON results to this file")
+    parser.add_argument('--baseline', help="Previous results to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed slowdown against the baseline (default: 0.2, i.e. 20%%)")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    fake_apis.add_service_arguments(parser)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, max(args.repeat, 1))))
+        return
+
+    config = fake_apis.config_from_args(args)
+    server = fake_apis.start_server(config)
+    urls = fake_apis.base_urls(server)
+    results = {
+        'format_version': RESULTS_FORMAT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'fake_apis': {'latency_ms': config.latency_ms, 'error_rate': config.error_rate},
+        'repeat': args.repeat,
+        'results': [],
+    }
+    with tempfile.TemporaryDirectory(prefix="surfmap-bench-") as work_dir:
+        for size in (int(size) for size in args.sizes.split(',') if size.strip()):
+            results['results'].append(run_size(size, args, urls, work_dir))
+    server.shutdown()
+    results['api_requests'] = config.stats()
+
+    payload = json.dumps(results, indent=2)
+    print(payload)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(payload)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"[bench] REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
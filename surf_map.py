@@ -12,20 +12,16 @@ st.set_page_config(
     layout="wide"
 )
 
-
-# Hide "Running..." messages
-st.cache_data.clear()
-st.cache_resource.clear()
-
 import folium
 from folium import plugins
 from folium.plugins import MarkerCluster, MiniMap, Draw
 import pandas as pd
 from datetime import datetime, timedelta
-from surfmap_config import forecast_config, displaymap_config
+from surfmap_config import forecast_config, displaymap_config, cache_config, batch, metrics_config, http_config, api_config, secrets_config
 import logging
 import os
 import math
+import json
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -35,6 +31,10 @@ logger = logging.getLogger(__name__)
 if 'run_id' not in st.session_state:
     st.session_state.run_id = 0
 
+# Only drop cached GPT, Stormglass, geocoding and route results whose inputs changed
+# (spot catalog, prompt templates, model) or that an admin flushed
+cache_config.sync_cache_versions()
+
 # Default map view settings
 DEFAULT_LATITUDE = 48.8566
 DEFAULT_LONGITUDE = 2.3522
@@ -53,13 +53,14 @@ def get_spot_color(rating):
     else:  # Poor spots (red)
         return [231, 76, 60, 200]
 
+@metrics_config.timed('map_building')
 def create_pydeck_map(forecasts, user_lat=DEFAULT_LATITUDE, user_lon=DEFAULT_LONGITUDE):
     """Create a PyDeck map with surf spots."""
     try:
         # Sort forecasts by rating to identify top 3
         sorted_forecasts = sorted(
             forecasts,
-            key=lambda x: float(x.get('forecast', [{}])[0].get('daily_rating', 0) if x.get('forecast') else 0),
+            key=lambda x: forecast_config.get_day_rating(x['forecast'][0]) if x.get('forecast') else 0,
             reverse=True
         )
         top_3_names = [spot['name'] for spot in sorted_forecasts[:3]]
@@ -72,9 +73,12 @@ def create_pydeck_map(forecasts, user_lat=DEFAULT_LATITUDE, user_lon=DEFAULT_LON
         for spot in forecasts:
             forecast = spot.get('forecast', [{}])[0] if spot.get('forecast') else {}
             
+            # Same rating as the ranking (numeric spot score, else GPT daily rating)
+            rating = forecast_config.get_day_rating(forecast)
+
             # Log warnings for missing data
-            if not forecast.get('daily_rating'):
-                logger.warning(f"Missing daily_rating for spot: {spot.get('name')}")
+            if not rating:
+                logger.warning(f"Missing rating for spot: {spot.get('name')}")
             if not forecast.get('summary'):
                 logger.warning(f"Missing summary for spot: {spot.get('name')}")
             
@@ -89,7 +93,7 @@ def create_pydeck_map(forecasts, user_lat=DEFAULT_LATITUDE, user_lon=DEFAULT_LON
                 'longitude': lon,
                 'region': spot.get('region', 'Unknown'),
                 'type': spot.get('type', 'Unknown'),
-                'daily_rating': forecast.get('daily_rating', 0),
+                'rating': rating,
                 'summary': forecast.get('summary') or forecast.get('quick_summary', 'No summary available.')
             })
         
@@ -124,11 +128,11 @@ def create_pydeck_map(forecasts, user_lat=DEFAULT_LATITUDE, user_lon=DEFAULT_LON
             data=df,
             get_position=['longitude', 'latitude'],
             get_fill_color="""
-                [daily_rating >= 7.5 ? 0 : daily_rating >= 6 ? 255 : 200,
-                 daily_rating >= 7.5 ? 200 : 140,
-                 daily_rating >= 7.5 ? 0 : 0]
+                [rating >= 7.5 ? 0 : rating >= 6 ? 255 : 200,
+                 rating >= 7.5 ? 200 : 140,
+                 rating >= 7.5 ? 0 : 0]
             """,
-            get_radius="daily_rating * 2000",
+            get_radius="rating * 2000",
             pickable=True,
             opacity=0.8,
             stroked=True,
@@ -153,7 +157,7 @@ def create_pydeck_map(forecasts, user_lat=DEFAULT_LATITUDE, user_lon=DEFAULT_LON
             initial_view_state=view_state,
             map_style="mapbox://styles/mapbox/outdoors-v12",
             tooltip={
-                "html": "<b>{name}</b><br>Rating: {daily_rating}/10<br>{summary}",
+                "html": "<b>{name}</b><br>Rating: {rating}/10<br>{summary}",
                 "style": {
                     "backgroundColor": "white",
                     "color": "black",
@@ -224,20 +228,28 @@ def create_responsive_layout(day_list):
     
     return address, selectbox_daily_forecast
 
-def create_suggestions_section(forecasts, selected_day):
-    """Create a section for surf spot suggestions."""
+def render_summary(slot, summary):
+    """Render the surf summary box of a spot card into a placeholder."""
+    slot.markdown(f"""
+    <div style="background-color: #eaf4fb; padding: 1rem; border-radius: 0.5rem;">
+    🌊 <strong>Surf Summary:</strong><br>{summary}
+    </div>
+    """, unsafe_allow_html=True)
+
+def create_suggestions_section(forecasts, selected_day, read_only=False):
+    """Create a section for surf spot suggestions (read_only: never generate missing analyses)."""
     st.markdown("### 🏄‍♂️ Spot Suggestions")
     
     if not forecasts:
         st.warning("No spots found for your criteria")
         return
         
-    # Sort spots by rating for the selected day
+    # Sort spots by rating for the selected day (numeric spot score first, no GPT call needed)
     sorted_spots = sorted(
         forecasts,
         key=lambda x: (
-            float(x.get('forecast', [{}])[0].get('daily_rating', 0))
-            if x.get('forecast') and x['forecast'][0].get('daily_rating') is not None
+            forecast_config.get_day_rating(x['forecast'][0])
+            if x.get('forecast')
             else float(x.get('match', 0))
             if x.get('match') is not None
             else 0
@@ -256,7 +268,7 @@ def create_suggestions_section(forecasts, selected_day):
     for spot in top_spots:
         forecast = spot.get('forecast', [{}])[0] if spot.get('forecast') else {}
         wave_height = forecast.get('wave_height_m', {})
-        rating = forecast.get('daily_rating', 0)
+        rating = forecast_config.get_day_rating(forecast)
         distance = spot.get('distance_km', 0)
         conditions_analysis = forecast.get('conditions_analysis', 'No analysis available')
         quick_summary = forecast.get('quick_summary', 'Summary not available')
@@ -282,11 +294,8 @@ def create_suggestions_section(forecasts, selected_day):
             col1, col2 = st.columns([2, 1])
             
             with col1:
-                st.markdown(f"""
-                <div style="background-color: #eaf4fb; padding: 1rem; border-radius: 0.5rem;">
-                🌊 <strong>Surf Summary:</strong><br>{forecast.get("quick_summary", "⚠️ No summary available.")}
-                </div>
-                """, unsafe_allow_html=True)
+                summary_slot = st.empty()
+                render_summary(summary_slot, forecast.get("quick_summary") or "⚠️ No summary available.")
             
             with col2:
                 st.markdown(f"🏅 **Match Rating**: {rating}/10")
@@ -297,10 +306,26 @@ def create_suggestions_section(forecasts, selected_day):
             
             # Pro Analysis Section
             with st.expander("🔍 Pro Analysis"):
+                analysis_slot = st.empty()
                 if spot.get("forecast") and spot["forecast"][0].get("conditions_analysis"):
-                    st.markdown(spot["forecast"][0].get("conditions_analysis"), unsafe_allow_html=True)
+                    analysis_slot.markdown(spot["forecast"][0].get("conditions_analysis"), unsafe_allow_html=True)
                 else:
-                    st.warning("⚠️ No detailed analysis returned.")
+                    analysis_slot.warning("⚠️ No detailed analysis returned.")
+                details = forecast_config.get_spot_details(spot)
+                if details.get('local_tips'):
+                    st.markdown(f"💡 **Local tips:** {details['local_tips']}")
+                if details.get('access'):
+                    st.markdown(f"🚗 **Access:** {details['access']}")
+
+            # Stream the missing GPT texts into the card as they arrive
+            if forecast and forecast.get('conditions_analysis') is None and not read_only:
+                if forecast_config.STREAM_ANALYSIS:
+                    with metrics_config.span('stream_day_analysis'):
+                        for field, text in forecast_config.stream_day_analysis(spot, forecast):
+                            if field == 'quick_summary':
+                                render_summary(summary_slot, text)
+                            else:
+                                analysis_slot.markdown(text, unsafe_allow_html=True)
             
             st.markdown("---")
     
@@ -309,7 +334,7 @@ def create_suggestions_section(forecasts, selected_day):
         with st.expander("📍 Other Nearby Spots"):
             for spot in sorted_spots[3:8]:  # Only show next 5 spots
                 forecast = spot.get('forecast', [{}])[0] if spot.get('forecast') else {}
-                rating = forecast.get('daily_rating', 0)
+                rating = forecast_config.get_day_rating(forecast)
                 distance = spot.get('distance_km', 0)
                 
                 st.markdown(f"""
@@ -321,6 +346,15 @@ def create_suggestions_section(forecasts, selected_day):
                         </div>
                     </div>
                     """, unsafe_allow_html=True)
+                
+                # Pro Analysis on demand: only generated when asked for
+                if forecast.get('conditions_analysis'):
+                    st.markdown(f"🔍 {forecast['conditions_analysis']}", unsafe_allow_html=True)
+                elif forecast and not read_only and st.button("🔍 Pro Analysis", key=f"analysis_{spot.get('name')}_{forecast.get('date')}"):
+                    analysis_slot = st.empty()
+                    for field, text in forecast_config.stream_day_analysis(spot, forecast):
+                        if field == 'conditions_analysis':
+                            analysis_slot.markdown(f"🔍 {text}", unsafe_allow_html=True)
 
 def add_spot_markers(m, forecasts, selected_day):
     """Add markers for surf spots to the map."""
@@ -345,7 +379,7 @@ def add_spot_markers(m, forecasts, selected_day):
                 
                 # Get forecast for selected day
                 forecast = spot.get('forecast', [{}])[0] if spot.get('forecast') else {}
-                rating = forecast.get('daily_rating', 0)
+                rating = forecast_config.get_day_rating(forecast)
                 distance = spot.get('distance_km', 0)
                 
                 # Color based on forecast rating
@@ -397,6 +431,68 @@ def add_spot_markers(m, forecasts, selected_day):
         logger.error(f"Error adding spot markers: {str(e)}")
         return
 
+def is_admin_session():
+    """Return True when the URL carries the admin token configured in the secrets (?admin=<token>)."""
+    admin_token = secrets_config.get_secret("admin_token")
+    if not admin_token:
+        return False
+    if hasattr(st, "query_params"):
+        provided = st.query_params.get("admin")
+    else:
+        provided = st.experimental_get_query_params().get("admin", [None])[0]
+    return provided == admin_token
+
+def get_snapshot_path():
+    """Forecast snapshot to serve read-only (SURFMAP_SNAPSHOT or `snapshot_path` in the secrets), None for live mode."""
+    try:
+        return os.environ.get("SURFMAP_SNAPSHOT") or st.secrets.get("snapshot_path")
+    except Exception:
+        return None
+
+def is_developer_session():
+    """Developer panel: SURFMAP_DEV_PANEL=1, or an admin session (see is_admin_session)."""
+    return os.environ.get("SURFMAP_DEV_PANEL", "").lower() in ("1", "true", "yes") or is_admin_session()
+
+def create_developer_panel():
+    """Sidebar panel with the timing summary of the last page load and the latency histograms."""
+    runs = metrics_config.recent_runs()
+    if not runs:
+        return
+    last_run = runs[-1]
+    with st.sidebar.expander("⏱️ Performance", expanded=False):
+        st.markdown(f"**Last run**: {last_run['duration_ms']:.0f} ms")
+        st.json(last_run['counters'])
+        stages = pd.DataFrame([
+            {'stage': name, 'calls': stage['calls'], 'total_ms': stage['total_ms'], 'max_ms': stage['max_ms'],
+             **stage['counters']}
+            for name, stage in last_run['stages'].items()
+        ])
+        st.dataframe(stages, hide_index=True)
+        histograms = metrics_config.histograms()
+        st.markdown("**Latency histograms (ms, this process)**")
+        st.dataframe(pd.DataFrame({name: h['buckets'] for name, h in histograms.items()}).T)
+        st.markdown("**HTTP connections (this process)**")
+        st.json(http_config.connection_stats())
+        st.markdown("**Route cache hit rate per origin geohash precision (this process)**")
+        st.dataframe(pd.DataFrame(api_config.route_cache_stats()).T)
+        st.download_button(
+            "Download metrics (JSON)",
+            data=json.dumps({'runs': runs, 'histograms': histograms,
+                             'http_connections': http_config.connection_stats(),
+                             'route_cache': api_config.route_cache_stats()}, indent=2),
+            file_name="surfmap_metrics.json",
+            mime="application/json"
+        )
+
+def create_admin_panel():
+    """Sidebar panel letting admins flush cache namespaces."""
+    with st.sidebar.expander("🛠️ Cache administration", expanded=False):
+        namespace = st.selectbox("Namespace", ["all"] + list(cache_config.CACHE_NAMESPACES))
+        if st.button("Flush cache"):
+            removed = cache_config.flush_cache(None if namespace == "all" else namespace)
+            st.session_state.forecasts = None
+            st.success(f"Flushed {sum(removed.values())} cached entries ({', '.join(removed)})")
+
 def main():
     """Main application function."""
     # Get forecast days
@@ -406,6 +502,12 @@ def main():
     if 'forecasts' not in st.session_state:
         st.session_state.forecasts = None
     
+    if is_admin_session():
+        create_admin_panel()
+    
+    # Serve a precomputed forecast snapshot when configured: no forecast API call at all
+    snapshot_path = get_snapshot_path()
+    
     # Create responsive layout and get inputs
     address, selectbox_daily_forecast = create_responsive_layout(day_list)
     
@@ -419,25 +521,39 @@ def main():
                 # Ensure coordinates are float values
                 lat, lon = float(coordinates[0]), float(coordinates[1])
                 
-                # Load and process forecasts first
-                if st.session_state.forecasts is None:
-                    # Pass the selected date directly in YYYY-MM-DD format
+                # Load the 7-day forecasts once per location; switching day only re-slices them
+                location_key = (round(lat, 4), round(lon, 4))
+                if snapshot_path:
+                    st.session_state.forecasts = batch.snapshot_forecasts(snapshot_path, [lat, lon])
+                    st.session_state.forecasts_location = location_key
+                elif not st.session_state.forecasts or st.session_state.get('forecasts_location') != location_key:
                     forecasts = forecast_config.load_forecast_data(
                         address=address,
-                        day_list=[selectbox_daily_forecast['value']],  # Use the full date
-                        coordinates=[lat, lon]
+                        day_list=[day['value'] for day in day_list],  # Full 7-day window
+                        coordinates=[lat, lon],
+                        selected_date=selectbox_daily_forecast['value']
                     )
                     st.session_state.forecasts = forecasts
+                    st.session_state.forecasts_location = location_key
                 
                 if st.session_state.forecasts:
+                    # Forecasts for the selected day; missing analyses of the displayed spots are
+                    # streamed into their cards, or generated upfront when streaming is disabled
+                    day_forecasts = forecast_config.select_forecast_day(
+                        st.session_state.forecasts, selectbox_daily_forecast['value']
+                    )
+                    if not forecast_config.STREAM_ANALYSIS and not snapshot_path:
+                        forecast_config.ensure_day_analysis(day_forecasts[:3], selectbox_daily_forecast['value'])
+                    
                     # Create suggestions section first
-                    create_suggestions_section(st.session_state.forecasts, selectbox_daily_forecast['display'])
+                    create_suggestions_section(day_forecasts, selectbox_daily_forecast['display'],
+                                               read_only=bool(snapshot_path))
                     
                     # Add map header
                     st.markdown("### 🗺️ Surf Spot Forecast Map")
                     
                     # Create and display PyDeck map
-                    deck = create_pydeck_map(st.session_state.forecasts, lat, lon)
+                    deck = create_pydeck_map(day_forecasts, lat, lon)
                     if deck:
                         st.pydeck_chart(deck)
                     else:
@@ -453,9 +569,14 @@ def main():
         # Display default map centered on Paris
         if st.session_state.forecasts:
             st.markdown("### 🗺️ Surf Spot Forecast Map")
-            deck = create_pydeck_map(st.session_state.forecasts)
+            deck = create_pydeck_map(forecast_config.select_forecast_day(
+                st.session_state.forecasts, selectbox_daily_forecast['value']
+            ))
             if deck:
                 st.pydeck_chart(deck)
 
 if __name__ == "__main__":
-    main()
+    with metrics_config.run("page_load"):
+        main()
+    if is_developer_session():
+        create_developer_panel()
@@ -1,6 +1,15 @@
 from . import forecast_config
 from . import api_config
 from . import displaymap_config
+from . import cache_config
+from . import aggregation_config
+from . import cube_config
+from . import rating_config
+from . import geo_config
+from . import catalog_config
+from . import metrics_config
+from . import secrets_config
+from . import http_config
 
 # Re-export all functions for backward compatibility
 from .forecast_config import (
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Stormglass parameter -> name used in the daily forecast dicts
+STORMGLASS_VARIABLES = {
+    'waveHeight': 'wave_height_m',
+    'wavePeriod': 'wave_period_s',
+    'waveDirection': 'wave_direction_deg',
+    'windSpeed': 'wind_speed_m_s',
+    'windDirection': 'wind_direction_deg',
+}
+# Directions are angles: averaging 350° and 10° must give 0°, not 180°
+CIRCULAR_VARIABLES = {'waveDirection', 'windDirection'}
+DEFAULT_PERCENTILES = (10, 90)
+
+def hours_to_columns(hours: list, params: Sequence[str], source: str = 'noaa') -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Convert the Stormglass 'hours' payload to columnar arrays in one pass.
+    Returns the UTC date of each hour and one float array per parameter (NaN when missing).
+    """
+    dates = np.array([hour.get('time', '')[:10] for hour in hours], dtype='U10')
+    columns = {}
+    for param in params:
+        columns[param] = np.array(
+            [(hour.get(param) or {}).get(source, np.nan) for hour in hours], dtype=float
+        )
+    return dates, columns
+
+def grouped_stats(group_ids: np.ndarray, values: np.ndarray, n_groups: int, circular: bool = False,
+                  percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, np.ndarray]:
+    """
+    Compute per-group statistics of values in bulk (groups without data get NaN).
+    Linear statistics: mean, min, max and percentiles ('p10', 'p90'...).
+    Circular statistics (degrees): circular mean and circular spread.
+    """
+    valid = ~np.isnan(values)
+    groups = group_ids[valid]
+    values = values[valid]
+    counts = np.bincount(groups, minlength=n_groups).astype(float)
+    has_data = counts > 0
+    stats = {}
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if circular:
+            radians = np.deg2rad(values)
+            sin_sum = np.bincount(groups, weights=np.sin(radians), minlength=n_groups)
+            cos_sum = np.bincount(groups, weights=np.cos(radians), minlength=n_groups)
+            mean = np.rad2deg(np.arctan2(sin_sum, cos_sum)) % 360
+            resultant = np.clip(np.hypot(sin_sum, cos_sum) / counts, 1e-12, 1.0)
+            spread = np.rad2deg(np.sqrt(-2 * np.log(resultant)))
+            stats['mean'] = np.where(has_data, mean, np.nan)
+            stats['spread'] = np.where(has_data, spread, np.nan)
+            return stats
+
+        stats['mean'] = np.where(has_data, np.bincount(groups, weights=values, minlength=n_groups) / counts, np.nan)
+
+    # Sort by (group, value) once; every order statistic is then an index lookup
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(int)
+    last = np.maximum(counts.astype(int) - 1, 0)
+    if sorted_values.size:
+        safe_starts = np.minimum(starts, sorted_values.size - 1)
+        stats['min'] = np.where(has_data, sorted_values[safe_starts], np.nan)
+        stats['max'] = np.where(has_data, sorted_values[np.minimum(starts + last, sorted_values.size - 1)], np.nan)
+        for q in percentiles:
+            position = starts + last * (q / 100.0)
+            low = np.minimum(np.floor(position).astype(int), sorted_values.size - 1)
+            high = np.minimum(np.ceil(position).astype(int), sorted_values.size - 1)
+            interpolated = sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - np.floor(position))
+            stats[f"p{int(q)}"] = np.where(has_data, interpolated, np.nan)
+    else:
+        for name in ['min', 'max'] + [f"p{int(q)}" for q in percentiles]:
+            stats[name] = np.full(n_groups, np.nan)
+    return stats
+
+def aggregate_daily_many(payloads: List[list], params: Sequence[str], source: str = 'noaa',
+                         percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Tuple[np.ndarray, Dict[str, Dict[str, np.ndarray]]]:
+    """
+    Aggregate the hourly payloads of many spots (or grid cells) to daily statistics in one pass.
+    Returns the sorted dates and, per parameter and statistic, an array shaped (n_payloads, n_dates).
+    Works for any payload length (multi-week forecasts included).
+    """
+    all_dates = []
+    all_spots = []
+    all_columns = {param: [] for param in params}
+    for spot_idx, hours in enumerate(payloads):
+        dates, columns = hours_to_columns(hours or [], params, source)
+        all_dates.append(dates)
+        all_spots.append(np.full(dates.size, spot_idx, dtype=int))
+        for param in params:
+            all_columns[param].append(columns[param])
+
+    dates = np.concatenate(all_dates) if all_dates else np.array([], dtype='U10')
+    spot_ids = np.concatenate(all_spots) if all_spots else np.array([], dtype=int)
+    unique_dates, date_ids = np.unique(dates, return_inverse=True)
+    n_payloads, n_dates = len(payloads), unique_dates.size
+    group_ids = spot_ids * n_dates + date_ids.reshape(-1)
+
+    daily = {}
+    for param in params:
+        values = np.concatenate(all_columns[param]) if all_columns[param] else np.array([], dtype=float)
+        stats = grouped_stats(group_ids, values, n_payloads * n_dates,
+                              circular=param in CIRCULAR_VARIABLES, percentiles=percentiles)
+        daily[param] = {name: array.reshape(n_payloads, n_dates) for name, array in stats.items()}
+    return unique_dates, daily
+
+def daily_records(dates: np.ndarray, daily: Dict[str, Dict[str, np.ndarray]], payload_idx: int = 0) -> list:
+    """
+    Convert the aggregated statistics of one payload to the daily forecast dicts used across the app:
+    {'date', 'wave_height_m', 'wind_direction_deg', ..., 'stats': {'wave_height_m': {'min', 'max', 'p10', ...}}}.
+    Days missing any parameter are skipped.
+    """
+    records = []
+    for date_idx, date in enumerate(dates):
+        means = {param: daily[param]['mean'][payload_idx, date_idx] for param in daily}
+        if any(np.isnan(value) for value in means.values()):
+            continue
+        record = {'date': str(date)}
+        record_stats = {}
+        for param, value in means.items():
+            name = STORMGLASS_VARIABLES.get(param, param)
+            record[name] = round(float(value), 1) % 360 if param in CIRCULAR_VARIABLES else round(float(value), 1)
+            record_stats[name] = {
+                stat: round(float(values[payload_idx, date_idx]), 1)
+                for stat, values in daily[param].items() if stat != 'mean'
+            }
+        record['stats'] = record_stats
+        records.append(record)
+    return records
+
+def aggregate_daily(hours: list, params: Sequence[str], source: str = 'noaa',
+                    percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Optional[list]:
+    """Aggregate a single Stormglass hourly payload to daily forecast dicts."""
+    dates, daily = aggregate_daily_many([hours], params, source, percentiles)
+    return daily_records(dates, daily)
@@ -8,17 +8,29 @@ import requests
 import time
 from datetime import datetime
 import json
+import os
+import re
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm, tqdm_notebook
 import streamlit as st
+from unidecode import unidecode
+
+from . import cache_config
+from . import metrics_config
+from . import secrets_config
+from . import http_config
+from . import geo_config
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Get API key from Streamlit secrets
-gmaps_api_key = st.secrets["google_maps_api_key"]
+# Get API key from Streamlit secrets (or the environment)
+gmaps_api_key = secrets_config.get_secret("google_maps_api_key")
 logger.info(f"API Key length: {len(gmaps_api_key) if gmaps_api_key else 'No API key found'}")
-gmaps = googlemaps.Client(key=gmaps_api_key)
+gmaps = googlemaps.Client(key=gmaps_api_key, base_url=secrets_config.GOOGLE_MAPS_BASE_URL)
 
 #Variables
 consommation_moyenne = 6.5  # L/100km
@@ -28,20 +40,99 @@ toll_cost_per_km = 0.05  # €/km (average toll cost in France)
 #data
 url_database = "surfmap_config/surfspots.xlsx"
 
-@st.cache_data
+# Distance Matrix limits: 25 destinations (and 100 elements) per request
+DISTANCE_MATRIX_MAX_DESTINATIONS = 25
+DISTANCE_MATRIX_MAX_WORKERS = 4
+# Distance Matrix answer for an unroutable destination (see get_bulk_route_info), never cached.
+# Read-only and falsy: callers keep their truthiness checks (no route either way) and tell it
+# apart from an unanswered destination with `route is None`
+NO_ROUTE = types.MappingProxyType({})
+
+# Routes are shared by every origin of the same geohash cell (precision 6 ≈ 1.2 × 0.6 km).
+# route_cache_stats() measures the hit rate of that precision, and estimates the one each other
+# precision would have had from the (origin bucket, destination) pairs routed by this process
+ROUTE_TTL = 7 * 86400
+ROUTE_GEOHASH_PRECISION = int(os.environ.get("SURFMAP_ROUTE_GEOHASH_PRECISION", 6))
+ROUTE_SHADOW_PRECISIONS = (4, 5, 6, 7)
+ROUTE_SHADOW_MAX_PAIRS = 100000  # Per precision, oldest forgotten first
+
+# Geocoding results barely change: keep them for a month. Addresses Google cannot resolve
+# are remembered briefly so that a repeated typo does not call the API on every rerun.
+GEOCODE_TTL = 30 * 86400
+GEOCODE_NEGATIVE_TTL = 600
+GEOCODE_NEGATIVE_STATUSES = ('ZERO_RESULTS', 'INVALID_REQUEST')
+
+def normalize_address(address) -> str:
+    """Cache form of an address: accents stripped, lower case, single spaces, tidy commas."""
+    text = unidecode(str(address or '')).lower()
+    text = re.sub(r"\s*,\s*", ", ", re.sub(r"\s+", " ", text))
+    return text.strip(" ,")
+
+def geocode_cache_key(address) -> str:
+    return cache_config.versioned_key('geocode', normalize_address(address))
+
+class _UncachedGeocode(Exception):
+    """Carries a failed geocoding result out of st.cache_data, which does not cache exceptions."""
+
+    def __init__(self, output):
+        super().__init__(output.get('status'))
+        self.output = output
+
+@st.cache_data(ttl=GEOCODE_TTL, show_spinner=False)
+def _cached_google_results(address, key_api_gmaps, return_full_response=False):
+    """
+    Cached body of get_google_results. Only successful results stay in this in-process cache:
+    failures raise _UncachedGeocode, and of those only the deliberate negative statuses are
+    kept, briefly, in the persistent cache.
+    """
+    cache_key = geocode_cache_key(address)
+    cached = cache_config.cache_get('geocode', cache_key)
+    if cached and (not return_full_response or 'response' in cached or not cached.get('success')):
+        logger.info(f"Geocoding cache hit for address: {address}")
+        output = dict(cached, input_string=address)
+        if not output.get('success'):
+            raise _UncachedGeocode(output)
+        return output
+
+    output = fetch_google_results(address, key_api_gmaps, return_full_response)
+    if output.get('success'):
+        cache_config.cache_set('geocode', cache_key, output, ttl=GEOCODE_TTL)
+        if output.get('formatted_address'):
+            cache_config.cache_set('geocode', geocode_cache_key(output['formatted_address']), output, ttl=GEOCODE_TTL)
+        return output
+    if output.get('status') in GEOCODE_NEGATIVE_STATUSES:
+        cache_config.cache_set('geocode', cache_key, output, ttl=GEOCODE_NEGATIVE_TTL)
+    raise _UncachedGeocode(output)
+
 def get_google_results(address, key_api_gmaps, return_full_response = False):
     """
     Get geocode results from Google Maps Geocoding API.
+    Results are kept in the persistent 'geocode' cache under the normalized address, and
+    successful ones also under their normalized formatted address, so spelling variants
+    ("Lisbon", "lisbon ", "Lisbon, Portugal") share one API call. Successes are also kept in
+    process for GEOCODE_TTL; transient failures ("ERROR", quota...) are retried on the next call.
+    """
+    try:
+        return _cached_google_results(address, key_api_gmaps, return_full_response)
+    except _UncachedGeocode as e:
+        return e.output
+
+get_google_results.clear = _cached_google_results.clear
+
+def fetch_google_results(address, key_api_gmaps, return_full_response = False):
+    """
+    Call the Google Maps Geocoding API (no cache, see get_google_results).
     """
     try:
         logger.info(f"Attempting geocoding for address: {address}")
         
-        geocode_url = "https://maps.googleapis.com/maps/api/geocode/json?address={}".format(address)
+        geocode_url = "{}/maps/api/geocode/json?address={}".format(secrets_config.GOOGLE_MAPS_BASE_URL, address)
         if key_api_gmaps is not None:
             geocode_url = geocode_url + "&key={}".format(key_api_gmaps)
             logger.info(f"API URL constructed (showing first 50 chars): {geocode_url[:50]}...")
         
-        results = requests.get(geocode_url)
+        metrics_config.count_api_call('google')
+        results = http_config.get_client().get(geocode_url)
         logger.info(f"API Response Status Code: {results.status_code}")
         results = results.json()
         logger.info(f"API Response Status: {results.get('status')}")
@@ -113,10 +204,112 @@ def get_google_results(address, key_api_gmaps, return_full_response = False):
         }
     return output
 
+_route_cache_precisions = tuple(sorted(set(ROUTE_SHADOW_PRECISIONS) | {ROUTE_GEOHASH_PRECISION}))
+_route_cache_stats = {precision: {'lookups': 0, 'hits': 0} for precision in _route_cache_precisions}
+_route_cache_stats_lock = threading.Lock()
+# (origin bucket, destination) pairs with a known route, per shadow precision, oldest first
+_route_shadow_pairs = {precision: {} for precision in _route_cache_precisions if precision != ROUTE_GEOHASH_PRECISION}
+
+def origin_bucket(origin, precision=ROUTE_GEOHASH_PRECISION):
+    """Cache bucket of a route origin: its geohash cell for coordinates, the normalized text for an address."""
+    if isinstance(origin, str):
+        try:
+            lat, lon = (float(part) for part in origin.split(','))
+        except ValueError:
+            return f"address:{normalize_address(origin)}"
+    else:
+        lat, lon = (float(part) for part in origin)
+    return f"geohash:{geo_config.geohash_encode(lat, lon, precision)}"
+
+def route_destination_key(location, spot_id=None):
+    """
+    Cache key of a route destination: the catalog spot id when the caller has one (see
+    catalog_config.assign_spot_ids), so that a spot keeps its routes whatever the spelling of its
+    address or the rounding of its coordinates, else the formatted location.
+    """
+    return f"spot:{spot_id}" if spot_id is not None else location
+
+def _route_key(origin, destination_key):
+    return cache_config.versioned_key('route', origin_bucket(origin), str(destination_key))
+
+def _remember_routes(origin, destination_keys):
+    """Record that routes from origin to destination_keys are known, at every shadow precision."""
+    with _route_cache_stats_lock:
+        for precision, pairs in _route_shadow_pairs.items():
+            bucket = origin_bucket(origin, precision)
+            for destination_key in destination_keys:
+                pairs[(bucket, str(destination_key))] = None
+            while len(pairs) > ROUTE_SHADOW_MAX_PAIRS:
+                pairs.pop(next(iter(pairs)))
+
+def get_cached_routes(origin, destination_keys):
+    """
+    Routes from the origin's bucket to destinations (coordinates, addresses or spot ids) from the
+    persistent cache, read in one query, as {destination_key: route or None}. Also records
+    whether each tracked precision would have hit: the active one when the route is cached,
+    the others when the pair was already routed from their bucket in this process.
+    """
+    try:
+        keys = {destination_key: _route_key(origin, destination_key) for destination_key in destination_keys}
+    except (TypeError, ValueError):
+        return {destination_key: None for destination_key in destination_keys}
+    cached = cache_config.cache_get_many('route', list(keys.values()))
+    routes = {destination_key: cached.get(key) for destination_key, key in keys.items()}
+
+    with _route_cache_stats_lock:
+        for precision in _route_cache_precisions:
+            if precision == ROUTE_GEOHASH_PRECISION:
+                hits = sum(route is not None for route in routes.values())
+            else:
+                bucket, pairs = origin_bucket(origin, precision), _route_shadow_pairs[precision]
+                hits = sum((bucket, str(destination_key)) in pairs for destination_key in routes)
+            _route_cache_stats[precision]['lookups'] += len(routes)
+            _route_cache_stats[precision]['hits'] += hits
+    _remember_routes(origin, [destination_key for destination_key, route in routes.items() if route is not None])
+    return routes
+
+def get_cached_route(origin, destination_key):
+    """Route from the origin's bucket to a destination from the persistent cache, None on a miss."""
+    return get_cached_routes(origin, [destination_key]).get(destination_key)
+
+def store_routes(origin, routes):
+    """Persist {destination_key: route} for the origin's bucket in a single write."""
+    entries = []
+    for destination_key, route in routes.items():
+        if not route:
+            continue
+        try:
+            entries.append((_route_key(origin, destination_key), route, str(destination_key)))
+        except (TypeError, ValueError):
+            continue
+    cache_config.cache_set_many('route', entries, ttl=ROUTE_TTL)
+    if entries:
+        _remember_routes(origin, [destination_key for destination_key, route in routes.items() if route])
+
+def store_route(origin, destination_key, route):
+    """Persist a single route (see store_routes)."""
+    store_routes(origin, {destination_key: route})
+
+def route_cache_stats():
+    """
+    Route cache lookups, hits and hit rate per geohash precision in this process. Only the
+    'active' precision (the one in use) is measured against the persistent cache; the others
+    are 'estimate's from the routes this process has seen, not from lookups across sessions.
+    """
+    with _route_cache_stats_lock:
+        return {
+            precision: dict(stats, active=precision == ROUTE_GEOHASH_PRECISION,
+                            estimate=precision != ROUTE_GEOHASH_PRECISION,
+                            hit_rate=round(stats['hits'] / stats['lookups'], 3) if stats['lookups'] else None)
+            for precision, stats in _route_cache_stats.items()
+        }
+
 @st.cache_data
-def get_google_route_info(start_coords, end_coords, key_api_gmaps):
+def get_google_route_info(start_coords, end_coords, key_api_gmaps, spot_id=None):
     """
     Get route information using Google Maps Directions API.
+    Routes are shared through the persistent cache by origins of the same geohash bucket, keyed
+    on the catalog spot id when given (see route_destination_key).
     """
     try:
         if not start_coords or not end_coords or None in start_coords or None in end_coords:
@@ -126,7 +319,13 @@ def get_google_route_info(start_coords, end_coords, key_api_gmaps):
         origin = f"{start_coords[0]},{start_coords[1]}"
         destination = f"{end_coords[0]},{end_coords[1]}"
         
+        destination_key = route_destination_key(format_location(end_coords), spot_id)
+        cached = get_cached_route(origin, destination_key)
+        if cached:
+            return cached
+        
         # Get directions from Google Maps
+        metrics_config.count_api_call('google')
         directions = gmaps.directions(origin, destination, mode='driving')
         
         if not directions:
@@ -139,22 +338,94 @@ def get_google_route_info(start_coords, end_coords, key_api_gmaps):
         distance = leg['distance']['value'] / 1000  # Convert to km
         duration = leg['duration']['value'] / 3600  # Convert to hours
         
-        # Calculate costs
-        fuel_cost = (distance * consommation_moyenne / 100) * prix_essence  # Fuel cost in €
-        toll_cost = distance * toll_cost_per_km  # Estimated toll cost in €
-        
-        result = {
-            'distance': round(distance, 1),
-            'duration': round(duration, 2),
-            'toll_cost': round(toll_cost, 2),
-            'fuel_cost': round(fuel_cost, 2)
-        }
-        
+        result = route_costs(distance, duration)
+        store_route(origin, destination_key, result)
         return result
         
     except Exception as e:
         return None
 
+def route_costs(distance, duration):
+    """Route information of a drive of distance km lasting duration hours, with its estimated costs."""
+    fuel_cost = (distance * consommation_moyenne / 100) * prix_essence  # Fuel cost in €
+    toll_cost = distance * toll_cost_per_km  # Estimated toll cost in €
+    return {
+        'distance': round(distance, 1),
+        'duration': round(duration, 2),
+        'toll_cost': round(toll_cost, 2),
+        'fuel_cost': round(fuel_cost, 2)
+    }
+
+def format_location(location):
+    """
+    Location as the Google routing APIs take it: "lat,lon" for coordinates, the text for an address.
+    None when unusable.
+    """
+    if isinstance(location, str):
+        return location.strip() or None
+    try:
+        lat, lon = location
+        return f"{float(lat)},{float(lon)}"
+    except (TypeError, ValueError):
+        return None
+
+def _distance_matrix_batch(origin, destinations):
+    """
+    Route information from origin to up to DISTANCE_MATRIX_MAX_DESTINATIONS destinations in one
+    request: NO_ROUTE for the destinations Google answered without a route, None for those left
+    unanswered (failed request or missing element).
+    """
+    try:
+        metrics_config.count_api_call('google')
+        response = gmaps.distance_matrix([origin], destinations, mode='driving')
+        elements = response['rows'][0]['elements']
+    except Exception as e:
+        logger.error(f"Distance Matrix request failed for {len(destinations)} destinations: {str(e)}")
+        return [None] * len(destinations)
+    routes = [
+        route_costs(element['distance']['value'] / 1000, element['duration']['value'] / 3600)
+        if element.get('status') == 'OK' else NO_ROUTE
+        for element in elements[:len(destinations)]
+    ]
+    return routes + [None] * (len(destinations) - len(routes))
+
+def get_bulk_route_info(origin, destinations, spot_ids=None, max_workers=DISTANCE_MATRIX_MAX_WORKERS):
+    """
+    Route information (as get_google_route_info returns it) from one origin to many destinations,
+    coordinates or addresses, through batched Distance Matrix requests run concurrently.
+    spot_ids, aligned with destinations, key the cached routes on the catalog spot ids (see
+    route_destination_key). Duplicate destinations are requested once, and routes already
+    cached for the origin's bucket are not requested at all. Returns one entry per destination: NO_ROUTE when the
+    Distance Matrix found no route to it, None when the destination is unusable or was left
+    unanswered (callers may fall back to get_google_route_info for those only).
+    """
+    origin = format_location(origin)
+    locations = [format_location(destination) for destination in destinations]
+    if origin is None:
+        return [None] * len(locations)
+    keys = [route_destination_key(location, spot_id) if location is not None else None
+            for location, spot_id in zip(locations, spot_ids if spot_ids is not None else [None] * len(locations))]
+    unique = {}
+    for key, location in zip(keys, locations):
+        if key is not None:
+            unique.setdefault(key, location)
+    routes = get_cached_routes(origin, list(unique))
+    missing = [key for key in unique if routes[key] is None]
+    batches = [missing[i:i + DISTANCE_MATRIX_MAX_DESTINATIONS]
+               for i in range(0, len(missing), DISTANCE_MATRIX_MAX_DESTINATIONS)]
+    if batches:
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as executor:
+            results = executor.map(metrics_config.bind_context(
+                lambda batch: _distance_matrix_batch(origin, [unique[key] for key in batch])), batches)
+            for batch, batch_routes in zip(batches, results):
+                fetched.update(zip(batch, batch_routes))
+        routes.update(fetched)
+        store_routes(origin, fetched)
+    logger.info(f"Routed {len(unique)} destinations: {len(unique) - len(missing)} cached, "
+                f"{len(missing)} in {len(batches)} Distance Matrix requests")
+    return [routes.get(key) if key is not None else None for key in keys]
+
 @st.cache_data
 def get_route_info(start_address, end_address, key_api_gmaps):
     """
@@ -198,3 +469,10 @@ def df_geocoding(df_adresses):
     except Exception as e:
         return []
     return df_geocoded
+
+# Route results embed the cost constants, so they are part of the route cache version
+cache_config.register_namespace('geocode', clear_callbacks=[get_google_results.clear, google_results.clear])
+cache_config.register_namespace(
+    'route', consommation_moyenne, prix_essence, toll_cost_per_km,
+    clear_callbacks=[get_google_route_info.clear, get_route_info.clear]
+)
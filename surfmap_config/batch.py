@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Offline forecast batch: runs the full forecast pipeline for a region without the Streamlit
+runtime and writes a versioned JSON snapshot that surf_map.py can serve read-only
+(SURFMAP_SNAPSHOT=<path> or `snapshot_path` in the secrets).
+
+    python -m surfmap_config.batch --region lisbon --days 7
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import streamlit as st
+
+from . import cache_config
+from . import catalog_config
+from . import forecast_config
+from . import metrics_config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_DIR = os.environ.get("SURFMAP_SNAPSHOT_DIR", os.path.join("data", "snapshots"))
+FORECAST_DAYS = 7  # Days covered by the base and Stormglass forecasts
+
+def region_spots(region: str) -> List[dict]:
+    """
+    Spots of a region: the whole data/<region>_area_lean.json catalog when it exists,
+    otherwise the catalog spots whose 'region' field matches.
+    """
+    source = os.path.join("data", f"{region}_area_lean.json")
+    if os.path.exists(source):
+        return list(catalog_config.load_catalog(source).spots)
+    spots = catalog_config.load_sharded_catalog(catalog_config.CATALOG_SOURCES).all_spots()
+    return [spot for spot in spots if str(spot.get('region', '')).lower() == region.lower()]
+
+def run_batch(region: str, days: int = 7, start_date: Optional[str] = None, with_texts: bool = True) -> dict:
+    """
+    Forecast every spot of a region over days days: base forecast, Stormglass data, spot scores and,
+    with with_texts, the quick summary and conditions analysis of every day.
+    Returns the snapshot dict. days must be between 1 and FORECAST_DAYS.
+    """
+    if not 1 <= days <= FORECAST_DAYS:
+        raise ValueError(f"days must be between 1 and {FORECAST_DAYS}, got {days}")
+    start = datetime.strptime(start_date, '%Y-%m-%d') if start_date else datetime.now()
+    dates = [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+    spots = region_spots(region)
+    if not spots:
+        raise ValueError(f"No spots found for region '{region}'")
+    logger.info(f"[batch] Forecasting {len(spots)} spots of {region} from {dates[0]} to {dates[-1]}")
+
+    started = time.time()
+    cache_config.sync_cache_versions()
+    with metrics_config.run('batch') as run_metrics:
+        sg_memo = cache_config.RequestMemo()
+        forecasts = forecast_config.load_forecasts_concurrently(
+            spots, dates[0],
+            progress_callback=lambda done, total, name: logger.info(f"[batch] {name} done ({done}/{total})"),
+            sg_memo=sg_memo,
+            analysis_dates=dates if with_texts else []
+        )
+        spots_with_forecast = []
+        for spot, forecast in zip(spots, forecasts):
+            if forecast is None:
+                logger.warning(f"[batch] No forecast for {spot.get('name')}, left out of the snapshot")
+                continue
+            spots_with_forecast.append(dict(spot, forecast=[day for day in forecast if day.get('date') in dates]))
+        forecast_config.apply_batch_scores(spots_with_forecast, sg_memo)
+    metrics = run_metrics.summary()
+
+    created_at = datetime.now()
+    return {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'snapshot_id': f"{region}-{created_at.strftime('%Y%m%dT%H%M%S')}",
+        'created_at': created_at.isoformat(timespec='seconds'),
+        'region': region,
+        'dates': dates,
+        'model': forecast_config.GPT_MODEL,
+        'cache_versions': {namespace: cache_config.namespace_version(namespace)
+                           for namespace in ('forecast', 'stormglass')},
+        'duration_s': round(time.time() - started, 1),
+        'metrics': {key: value for key, value in metrics.items() if key != 'spans'},
+        'spots': spots_with_forecast,
+    }
+
+def write_snapshot(snapshot: dict, out_dir: str = SNAPSHOT_DIR) -> str:
+    """
+    Write a snapshot as <snapshot_id>.json and refresh <region>-latest.json, both atomically.
+    Returns the path of the versioned file.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    payload = json.dumps(snapshot, ensure_ascii=False)
+    path = os.path.join(out_dir, f"{snapshot['snapshot_id']}.json")
+    for target in (path, os.path.join(out_dir, f"{snapshot['region']}-latest.json")):
+        tmp_path = f"{target}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp_path, target)
+    logger.info(f"[batch] Snapshot of {len(snapshot['spots'])} spots written to {path}")
+    return path
+
+def load_snapshot(path: str) -> dict:
+    """Read and check a snapshot file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+    if snapshot.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format {snapshot.get('format_version')} in {path}")
+    return snapshot
+
+@st.cache_resource(show_spinner=False, max_entries=2)  # The current snapshot and the one it replaces
+def _cached_snapshot(path: str, modified_at: float) -> dict:
+    return load_snapshot(path)
+
+def get_snapshot(path: str) -> dict:
+    """Snapshot shared read-only by all sessions, reloaded when the file changes."""
+    return _cached_snapshot(path, os.path.getmtime(path))
+
+def snapshot_forecasts(path: str, coordinates: Optional[list]) -> list:
+    """Spots with forecasts from a snapshot near coordinates, as load_forecast_data returns them. No API call."""
+    try:
+        return forecast_config.select_nearby_spots(get_snapshot(path)['spots'], coordinates)
+    except Exception as e:
+        logger.error(f"Error reading forecast snapshot {path}: {str(e)}")
+        return []
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the forecast pipeline offline and write a forecast snapshot.")
+    parser.add_argument('--region', default='lisbon', help="Region to forecast (default: lisbon)")
+    parser.add_argument('--days', type=int, default=FORECAST_DAYS,
+                        help=f"Number of days, 1 to {FORECAST_DAYS} (default: {FORECAST_DAYS})")
+    parser.add_argument('--start-date', help="First day, YYYY-MM-DD (default: today)")
+    parser.add_argument('--no-texts', action='store_true', help="Skip quick summaries and analyses")
+    parser.add_argument('--out', default=SNAPSHOT_DIR, help=f"Output directory (default: {SNAPSHOT_DIR})")
+    args = parser.parse_args()
+    if not 1 <= args.days <= FORECAST_DAYS:
+        parser.error(f"--days must be between 1 and {FORECAST_DAYS}")
+    snapshot = run_batch(args.region, args.days, args.start_date, with_texts=not args.no_texts)
+    print(write_snapshot(snapshot, args.out))
+
+if __name__ == "__main__":
+    main()
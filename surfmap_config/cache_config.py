@@ -0,0 +1,491 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import sqlite3
+import logging
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from . import metrics_config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Location of the persistent cache, shared by every process running the app
+CACHE_DIR = os.environ.get("SURFMAP_CACHE_DIR", os.path.join("data", "cache"))
+CACHE_DB_NAME = "surfmap_cache.sqlite3"
+
+DEFAULT_TTL = 21600  # 6 hours, same as the in-process st.cache_data layer
+MAX_CACHE_BYTES = int(os.environ.get("SURFMAP_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+EVICTION_TARGET_RATIO = 0.9  # Evict down to 90% of the size budget
+# Expired entries are swept at this interval even while the size budget is not reached
+# (other processes write to the same database, so the size estimate is resynced too)
+EVICTION_SWEEP_INTERVAL = 600
+# LRU access times are kept in memory and written in one batch every N reads or S seconds
+ACCESS_FLUSH_SIZE = 256
+ACCESS_FLUSH_INTERVAL = 30
+# Keys per IN (...) query of get_many, below SQLite's historical limit of 999 variables
+GET_MANY_CHUNK_SIZE = 500
+
+# Cache namespaces managed by the lifecycle functions below
+CACHE_NAMESPACES = ('forecast', 'stormglass', 'geocode', 'route')
+
+def make_key(*parts) -> str:
+    """Return a stable hash for the given key parts (prompts, inputs, coordinates...)."""
+    raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class PersistentCache:
+    """
+    SQLite-backed key/value cache surviving process restarts.
+    Entries are grouped by namespace, expire after their TTL and are evicted
+    least-recently-used first once the database grows past max_bytes.
+    Writes track a running size estimate so the eviction pass only runs when it
+    crosses the budget (or every EVICTION_SWEEP_INTERVAL), and reads buffer their
+    last_access updates (see ACCESS_FLUSH_SIZE). Values must be JSON serializable.
+    """
+
+    def __init__(self, path: str, max_bytes: int = MAX_CACHE_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                spot_id TEXT,
+                forecast_date TEXT,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache_entries (last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_spot_date ON cache_entries (spot_id, forecast_date)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_versions (
+                namespace TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                generation INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self._size_estimate = None  # Bytes stored, known after the first eviction pass
+        self._last_sweep = 0.0
+        self._pending_access: Dict[tuple, float] = {}
+        self._last_access_flush = time.time()
+
+    def _flush_access_locked(self) -> None:
+        """Write the buffered last_access times (caller holds the lock and commits)."""
+        if self._pending_access:
+            self._conn.executemany(
+                "UPDATE cache_entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                [(accessed, namespace, key) for (namespace, key), accessed in self._pending_access.items()]
+            )
+            self._pending_access.clear()
+        self._last_access_flush = time.time()
+
+    def flush_access(self) -> None:
+        """Persist the buffered LRU access times now."""
+        with self._lock:
+            self._flush_access_locked()
+            self._conn.commit()
+
+    def _maybe_evict(self, added_bytes: int) -> None:
+        """Run an eviction pass only when the size estimate crosses the budget or a sweep is due."""
+        with self._lock:
+            if self._size_estimate is not None:
+                self._size_estimate += added_bytes
+            due = (self._size_estimate is None or self._size_estimate > self.max_bytes
+                   or time.time() - self._last_sweep > EVICTION_SWEEP_INTERVAL)
+        if due:
+            self.evict()
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Return the cached value or None when missing or expired."""
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                    (namespace, key)
+                ).fetchone()
+                if row is None:
+                    return None
+                if row[1] < now:
+                    self._conn.execute(
+                        "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+                    )
+                    self._conn.commit()
+                    return None
+                self._pending_access[(namespace, key)] = now
+                if (len(self._pending_access) >= ACCESS_FLUSH_SIZE
+                        or now - self._last_access_flush > ACCESS_FLUSH_INTERVAL):
+                    self._flush_access_locked()
+                    self._conn.commit()
+            return json.loads(row[0])
+        except Exception as e:
+            logger.warning(f"[PersistentCache] Read failed for {namespace}/{key[:12]}: {str(e)}")
+            return None
+
+    def get_many(self, namespace: str, keys: List[str]) -> Dict[str, Any]:
+        """
+        Live values of several keys, read with one query per GET_MANY_CHUNK_SIZE keys, as {key: value}.
+        Missing and expired keys are left out (expired rows are left to the eviction sweep).
+        """
+        now = time.time()
+        keys = list(dict.fromkeys(keys))
+        try:
+            rows = []
+            with self._lock:
+                for i in range(0, len(keys), GET_MANY_CHUNK_SIZE):
+                    chunk = keys[i:i + GET_MANY_CHUNK_SIZE]
+                    rows.extend(self._conn.execute(
+                        f"""SELECT key, value FROM cache_entries
+                            WHERE namespace = ? AND expires_at >= ? AND key IN ({','.join('?' * len(chunk))})""",
+                        (namespace, now, *chunk)
+                    ).fetchall())
+                self._pending_access.update(((namespace, key), now) for key, _ in rows)
+                if rows and (len(self._pending_access) >= ACCESS_FLUSH_SIZE
+                             or now - self._last_access_flush > ACCESS_FLUSH_INTERVAL):
+                    self._flush_access_locked()
+                    self._conn.commit()
+            return {key: json.loads(value) for key, value in rows}
+        except Exception as e:
+            logger.warning(f"[PersistentCache] Bulk read failed for {namespace} ({len(keys)} keys): {str(e)}")
+            return {}
+
+    def set(self, namespace: str, key: str, value: Any, ttl: int = DEFAULT_TTL,
+            spot_id: Optional[str] = None, forecast_date: Optional[str] = None) -> None:
+        """Store a value; None values are never stored."""
+        if value is None:
+            return
+        now = time.time()
+        try:
+            payload = json.dumps(value, ensure_ascii=False)
+            with self._lock:
+                self._conn.execute(
+                    """INSERT OR REPLACE INTO cache_entries
+                       (namespace, key, spot_id, forecast_date, value, size, created_at, expires_at, last_access)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (namespace, key, spot_id, forecast_date, payload, len(payload), now, now + ttl, now)
+                )
+                self._conn.commit()
+            self._maybe_evict(len(payload))
+        except Exception as e:
+            logger.warning(f"[PersistentCache] Write failed for {namespace}/{key[:12]}: {str(e)}")
+
+    def set_many(self, namespace: str, entries: List[tuple], ttl: int = DEFAULT_TTL) -> None:
+        """Store (key, value, spot_id) entries in a single transaction; None values are skipped."""
+        now = time.time()
+        try:
+            rows = []
+            for key, value, spot_id in entries:
+                if value is not None:
+                    payload = json.dumps(value, ensure_ascii=False)
+                    rows.append((namespace, key, spot_id, None, payload, len(payload), now, now + ttl, now))
+            if not rows:
+                return
+            with self._lock:
+                self._conn.executemany(
+                    """INSERT OR REPLACE INTO cache_entries
+                       (namespace, key, spot_id, forecast_date, value, size, created_at, expires_at, last_access)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    rows
+                )
+                self._conn.commit()
+            self._maybe_evict(sum(row[5] for row in rows))
+        except Exception as e:
+            logger.warning(f"[PersistentCache] Bulk write failed for {namespace} ({len(entries)} entries): {str(e)}")
+
+    def entry_info(self, namespace: str, key: str) -> Optional[dict]:
+        """Creation and expiry times of a live entry, without reading its value or touching last_access."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, expires_at, size FROM cache_entries WHERE namespace = ? AND key = ? AND expires_at >= ?",
+                (namespace, key, time.time())
+            ).fetchone()
+        return {'created_at': row[0], 'expires_at': row[1], 'size': row[2]} if row else None
+
+    def delete(self, namespace: str, key: str) -> None:
+        """Remove a single entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key))
+            self._conn.commit()
+
+    def clear(self, namespace: Optional[str] = None) -> int:
+        """Remove every entry of a namespace (or of the whole cache). Returns the number of entries removed."""
+        with self._lock:
+            if namespace is None:
+                cursor = self._conn.execute("DELETE FROM cache_entries")
+            else:
+                cursor = self._conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def evict(self) -> int:
+        """Drop expired entries, then least recently used ones while over the size budget."""
+        removed = 0
+        with self._lock:
+            # LRU order must reflect the reads buffered so far
+            self._flush_access_locked()
+            cursor = self._conn.execute("DELETE FROM cache_entries WHERE expires_at < ?", (time.time(),))
+            removed += cursor.rowcount
+            total_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+            if total_size > self.max_bytes:
+                target = int(self.max_bytes * EVICTION_TARGET_RATIO)
+                rows = self._conn.execute(
+                    "SELECT namespace, key, size FROM cache_entries ORDER BY last_access ASC"
+                ).fetchall()
+                to_delete = []
+                for namespace, key, size in rows:
+                    if total_size <= target:
+                        break
+                    to_delete.append((namespace, key))
+                    total_size -= size
+                self._conn.executemany("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", to_delete)
+                removed += len(to_delete)
+                logger.info(f"[PersistentCache] Evicted {len(to_delete)} entries to stay under {self.max_bytes} bytes")
+            self._conn.commit()
+            self._size_estimate = total_size
+            self._last_sweep = time.time()
+        return removed
+
+    def get_versions(self) -> Dict[str, tuple]:
+        """Return the recorded (version, generation) of every namespace."""
+        with self._lock:
+            rows = self._conn.execute("SELECT namespace, version, generation FROM cache_versions").fetchall()
+        return {namespace: (version, generation) for namespace, version, generation in rows}
+
+    def set_version(self, namespace: str, version: str, generation: int) -> None:
+        """Record the version and flush generation of a namespace."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_versions (namespace, version, generation, updated_at) VALUES (?, ?, ?, ?)",
+                (namespace, version, generation, time.time())
+            )
+            self._conn.commit()
+
+    def record_version(self, namespace: str, version: str) -> None:
+        """Record the version of a namespace, keeping its flush generation."""
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO cache_versions (namespace, version, generation, updated_at) VALUES (?, ?, 0, ?)
+                   ON CONFLICT(namespace) DO UPDATE SET version = excluded.version, updated_at = excluded.updated_at""",
+                (namespace, version, time.time())
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Return entry counts and sizes per namespace."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries GROUP BY namespace"
+            ).fetchall()
+        return {namespace: {'entries': count, 'bytes': size} for namespace, count, size in rows}
+
+class RequestMemo:
+    """
+    Memo scoped to a single pipeline run, with single-flight semantics:
+    concurrent callers asking for the same key share one in-flight computation,
+    and later callers reuse its result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures: Dict[Any, Future] = {}
+        self.requests = 0
+
+    def get_or_compute(self, key, compute: Callable[[], Any]) -> Any:
+        """Return the value for key, calling compute() only for the first caller."""
+        with self._lock:
+            self.requests += 1
+            future = self._futures.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._futures[key] = future
+        if is_owner:
+            try:
+                future.set_result(compute())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def __len__(self) -> int:
+        return len(self._futures)
+
+_persistent_cache = None
+_persistent_cache_lock = threading.Lock()
+
+def get_persistent_cache() -> PersistentCache:
+    """Return the process-wide persistent cache, creating it on first use."""
+    global _persistent_cache
+    if _persistent_cache is None:
+        with _persistent_cache_lock:
+            if _persistent_cache is None:
+                _persistent_cache = PersistentCache(os.path.join(CACHE_DIR, CACHE_DB_NAME))
+                logger.info(f"Persistent cache opened at {_persistent_cache.path}")
+    return _persistent_cache
+
+def cache_get(namespace: str, key: str) -> Optional[Any]:
+    """Read from the persistent cache, treating any cache failure as a miss."""
+    try:
+        value = get_persistent_cache().get(namespace, key)
+    except Exception as e:
+        logger.warning(f"Persistent cache unavailable: {str(e)}")
+        value = None
+    metrics_config.count('cache_miss' if value is None else 'cache_hit')
+    return value
+
+def cache_get_many(namespace: str, keys: List[str]) -> Dict[str, Any]:
+    """Read several keys from the persistent cache in one query ({key: value} of the hits), failures as misses."""
+    try:
+        values = get_persistent_cache().get_many(namespace, keys)
+    except Exception as e:
+        logger.warning(f"Persistent cache unavailable: {str(e)}")
+        values = {}
+    unique = len(set(keys))
+    metrics_config.count('cache_hit', len(values))
+    metrics_config.count('cache_miss', unique - len(values))
+    return values
+
+def cache_set(namespace: str, key: str, value: Any, ttl: int = DEFAULT_TTL,
+              spot_id: Optional[str] = None, forecast_date: Optional[str] = None) -> None:
+    """Write to the persistent cache, ignoring any cache failure."""
+    try:
+        get_persistent_cache().set(namespace, key, value, ttl=ttl, spot_id=spot_id, forecast_date=forecast_date)
+    except Exception as e:
+        logger.warning(f"Persistent cache unavailable: {str(e)}")
+
+def cache_set_many(namespace: str, entries: List[tuple], ttl: int = DEFAULT_TTL) -> None:
+    """Write (key, value, spot_id) entries in one transaction, ignoring any cache failure."""
+    try:
+        get_persistent_cache().set_many(namespace, entries, ttl=ttl)
+    except Exception as e:
+        logger.warning(f"Persistent cache unavailable: {str(e)}")
+
+def cache_entry_info(namespace: str, key: str) -> Optional[dict]:
+    """Creation/expiry times of a persistent entry (None when missing, expired or on cache failure)."""
+    try:
+        return get_persistent_cache().entry_info(namespace, key)
+    except Exception as e:
+        logger.warning(f"Persistent cache unavailable: {str(e)}")
+        return None
+
+def cache_delete(namespace: str, key: str) -> None:
+    """Remove a persistent entry, ignoring any cache failure."""
+    try:
+        get_persistent_cache().delete(namespace, key)
+    except Exception as e:
+        logger.warning(f"Persistent cache unavailable: {str(e)}")
+
+# Cache lifecycle
+#
+# Each namespace gets a version derived from whatever its cached values depend on
+# (spot catalog, prompt templates, model, cost constants...). When a deployed
+# version differs from the one recorded in the persistent cache, the namespace is
+# purged once; an admin flush bumps the namespace generation instead. Every process
+# compares the recorded state with what it last saw and clears its in-process
+# st.cache_data functions for the namespaces that changed.
+
+_namespaces: Dict[str, dict] = {}
+_seen_versions: Dict[str, tuple] = {}
+_lifecycle_lock = threading.Lock()
+
+def register_namespace(namespace: str, *version_parts, clear_callbacks: Optional[List[Callable]] = None) -> str:
+    """
+    Declare a cache namespace, its version inputs and the in-process caches to clear on invalidation.
+    Returns the namespace version.
+    """
+    version = make_key(namespace, *version_parts)[:16]
+    with _lifecycle_lock:
+        entry = _namespaces.setdefault(namespace, {'version': version, 'clear_callbacks': []})
+        entry['version'] = version
+        entry['clear_callbacks'].extend(clear_callbacks or [])
+    return version
+
+def namespace_version(namespace: str) -> str:
+    """Return the version of a registered namespace ('unversioned' otherwise)."""
+    entry = _namespaces.get(namespace)
+    return entry['version'] if entry else 'unversioned'
+
+def versioned_key(namespace: str, *parts) -> str:
+    """Build a persistent cache key scoped to the current version of a namespace."""
+    return make_key(namespace, namespace_version(namespace), *parts)
+
+def _clear_local(namespace: str) -> None:
+    """Clear the in-process caches registered for a namespace."""
+    for callback in _namespaces.get(namespace, {}).get('clear_callbacks', []):
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"Failed to clear in-process cache for {namespace}: {str(e)}")
+
+def sync_cache_versions() -> List[str]:
+    """
+    Reconcile registered namespace versions with the persistent cache.
+    A version change purges nothing: keys embed the namespace version (versioned_key), so
+    entries of another version are never read and expire through TTL/LRU, while processes
+    still running that version (rolling deploy, warmer started from older code) keep using
+    them. In-process caches are cleared for every namespace whose own version or flush
+    generation (see flush_cache) changed since this process last checked.
+    Cheap enough to call on every script run. Returns the invalidated namespaces.
+    """
+    invalidated = []
+    try:
+        cache = get_persistent_cache()
+        recorded = cache.get_versions()
+        with _lifecycle_lock:
+            for namespace, entry in _namespaces.items():
+                version, generation = recorded.get(namespace, (None, 0))
+                if version != entry['version']:
+                    cache.record_version(namespace, entry['version'])
+                    if version is not None:
+                        logger.info(f"Cache namespace '{namespace}' now at version {entry['version'][:12]}, "
+                                    f"entries of version {version[:12]} left to expire")
+                state = (entry['version'], generation)
+                previous = _seen_versions.get(namespace)
+                _seen_versions[namespace] = state
+                if previous is not None and previous != state:
+                    _clear_local(namespace)
+                    invalidated.append(namespace)
+    except Exception as e:
+        logger.warning(f"Cache version check failed: {str(e)}")
+    return invalidated
+
+def flush_cache(namespace: Optional[str] = None) -> Dict[str, int]:
+    """
+    Admin action: drop every entry of a namespace (or of all registered namespaces),
+    in the persistent cache and in this process. Other processes pick the flush up
+    on their next sync_cache_versions call.
+    Returns the number of persistent entries removed per namespace.
+    """
+    namespaces = [namespace] if namespace else list(_namespaces)
+    removed = {}
+    cache = get_persistent_cache()
+    recorded = cache.get_versions()
+    with _lifecycle_lock:
+        for name in namespaces:
+            removed[name] = cache.clear(name)
+            version, generation = recorded.get(name, (namespace_version(name), 0))
+            cache.set_version(name, namespace_version(name), generation + 1)
+            _seen_versions[name] = (namespace_version(name), generation + 1)
+            _clear_local(name)
+    logger.info(f"Flushed cache namespaces: {removed}")
+    return removed
@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import functools
+import glob
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import streamlit as st
+from unidecode import unidecode
+
+from . import cache_config
+from . import geo_config
+from . import rating_config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CATALOG_DIR = os.environ.get("SURFMAP_CATALOG_DIR", os.path.join("data", "catalog"))
+CATALOG_FORMAT_VERSION = 2
+META_FILE = "meta.json"
+COLUMNS_FILE = "columns.npy"
+PROSE_FILE = "prose.bin"
+PROSE_OFFSETS_FILE = "prose_offsets.npy"
+SHARD_INDEX_FILE = "index.json"
+SHARD_DIR = os.path.join(CATALOG_DIR, "shards")
+SHARD_GEOHASH_PRECISION = 3  # ~156 x 156 km tiles
+# Source files merged into the sharded catalog, separated by os.pathsep
+CATALOG_SOURCES = os.environ.get("SURFMAP_CATALOG_SOURCES", os.path.join("data", "lisbon_area_lean.json")).split(os.pathsep)
+
+# Long descriptive fields, never needed for scoring or prompts: stored apart and read on demand
+PROSE_FIELDS = ('wave_description', 'local_tips', 'access', 'nearby_lodging', 'gear_rental', 'surf_forecast_link')
+# Numeric and scoring fields, one memory-mapped column each. Scoring profiles and the spatial
+# index are built from these columns; scoring qualities are f8 so scores match the JSON exactly
+COLUMN_DTYPE = np.dtype([
+    ('latitude', 'f8'), ('longitude', 'f8'),
+    ('wind_quality', 'f8'), ('swell_quality', 'f8'), ('swell_min_m', 'f8'), ('swell_max_m', 'f8'),
+    ('tide_low', 'f8'), ('tide_rising', 'f8'), ('tide_high', 'f8'), ('tide_falling', 'f8'),
+    ('crowd_quality', 'f4'),
+    # Wind and swell direction descriptions compiled to 16-sector masks (see rating_config.pack_sector_mask)
+    ('wind_sectors', 'u2'), ('swell_sectors', 'u2'),
+])
+
+def spot_slug(name) -> str:
+    """Slug of a spot name, used as its identifier when the catalog has no explicit 'id'."""
+    return re.sub(r'[^a-z0-9]+', '-', unidecode(str(name or 'unknown')).lower()).strip('-')
+
+def source_fingerprint(json_path: str) -> str:
+    """Hash of a catalog source file, 'missing' when it cannot be read."""
+    try:
+        with open(json_path, 'rb') as f:
+            return cache_config.make_key(f.read().decode('utf-8', errors='replace'))
+    except OSError:
+        return "missing"
+
+def sources_fingerprint(json_paths: List[str]) -> str:
+    """Hash of several catalog source files (the file's own fingerprint for a single source)."""
+    if len(json_paths) == 1:
+        return source_fingerprint(json_paths[0])
+    return cache_config.make_key([source_fingerprint(json_path) for json_path in json_paths])
+
+def compiled_path(json_path: str, catalog_dir: str = CATALOG_DIR) -> str:
+    """Directory holding the compiled form of a catalog source file."""
+    return os.path.join(catalog_dir, os.path.splitext(os.path.basename(json_path))[0])
+
+def _number(value, default=np.nan) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+def _spot_row(spot: dict) -> tuple:
+    """Numeric column values of one spot, in COLUMN_DTYPE order."""
+    wind = spot.get('wind_compatibility') or {}
+    swell = spot.get('swell_compatibility') or {}
+    tides = spot.get('tide_behavior') or {}
+    size_range = swell.get('ideal_swell_size_m') or [np.nan]
+    size_range = size_range if isinstance(size_range, list) else [size_range]
+    return (
+        _number(spot.get('latitude')), _number(spot.get('longitude')),
+        _number(wind.get('quality')), _number(swell.get('quality')),
+        _number(size_range[0]), _number(size_range[-1]),
+        *(_number((tides.get(state) or {}).get('quality')) for state in ('low', 'rising', 'high', 'falling')),
+        _number((spot.get('crowd_pressure') or {}).get('quality')),
+        rating_config.pack_sector_mask(rating_config.direction_sector_mask(wind.get('best_direction'))),
+        rating_config.pack_sector_mask(rating_config.direction_sector_mask(swell.get('ideal_swell_direction'))),
+    )
+
+def _write_atomic(path: str, write) -> None:
+    """Write a file through a temporary name so readers never see it half written."""
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+def assign_spot_ids(spots: List[dict]) -> List[tuple]:
+    """
+    (spot id, spot) pairs with unique ids: explicit 'id', else the name slug, suffixed on
+    collision (the suffixed id is then recorded on a copy of the spot).
+    """
+    assigned = []
+    seen = {}
+    for spot in spots:
+        spot_id = str(spot.get('id') or spot_slug(spot.get('name')))
+        if spot_id in seen:
+            seen[spot_id] += 1
+            spot_id = f"{spot_id}-{seen[spot_id]}"
+            spot = dict(spot, id=spot_id)
+        seen.setdefault(spot_id, 1)
+        assigned.append((spot_id, spot))
+    return assigned
+
+def write_catalog(spots: List[dict], out_dir: str, source: str, fingerprint: str) -> str:
+    """
+    Write spots in the binary catalog format:
+    - columns.npy: numeric and scoring fields as a structured array (memory-mapped on load)
+    - prose.bin + prose_offsets.npy: PROSE_FIELDS of each spot as UTF-8 JSON, read by offset
+    - meta.json: spot ids and the remaining (eager) fields, with the source fingerprint
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    spot_ids, eager_spots, blobs = [], [], []
+    for spot_id, spot in assign_spot_ids(spots):
+        spot_ids.append(spot_id)
+        eager_spots.append({name: value for name, value in spot.items() if name not in PROSE_FIELDS})
+        prose = {name: spot[name] for name in PROSE_FIELDS if name in spot}
+        blobs.append(json.dumps(prose, ensure_ascii=False).encode('utf-8'))
+
+    columns = np.array([_spot_row(spot) for spot in spots], dtype=COLUMN_DTYPE)
+    offsets = np.concatenate(([0], np.cumsum([len(blob) for blob in blobs]))).astype(np.int64)
+
+    _write_atomic(os.path.join(out_dir, COLUMNS_FILE), lambda f: np.save(f, columns))
+    _write_atomic(os.path.join(out_dir, PROSE_OFFSETS_FILE), lambda f: np.save(f, offsets))
+    _write_atomic(os.path.join(out_dir, PROSE_FILE), lambda f: f.write(b"".join(blobs)))
+    # Metadata last: it carries the fingerprint readers use to detect a stale catalog
+    meta = {
+        'format_version': CATALOG_FORMAT_VERSION,
+        'source': source,
+        'source_fingerprint': fingerprint,
+        'spot_ids': spot_ids,
+        'spots': eager_spots,
+    }
+    _write_atomic(os.path.join(out_dir, META_FILE),
+                  lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode('utf-8')))
+    return out_dir
+
+def read_spots(json_path: str) -> List[dict]:
+    """Spots of a JSON catalog source ({'spots': [...]})."""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('spots', [])
+
+def compile_catalog(json_path: str, catalog_dir: str = CATALOG_DIR) -> str:
+    """Compile a JSON spot catalog into its binary form (see write_catalog). Returns the output directory."""
+    spots = read_spots(json_path)
+    out_dir = write_catalog(spots, compiled_path(json_path, catalog_dir),
+                            os.path.basename(json_path), source_fingerprint(json_path))
+    logger.info(f"Compiled {len(spots)} spots from {json_path} into {out_dir}")
+    return out_dir
+
+def is_stale(json_path: str, catalog_dir: str = CATALOG_DIR) -> bool:
+    """True when the compiled catalog is missing, outdated or from another format version."""
+    try:
+        with open(os.path.join(compiled_path(json_path, catalog_dir), META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return True
+    return (meta.get('format_version') != CATALOG_FORMAT_VERSION or
+            meta.get('source_fingerprint') != source_fingerprint(json_path))
+
+class SpotCatalog:
+    """
+    A compiled spot catalog. spots holds the eager fields of every spot (what prompts and the
+    UI use), columns the numeric fields as a read-only memory-mapped structured array (what the
+    scoring profiles and the spatial index are built from), and prose() reads the long text
+    fields of one spot on demand.
+    Memory-mapped files are shared through the OS page cache by every process using them.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.fingerprint = meta.get('source_fingerprint')
+        self.spot_ids: List[str] = meta['spot_ids']
+        self.spots: List[dict] = meta['spots']
+        self.spot_index: Dict[str, int] = {spot_id: i for i, spot_id in enumerate(self.spot_ids)}
+        self.columns = np.load(os.path.join(path, COLUMNS_FILE), mmap_mode='r')
+        self._offsets = np.load(os.path.join(path, PROSE_OFFSETS_FILE), mmap_mode='r')
+        prose_path = os.path.join(path, PROSE_FILE)
+        self._prose = np.memmap(prose_path, dtype=np.uint8, mode='r') if os.path.getsize(prose_path) else None
+
+    def __len__(self) -> int:
+        return len(self.spot_ids)
+
+    @functools.cached_property
+    def profiles(self) -> rating_config.SpotProfiles:
+        """Scoring profiles of every spot, read from the columns once per catalog version (this instance)."""
+        columns = self.columns
+        return rating_config.SpotProfiles.from_arrays(
+            self.spot_ids,
+            wind_masks=rating_config.unpack_sector_masks(columns['wind_sectors']),
+            swell_masks=rating_config.unpack_sector_masks(columns['swell_sectors']),
+            swell_ranges=np.column_stack([columns['swell_min_m'], columns['swell_max_m']]),
+            wind_quality=columns['wind_quality'],
+            swell_quality=columns['swell_quality'],
+            tide_quality=np.column_stack([columns[f'tide_{state}'] for state in rating_config.TIDE_STATES]),
+        )
+
+    @functools.cached_property
+    def spatial_index(self) -> geo_config.SpotIndex:
+        """Spatial index over the latitude/longitude columns, rows aligned with spots."""
+        return geo_config.SpotIndex.from_coordinates(self.columns['latitude'], self.columns['longitude'])
+
+    def prose(self, spot_id: str) -> dict:
+        """Prose fields of one spot ({} when unknown)."""
+        i = self.spot_index.get(spot_id)
+        if i is None or self._prose is None:
+            return {}
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return json.loads(self._prose[start:end].tobytes().decode('utf-8'))
+
+def load_catalog(json_path: str, catalog_dir: str = CATALOG_DIR) -> SpotCatalog:
+    """Open the compiled form of a catalog, (re)compiling it first when stale."""
+    if is_stale(json_path, catalog_dir):
+        compile_catalog(json_path, catalog_dir)
+    return SpotCatalog(compiled_path(json_path, catalog_dir))
+
+def sources_mtimes(json_paths: Sequence[str]) -> tuple:
+    """Modification times of source files (None when missing), to notice edits cheaply."""
+    mtimes = []
+    for json_path in json_paths:
+        try:
+            mtimes.append(os.stat(json_path).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return tuple(mtimes)
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _get_catalog(json_path: str, mtimes: tuple) -> SpotCatalog:
+    return load_catalog(json_path)
+
+def get_catalog(json_path: str) -> SpotCatalog:
+    """
+    One shared catalog instance per source file for all sessions of the process. The source
+    mtime is checked on every access: an edited source is recompiled and reopened.
+    """
+    return _get_catalog(json_path, sources_mtimes([json_path]))
+
+def shard_catalog(json_paths: List[str], shard_dir: str = SHARD_DIR,
+                  precision: int = SHARD_GEOHASH_PRECISION) -> str:
+    """
+    Partition the spots of several sources into geohash tiles, each compiled as its own catalog
+    under shard_dir/<geohash>/, plus an index.json listing every shard with the bounding box
+    of its spots. Returns the path of the index.
+    """
+    spots = [spot for json_path in json_paths for spot in read_spots(json_path)]
+    shards: Dict[str, List[dict]] = {}
+    for _, spot in assign_spot_ids(spots):
+        lat, lon = _number(spot.get('latitude')), _number(spot.get('longitude'))
+        if np.isnan(lat) or np.isnan(lon):
+            logger.warning(f"Spot without valid coordinates left out of the shards: {spot.get('name', 'unknown')}")
+            continue
+        shards.setdefault(geo_config.geohash_encode(lat, lon, precision), []).append(spot)
+
+    fingerprint = sources_fingerprint(json_paths)
+    index = {
+        'format_version': CATALOG_FORMAT_VERSION,
+        'sources_fingerprint': fingerprint,
+        'precision': precision,
+        'shards': {},
+    }
+    for geohash, shard_spots in sorted(shards.items()):
+        write_catalog(shard_spots, os.path.join(shard_dir, geohash), geohash, fingerprint)
+        lats = [float(spot['latitude']) for spot in shard_spots]
+        lons = [float(spot['longitude']) for spot in shard_spots]
+        index['shards'][geohash] = {'bbox': [min(lats), min(lons), max(lats), max(lons)], 'count': len(shard_spots)}
+
+    index_path = os.path.join(shard_dir, SHARD_INDEX_FILE)
+    _write_atomic(index_path, lambda f: f.write(json.dumps(index, indent=2).encode('utf-8')))
+    logger.info(f"Sharded {len(spots)} spots from {len(json_paths)} sources into {len(shards)} shards")
+    return index_path
+
+def _bbox_distance_km(lat: float, lon: float, bbox: List[float]) -> float:
+    """Distance from a point to the nearest point of a bounding box (0 inside)."""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    return float(geo_config.haversine_km(lat, lon, min(max(lat, min_lat), max_lat), min(max(lon, min_lon), max_lon)))
+
+class ShardedCatalog:
+    """
+    Spot catalog split into geohash shards. Only the index (shard bounding boxes) is read upfront;
+    shards are opened on demand when a search intersects them, and kept for later searches.
+    """
+
+    def __init__(self, shard_dir: str = SHARD_DIR):
+        self.shard_dir = shard_dir
+        with open(os.path.join(shard_dir, SHARD_INDEX_FILE), 'r', encoding='utf-8') as f:
+            self.index = json.load(f)
+        self.shards = self.index['shards']
+        self._open: Dict[str, SpotCatalog] = {}
+        self._spot_shards: Dict[str, str] = {}
+
+    def shard(self, geohash: str) -> SpotCatalog:
+        """Open (once) and return one shard."""
+        if geohash not in self._open:
+            catalog = SpotCatalog(os.path.join(self.shard_dir, geohash))
+            self._spot_shards.update((spot_id, geohash) for spot_id in catalog.spot_ids)
+            self._open[geohash] = catalog
+        return self._open[geohash]
+
+    def profiles(self, spot_ids: Sequence[str]) -> rating_config.SpotProfiles:
+        """
+        Scoring profiles of spots of the opened shards, in the given order, from the profiles
+        each shard compiled once. KeyError for a spot of no opened shard.
+        """
+        geohashes = sorted({self._spot_shards[spot_id] for spot_id in spot_ids})
+        return rating_config.concat_profiles([self.shard(geohash).profiles for geohash in geohashes]).select(spot_ids)
+
+    def prose(self, spot_id: str) -> dict:
+        """Prose fields of a spot of an opened shard ({} when unknown)."""
+        geohash = self._spot_shards.get(spot_id)
+        return self.shard(geohash).prose(spot_id) if geohash else {}
+
+    def shards_for_search(self, lat: float, lon: float, radius_km: float, min_spots: int = 0) -> List[str]:
+        """
+        Shards whose bounding box is within radius_km of the point, nearest first; when they hold
+        fewer than min_spots spots, the next nearest shards are added until they do.
+        """
+        by_distance = sorted(self.shards, key=lambda geohash: _bbox_distance_km(lat, lon, self.shards[geohash]['bbox']))
+        selected = [geohash for geohash in by_distance
+                    if _bbox_distance_km(lat, lon, self.shards[geohash]['bbox']) <= radius_km]
+        count = sum(self.shards[geohash]['count'] for geohash in selected)
+        for geohash in by_distance[len(selected):]:
+            if count >= min_spots:
+                break
+            selected.append(geohash)
+            count += self.shards[geohash]['count']
+        return selected
+
+    def all_spots(self) -> List[dict]:
+        """Eager spot dicts of every shard (opens them all)."""
+        return [spot for geohash in self.shards for spot in self.shard(geohash).spots]
+
+    def spots_for_search(self, lat: float, lon: float, radius_km: float, min_spots: int = 0) -> List[dict]:
+        """Eager spot dicts of the shards selected by shards_for_search."""
+        geohashes = self.shards_for_search(lat, lon, radius_km, min_spots)
+        logger.info(f"Search around ({lat}, {lon}) loads {len(geohashes)} of {len(self.shards)} shards")
+        return [spot for geohash in geohashes for spot in self.shard(geohash).spots]
+
+    def spots_near(self, lat: float, lon: float, radius_km: float, min_spots: int = 0) -> List[dict]:
+        """
+        Same result as geo_config.spots_near over spots_for_search, answered by the column-backed
+        spatial index of each selected shard: copies of the spots within radius_km (else the
+        min_spots nearest), nearest first, carrying 'distance_km'.
+        """
+        shards = [self.shard(geohash) for geohash in self.shards_for_search(lat, lon, radius_km, min_spots)]
+        matches = [(distance, shard, i) for shard in shards
+                   for i, distance in shard.spatial_index.within_radius(lat, lon, radius_km)]
+        if len(matches) < min_spots:
+            logger.info(f"Only {len(matches)} spots within {radius_km} km, using the {min_spots} nearest")
+            matches = [(distance, shard, i) for shard in shards
+                       for i, distance in shard.spatial_index.nearest(lat, lon, min_spots)]
+            matches = sorted(matches, key=lambda match: match[0])[:min_spots]
+        else:
+            matches.sort(key=lambda match: match[0])
+        return [dict(shard.spots[i], distance_km=round(distance, 1)) for distance, shard, i in matches]
+
+def load_sharded_catalog(json_paths: List[str], shard_dir: str = SHARD_DIR) -> ShardedCatalog:
+    """Open the sharded catalog of the given sources, (re)building it first when stale."""
+    try:
+        with open(os.path.join(shard_dir, SHARD_INDEX_FILE), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        stale = (index.get('format_version') != CATALOG_FORMAT_VERSION or
+                 index.get('sources_fingerprint') != sources_fingerprint(json_paths))
+    except (OSError, ValueError):
+        stale = True
+    if stale:
+        shard_catalog(json_paths, shard_dir)
+    return ShardedCatalog(shard_dir)
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _get_sharded_catalog(json_paths: tuple, mtimes: tuple) -> ShardedCatalog:
+    return load_sharded_catalog(list(json_paths))
+
+def get_sharded_catalog(json_paths: tuple = tuple(CATALOG_SOURCES)) -> ShardedCatalog:
+    """
+    One shared sharded catalog for all sessions of the process, rebuilt and reopened on the
+    next access when a source file changes (mtimes are checked on every access).
+    """
+    return _get_sharded_catalog(tuple(json_paths), sources_mtimes(json_paths))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile JSON spot catalogs into the binary catalog format.")
+    parser.add_argument('sources', nargs='*',
+                        help="Catalog JSON files (default: data/*.json, or CATALOG_SOURCES with --shards)")
+    parser.add_argument('--out', default=CATALOG_DIR, help=f"Output directory (default: {CATALOG_DIR})")
+    parser.add_argument('--shards', action='store_true',
+                        help=f"Build the geohash-sharded catalog of the sources instead (default sources: {CATALOG_SOURCES})")
+    parser.add_argument('--precision', type=int, default=SHARD_GEOHASH_PRECISION, help="Geohash precision of the shards")
+    args = parser.parse_args()
+    if args.shards:
+        sources = args.sources or CATALOG_SOURCES
+        index_path = shard_catalog(sources, os.path.join(args.out, "shards"), args.precision)
+        print(f"{', '.join(sources)} -> {index_path}")
+        return
+    for source in args.sources or sorted(glob.glob(os.path.join("data", "*.json"))):
+        try:
+            out_dir = compile_catalog(source, args.out)
+            print(f"{source} -> {out_dir}")
+        except Exception as e:
+            logger.error(f"Error compiling {source}: {str(e)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Flattened name of a per-day statistic, e.g. 'wave_height_m__max'
+STAT_SEPARATOR = "__"
+
+class ForecastCube:
+    """
+    Compact spot × day × variable forecast container backed by a float array (NaN = missing).
+    Spots, dates and variables are indexed by dicts, so single-day lookups are O(1), while
+    sorting and filtering across spots are array operations. day() and days() return the
+    daily forecast dicts used by the rest of the app.
+    """
+
+    def __init__(self, spot_ids: Sequence[str], dates: Sequence[str], variables: Sequence[str],
+                 values: Optional[np.ndarray] = None):
+        self.spot_ids = list(spot_ids)
+        self.dates = [str(date) for date in dates]
+        self.variables = list(variables)
+        shape = (len(self.spot_ids), len(self.dates), len(self.variables))
+        self.values = np.full(shape, np.nan) if values is None else np.asarray(values, dtype=float).reshape(shape)
+        self.spot_index = {spot_id: i for i, spot_id in enumerate(self.spot_ids)}
+        self.date_index = {date: i for i, date in enumerate(self.dates)}
+        self.variable_index = {variable: i for i, variable in enumerate(self.variables)}
+
+    @classmethod
+    def from_records(cls, records_by_spot: Dict[str, Optional[list]],
+                     variables: Optional[Sequence[str]] = None) -> "ForecastCube":
+        """
+        Build a cube from daily forecast dicts per spot (as returned by get_stormglass_forecast).
+        Numeric fields become variables; entries of a 'stats' dict are flattened to
+        '<variable>__<stat>'.
+        """
+        flattened = {
+            spot_id: [cls._flatten_record(record) for record in (records or [])]
+            for spot_id, records in records_by_spot.items()
+        }
+        dates = sorted({record['date'] for records in flattened.values() for record in records})
+        if variables is None:
+            found = []
+            for records in flattened.values():
+                for record in records:
+                    found.extend(name for name in record if name != 'date' and name not in found)
+            variables = found
+
+        cube = cls(list(records_by_spot), dates, variables)
+        for spot_id, records in flattened.items():
+            spot_idx = cube.spot_index[spot_id]
+            for record in records:
+                date_idx = cube.date_index[record['date']]
+                for name, value in record.items():
+                    var_idx = cube.variable_index.get(name)
+                    if var_idx is not None:
+                        cube.values[spot_idx, date_idx, var_idx] = value
+        return cube
+
+    @staticmethod
+    def _flatten_record(record: dict) -> dict:
+        """Keep the date and numeric fields of a daily dict, flattening its 'stats' entry."""
+        flat = {'date': str(record['date'])}
+        for name, value in record.items():
+            if name == 'stats' and isinstance(value, dict):
+                for variable, stats in value.items():
+                    for stat, stat_value in (stats or {}).items():
+                        if isinstance(stat_value, (int, float)):
+                            flat[f"{variable}{STAT_SEPARATOR}{stat}"] = float(stat_value)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                flat[name] = float(value)
+        return flat
+
+    def __len__(self) -> int:
+        return len(self.spot_ids)
+
+    def has_day(self, spot_id: str, date: str) -> bool:
+        """True when the cube holds any value for this spot on this date."""
+        spot_idx = self.spot_index.get(spot_id)
+        date_idx = self.date_index.get(date)
+        if spot_idx is None or date_idx is None:
+            return False
+        return bool(np.any(~np.isnan(self.values[spot_idx, date_idx])))
+
+    def day(self, spot_id: str, date: str) -> Optional[dict]:
+        """Return the daily forecast dict of a spot on a date, or None when missing."""
+        if not self.has_day(spot_id, date):
+            return None
+        row = self.values[self.spot_index[spot_id], self.date_index[date]]
+        record = {'date': date}
+        stats = {}
+        for name, value in zip(self.variables, row):
+            if np.isnan(value):
+                continue
+            if STAT_SEPARATOR in name:
+                variable, stat = name.split(STAT_SEPARATOR, 1)
+                stats.setdefault(variable, {})[stat] = float(value)
+            else:
+                record[name] = float(value)
+        if stats:
+            record['stats'] = stats
+        return record
+
+    def days(self, spot_id: str) -> List[dict]:
+        """Return every available daily forecast dict of a spot, in date order."""
+        return [record for record in (self.day(spot_id, date) for date in self.dates) if record]
+
+    def variable(self, name: str) -> np.ndarray:
+        """(spots × days) view of one variable."""
+        return self.values[:, :, self.variable_index[name]]
+
+    def values_on(self, date: str, name: str) -> np.ndarray:
+        """Per-spot values of one variable on one date (NaN when unknown)."""
+        date_idx = self.date_index.get(date)
+        if date_idx is None or name not in self.variable_index:
+            return np.full(len(self.spot_ids), np.nan)
+        return self.values[:, date_idx, self.variable_index[name]]
+
+    def rank_spots(self, date: str, name: str, descending: bool = True) -> List[str]:
+        """Spot ids sorted by one variable on one date; spots without data come last."""
+        values = self.values_on(date, name)
+        keys = np.where(np.isnan(values), -np.inf if descending else np.inf, values)
+        order = np.argsort(-keys if descending else keys, kind='stable')
+        return [self.spot_ids[i] for i in order]
+
+    def select_spots(self, spot_ids: Iterable[str]) -> "ForecastCube":
+        """Sub-cube restricted to the given spots (unknown ids are ignored)."""
+        indices = [self.spot_index[spot_id] for spot_id in spot_ids if spot_id in self.spot_index]
+        return ForecastCube([self.spot_ids[i] for i in indices], self.dates, self.variables, self.values[indices])
+
+    def filter_spots(self, mask: np.ndarray) -> "ForecastCube":
+        """Sub-cube keeping the spots where the boolean mask (one entry per spot) is True."""
+        indices = np.flatnonzero(np.asarray(mask, dtype=bool))
+        return ForecastCube([self.spot_ids[i] for i in indices], self.dates, self.variables, self.values[indices])
@@ -7,13 +7,38 @@ import openai
 from openai import OpenAI, AsyncOpenAI
 import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
 import ast
 import os
 import time
 import asyncio
-import httpx
+import contextlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import re
+import numpy as np
+
+from . import cache_config
+from . import aggregation_config
+from . import cube_config
+from . import rating_config
+from . import geo_config
+from . import catalog_config
+from . import metrics_config
+from . import secrets_config
+from . import http_config
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # Older Streamlit releases
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+def get_spot_id(spot: dict) -> str:
+    """Return a stable identifier for a spot (explicit 'id' field or a slug of its name)."""
+    if spot.get('id'):
+        return str(spot['id'])
+    return catalog_config.spot_slug(spot.get('name', 'unknown'))
 
 def degrees_to_cardinal(degrees: float) -> str:
     try:
@@ -27,54 +52,49 @@ def degrees_to_cardinal(degrees: float) -> str:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-STORMGLASS_API_KEY = st.secrets["stormglass_api"]
+STORMGLASS_API_KEY = secrets_config.get_secret("stormglass_api")
+GPT_MODEL = "gpt-4o"
+STORMGLASS_PARAMS = "waveHeight,wavePeriod,waveDirection,windSpeed,windDirection"
+STORMGLASS_SOURCE = "noaa"
+# The NOAA wave model behind Stormglass is a 0.25° grid: spots in the same cell get the same data
+STORMGLASS_GRID_RESOLUTION_DEG = float(os.environ.get("STORMGLASS_GRID_RESOLUTION_DEG", 0.25))
 
-# Initialize OpenAI clients
+# Initialize OpenAI clients (the sync one on the shared connection pool)
 try:
-    client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-    async_client = AsyncOpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+    client = OpenAI(api_key=secrets_config.get_secret("OPENAI_API_KEY"), base_url=secrets_config.OPENAI_BASE_URL,
+                    timeout=http_config.OPENAI_TIMEOUT, http_client=http_config.get_openai_http_client())
+    async_client = AsyncOpenAI(api_key=secrets_config.get_secret("OPENAI_API_KEY"), base_url=secrets_config.OPENAI_BASE_URL)
     logger.info("OpenAI clients initialized successfully")
 except Exception as e:
     logger.error(f"Error initializing OpenAI clients: {str(e)}")
     client = None
     async_client = None
 
-# Create a semaphore to limit concurrent API calls
+# Upper bound on spots processed at once by the concurrent fan-out.
+# The semaphore itself is created per event loop in load_forecasts_concurrently:
+# an asyncio.Semaphore is bound to the loop it is first used on, so a
+# module-level instance cannot be shared between Streamlit script threads.
 MAX_CONCURRENT_CALLS = 5
-semaphore = asyncio.Semaphore(MAX_CONCURRENT_CALLS)
 
-async def get_surf_forecast_async(spot):
-    """
-    Async version of get_surf_forecast that gets surf forecast data for the next 7 days using ChatGPT.
-    Returns None if no valid forecast can be generated.
-    """
-    try:
-        if not async_client:
-            logger.error("Async OpenAI client not initialized")
-            return None
-            
-        today = datetime.now()
-        days = []
-        forecasts = []
-        
-        # Generate next 7 days
-        for i in range(7):
-            day = today + timedelta(days=i)
-            days.append(day)
-        
-        # Use semaphore to limit concurrent API calls
-        async with semaphore:
-            # Get GPT-generated forecast
-            response = await async_client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": """You are a surf forecasting expert with knowledge of global surf conditions.
+# Spots considered around the user's location; below MIN_NEARBY_SPOTS the nearest ones are used instead
+SEARCH_RADIUS_KM = float(os.environ.get("SURFMAP_SEARCH_RADIUS_KM", 50))
+MIN_NEARBY_SPOTS = 5
+
+# Stream the GPT analysis into the spot cards as it is generated (SURFMAP_STREAM_ANALYSIS=false to disable)
+STREAM_ANALYSIS = os.environ.get("SURFMAP_STREAM_ANALYSIS", "true").lower() not in ("false", "0", "no")
+
+FORECAST_SYSTEM_PROMPT = """You are a surf forecasting expert with knowledge of global surf conditions.
 You provide accurate, realistic surf forecasts based on:
 - Location and regional patterns
 - Seasonal conditions
 - Local weather systems
-- Ocean and coastal dynamics"""},
-                    {"role": "user", "content": f"""Generate a 7-day forecast for:
+- Ocean and coastal dynamics"""
+
+def build_forecast_messages(spot: dict, forecast_date: str) -> list:
+    """Build the chat messages asking GPT for a 7-day forecast starting at forecast_date."""
+    return [
+        {"role": "system", "content": FORECAST_SYSTEM_PROMPT},
+        {"role": "user", "content": f"""Generate a 7-day forecast starting from {forecast_date} for:
 Location: {spot.get('name', 'Unknown')}, {spot.get('region', 'Unknown')}
 Coordinates: {spot.get('latitude', 0)}, {spot.get('longitude', 0)}
 Type: {spot.get('type', 'Unknown')}
@@ -104,43 +124,53 @@ IMPORTANT:
 - Wind directions must be cardinal points (N, NE, E, SE, etc.)
 - Tide states must be one of: low/rising/high/falling
 - Daily rating must be between 0 and 10"""}
-                ],
+    ]
+
+async def get_surf_forecast_async(spot, selected_start_date: Optional[str] = None,
+                                  semaphore: Optional[asyncio.Semaphore] = None,
+                                  openai_client: Optional[AsyncOpenAI] = None):
+    """
+    Async version of get_surf_forecast that gets surf forecast data for the next 7 days using ChatGPT.
+    The optional semaphore must belong to the running event loop.
+    Unlike get_surf_forecast, this path does not go through the st.cache_data layer of
+    get_cached_gpt_response (it cannot be awaited): the persistent cache, whose entries both
+    paths share, is its only cache, so each rerun costs one SQLite read per spot.
+    Returns None if no valid forecast can be generated.
+    """
+    try:
+        openai_client = openai_client or async_client
+        if not openai_client:
+            logger.error("Async OpenAI client not initialized")
+            return None
+
+        forecast_date = selected_start_date or datetime.now().strftime('%Y-%m-%d')
+        messages = build_forecast_messages(spot, forecast_date)
+
+        # Shares its persistent cache entries with get_cached_gpt_response (the only cache on this path)
+        cache_key = cache_config.versioned_key('forecast', 'gpt_forecast', messages)
+        cached = cache_config.cache_get('forecast', cache_key)
+        if cached:
+            return process_gpt_response(cached['response'], spot.get('name', 'Unknown'))
+
+        # Use semaphore to limit concurrent API calls
+        async with (semaphore or contextlib.nullcontext()):
+            # Get GPT-generated forecast
+            metrics_config.count_api_call('openai')
+            response = await openai_client.chat.completions.create(
+                model=GPT_MODEL,
+                messages=messages,
                 max_tokens=1000,
                 temperature=0.7
             )
-        
+
         # Parse the GPT forecast
-        forecast_str = response.choices[0].message.content.strip()
-        start_idx = forecast_str.find('{')
-        end_idx = forecast_str.rfind('}') + 1
-        if start_idx == -1 or end_idx <= start_idx:
-            logger.error(f"Invalid forecast format for {spot.get('name', 'Unknown')}")
-            return None
-            
-        try:
-            forecast_data = json.loads(forecast_str[start_idx:end_idx])
-            if not isinstance(forecast_data, dict) or 'forecast' not in forecast_data:
-                logger.error(f"Missing forecast data for {spot.get('name', 'Unknown')}")
-                return None
-            
-            # Validate and process each day's forecast
-            for day_forecast in forecast_data['forecast']:
-                if not all(key in day_forecast for key in ['date', 'wave_height_m', 'wave_period_s', 'wind_speed_m_s', 'wind_direction', 'tide_state', 'daily_rating']):
-                    logger.error(f"Missing required fields in forecast for {spot.get('name', 'Unknown')}")
-                    return None
-                
-                # Ensure wave height has all required fields
-                wave_height = day_forecast['wave_height_m']
-                if not all(key in wave_height for key in ['min', 'max', 'average']):
-                    logger.error(f"Invalid wave height format for {spot.get('name', 'Unknown')}")
-                    return None
-            
-            return forecast_data['forecast']
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Error parsing forecast JSON for {spot.get('name', 'Unknown')}: {str(e)}")
-            return None
-            
+        response_text = response.choices[0].message.content.strip()
+        forecast = process_gpt_response(response_text, spot.get('name', 'Unknown'))
+        if forecast:
+            cache_config.cache_set('forecast', cache_key, {'response': response_text},
+                                   spot_id=get_spot_id(spot), forecast_date=forecast_date)
+        return forecast
+
     except Exception as e:
         logger.error(f"Error getting forecast for {spot.get('name', 'Unknown')}: {str(e)}")
         return None
@@ -165,67 +195,36 @@ def get_surf_forecast(spot, selected_start_date: str):
         logger.error(f"Error in forecast for {spot.get('name', 'Unknown')}: {str(e)}")
         return None
 
+@metrics_config.timed('gpt_forecast', cached=True)
 @st.cache_data(ttl=21600, show_spinner=False)  # Cache for 6 hours, hide spinner
 def get_cached_gpt_response(spot_name: str, spot_data: str, forecast_date: str) -> dict:
     """
     Cached wrapper for GPT API calls.
-    Returns the raw GPT response for caching.
+    Reads through the persistent cache so that restarted instances reuse earlier responses.
+    Returns the raw GPT response for caching. Failures raise, so that they are not cached and
+    the next call retries (get_surf_forecast turns them into None).
     """
-    try:
-        if not client:
-            logger.error("OpenAI client not initialized")
-            return None
-            
-        spot = json.loads(spot_data)
-        today = datetime.strptime(forecast_date, '%Y-%m-%d')
-        
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": """You are a surf forecasting expert with knowledge of global surf conditions.
-You provide accurate, realistic surf forecasts based on:
-- Location and regional patterns
-- Seasonal conditions
-- Local weather systems
-- Ocean and coastal dynamics"""},
-                {"role": "user", "content": f"""Generate a 7-day forecast starting from {forecast_date} for:
-Location: {spot.get('name', 'Unknown')}, {spot.get('region', 'Unknown')}
-Coordinates: {spot.get('latitude', 0)}, {spot.get('longitude', 0)}
-Type: {spot.get('type', 'Unknown')}
-Orientation: {spot.get('orientation', 'Unknown')}
-Best Season: {spot.get('best_season', 'Unknown')}
+    spot = json.loads(spot_data)
+    messages = build_forecast_messages(spot, forecast_date)
+    cache_key = cache_config.versioned_key('forecast', 'gpt_forecast', messages)
+    cached = cache_config.cache_get('forecast', cache_key)
+    if cached:
+        return cached
 
-Return forecast data in this format:
-{{
-      "forecast": [
-        {{
-      "date": "YYYY-MM-DD",
-      "wave_height_m": {{ "min": float, "max": float, "average": float }},
-      "wave_period_s": float,
-      "wave_energy_kj_m2": float,
-      "wind_speed_m_s": float,
-      "wind_direction": "direction",
-      "tide_state": "low/rising/high/falling",
-      "daily_rating": float
-    }}
-  ]
-}}
+    if not client:
+        raise RuntimeError("OpenAI client not initialized")
 
-IMPORTANT:
-- Provide realistic values based on current conditions and weather patterns
-- Consider seasonal patterns and local geography
-- All numeric values must be realistic and in metric units
-- Wind directions must be cardinal points (N, NE, E, SE, etc.)
-- Tide states must be one of: low/rising/high/falling
-- Daily rating must be between 0 and 10"""}
-            ],
-            max_tokens=1000,
-            temperature=0.7
-        )
-        return {'response': response.choices[0].message.content.strip()}
-    except Exception as e:
-        logger.error(f"Error getting GPT response for {spot_name}: {str(e)}")
-        return None
+    metrics_config.count_api_call('openai')
+    response = client.chat.completions.create(
+        model=GPT_MODEL,
+        messages=messages,
+        max_tokens=1000,
+        temperature=0.7
+    )
+    result = {'response': response.choices[0].message.content.strip()}
+    cache_config.cache_set('forecast', cache_key, result,
+                           spot_id=get_spot_id(spot), forecast_date=forecast_date)
+    return result
 
 def process_gpt_response(response_text: str, spot_name: str) -> list:
     """Process the GPT response text into forecast data."""
@@ -287,6 +286,7 @@ def get_forecasts_batch(spots):
             forecasts.append(None)
     return forecasts
 
+@metrics_config.timed('geocoding')
 def get_coordinates(address: str) -> Tuple[Optional[float], Optional[float]]:
     """
     Convert an address to coordinates using Google Maps Geocoding API.
@@ -367,32 +367,9 @@ def analyze_spot_conditions(spot, all_forecasts):
         logger.error(f"Error analyzing spot conditions for {spot['name']}: {str(e)}")
         return []
 
-@st.cache_data(ttl=21600, show_spinner=False)  # Cache for 6 hours, hide spinner
-def get_conditions_analysis(spot: dict, date: str) -> str:
-    """
-    Generate an analysis for a specific spot on a specific date using:
-    - Stormglass real forecast data
-    - Static spot metadata
-    Returns a GPT-generated analysis string.
-    """
-    try:
-        logger.info(f"[get_conditions_analysis] Starting for spot: {spot.get('name')} on date: {date}")
-        
-        sg_forecasts = get_stormglass_forecast(spot)
-        logger.info(f"[get_conditions_analysis] Stormglass forecasts received: {json.dumps(sg_forecasts, indent=2) if sg_forecasts else None}")
-        
-        if not sg_forecasts:
-            logger.warning(f"[get_conditions_analysis] No Stormglass forecast available for {spot.get('name')}")
-            return "Stormglass forecast unavailable. Cannot generate analysis."
-
-        forecast_for_day = next((f for f in sg_forecasts if f["date"] == date), None)
-        logger.info(f"[get_conditions_analysis] Forecast for day {date}: {json.dumps(forecast_for_day, indent=2) if forecast_for_day else None}")
-        
-        if not forecast_for_day:
-            logger.warning(f"[get_conditions_analysis] No forecast found for date {date}")
-            return "No forecast data available for this date. Please check back later or try a different day."
-
-        context = f"""
+def build_conditions_analysis_prompt(spot: dict, date: str, forecast_for_day: dict) -> str:
+    """Build the GPT prompt assessing a spot on a given date from its Stormglass day forecast."""
+    context = f"""
 You're a surf forecasting expert.
 
 Your task is to assess how suitable the surf will be on {date} at {spot['name']} (Portugal), based on:
@@ -423,9 +400,7 @@ Give 1–2 surf tips if relevant (e.g., best tide, crowd notes, local insight).
 
 Your answer should be surfer-friendly but based on real analysis.
 """
-        logger.info(f"[get_conditions_analysis] GPT Context prepared for {spot.get('name')}")
-
-        prompt = f"""Given the surf spot data and real forecast below, assess how good the conditions will be for surfers on {date}. 
+    return f"""Given the surf spot data and real forecast below, assess how good the conditions will be for surfers on {date}. 
 Format your response EXACTLY like this, with each section on a new line:
 
 **🌀 Wave & Swell:** [Your wave and swell analysis here]
@@ -440,23 +415,77 @@ Do not add any other sections or change the format.
 Context:
 {context}
 """
-        logger.info(f"[get_conditions_analysis] Sending prompt to GPT for {spot.get('name')}")
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.5,
-        )
+@metrics_config.timed('conditions_analysis', cached=True)
+@st.cache_data(ttl=21600, show_spinner=False)  # Cache for 6 hours, hide spinner
+def _cached_conditions_analysis(spot: dict, date: str, forecast_for_day: dict) -> str:
+    """
+    Cached body of get_conditions_analysis, keyed on the Stormglass day it analyses. GPT
+    failures raise, so that they are not cached and the next call retries.
+    """
+    prompt = build_conditions_analysis_prompt(spot, date, forecast_for_day)
+    logger.info(f"[get_conditions_analysis] GPT prompt prepared for {spot.get('name')}")
+
+    cache_key = cache_config.versioned_key('forecast', 'conditions_analysis', prompt)
+    cached = cache_config.cache_get('forecast', cache_key)
+    if cached:
+        logger.info(f"[get_conditions_analysis] Persistent cache hit for {spot.get('name')}")
+        return cached
+
+    logger.info(f"[get_conditions_analysis] Sending prompt to GPT for {spot.get('name')}")
+
+    metrics_config.count_api_call('openai')
+    response = client.chat.completions.create(
+        model=GPT_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.5,
+    )
+
+    logger.info(f"[GPT Raw Output - {spot['name']} on {date}] {response.choices[0].message.content}")
+    logger.info(f"[get_conditions_analysis] GPT Response received for {spot.get('name')}")
 
-        logger.info(f"[GPT Raw Output - {spot['name']} on {date}] {response.choices[0].message.content}")
-        logger.info(f"[get_conditions_analysis] GPT Response received for {spot.get('name')}")
+    analysis = response.choices[0].message.content.strip()
+    cache_config.cache_set('forecast', cache_key, analysis,
+                           spot_id=get_spot_id(spot), forecast_date=date)
+    return analysis
 
-        return response.choices[0].message.content.strip()
+def get_conditions_analysis(spot: dict, date: str,
+                            _sg_forecasts: Optional[Union[list, cube_config.ForecastCube]] = None) -> str:
+    """
+    Generate an analysis for a specific spot on a specific date using:
+    - Stormglass real forecast data
+    - Static spot metadata
+    _sg_forecasts can carry Stormglass data already fetched by the caller, as a list of daily
+    forecasts or a ForecastCube holding this spot. Only the day analysed is part of the cache
+    key: missing Stormglass data and failures return a message that is not cached, so a later
+    call with complete data gets the analysis.
+    Returns a GPT-generated analysis string.
+    """
+    logger.info(f"[get_conditions_analysis] Starting for spot: {spot.get('name')} on date: {date}")
+    try:
+        sg_forecasts = _sg_forecasts if _sg_forecasts is not None else get_stormglass_forecast(spot)
+        sg_cube = sg_forecasts if isinstance(sg_forecasts, cube_config.ForecastCube) else \
+            cube_config.ForecastCube.from_records({get_spot_id(spot): sg_forecasts})
+        logger.info(f"[get_conditions_analysis] Stormglass forecasts received for {len(sg_cube.dates)} days")
+
+        if not sg_cube.dates:
+            logger.warning(f"[get_conditions_analysis] No Stormglass forecast available for {spot.get('name')}")
+            return "Stormglass forecast unavailable. Cannot generate analysis."
 
+        forecast_for_day = sg_cube.day(get_spot_id(spot), date)
+        logger.info(f"[get_conditions_analysis] Forecast for day {date}: {json.dumps(forecast_for_day, indent=2) if forecast_for_day else None}")
+
+        if not forecast_for_day:
+            logger.warning(f"[get_conditions_analysis] No forecast found for date {date}")
+            return "No forecast data available for this date. Please check back later or try a different day."
+
+        return _cached_conditions_analysis(spot, date, forecast_for_day)
     except Exception as e:
         logger.error(f"[get_conditions_analysis] GPT analysis failed for {spot.get('name')} on {date}: {e}")
         return "Error generating analysis."
 
+get_conditions_analysis.clear = _cached_conditions_analysis.clear
+
 def calculate_spot_rating(spot, forecast_conditions):
     """
     Calculate a spot's rating based on how well current conditions match its ideal characteristics.
@@ -497,7 +526,8 @@ def calculate_spot_rating(spot, forecast_conditions):
 
 def load_lisbon_spots(file_obj=None):
     """
-    Load surf spots from the Lisbon area JSON file.
+    Load surf spots from the Lisbon area JSON file, through its compiled binary catalog
+    (see catalog_config) unless a file is uploaded.
     Args:
         file_obj: Optional file-like object from st.file_uploader
     """
@@ -533,9 +563,10 @@ def load_lisbon_spots(file_obj=None):
                     logger.error(f"JSON file not found at: {json_path}")
                     return []
                 
-                logger.info(f"Loading spots from: {json_path}")
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    file_content = f.read()
+                # Compiled catalog shared by all sessions; prose fields stay on disk until needed
+                catalog = catalog_config.get_catalog(json_path)
+                logger.info(f"Loaded {len(catalog)} spots from compiled catalog {catalog.path}")
+                return list(catalog.spots)
             except Exception as e:
                 logger.error(f"Error reading file: {str(e)}")
                 return []
@@ -603,22 +634,12 @@ def get_spot_forecast(spot):
         logger.error(f"Error generating spot forecast for {spot.get('name', 'unknown')}: {str(e)}")
         return None
 
-@st.cache_data(ttl=21600, show_spinner=False)  # Cache for 6 hours, hide spinner
-def get_quick_summary(spot, forecast):
-    """
-    Generate a quick 1-2 sentence summary of why this spot is recommended today.
-    Cached for 6 hours based on spot name and forecast date.
-    """
-    try:
-        logger.info(f"[get_quick_summary] Starting for spot: {spot.get('name')} on date: {forecast.get('date')}")
-        logger.info(f"[get_quick_summary] Input forecast data: {json.dumps(forecast, indent=2)}")
-
-        # Safely handle wind direction conversion
-        wind_deg = forecast.get('wind_direction_deg')
-        wind_cardinal = degrees_to_cardinal(wind_deg) if isinstance(wind_deg, (float, int)) else "Unknown"
-        logger.info(f"[get_quick_summary] Wind direction: {wind_deg} degrees -> {wind_cardinal}")
-
-        context = f"""
+def build_quick_summary_prompt(spot: dict, forecast: dict) -> str:
+    """Build the GPT prompt for the 1-2 sentence quick summary of a spot-day."""
+    # Safely handle wind direction conversion
+    wind_deg = forecast.get('wind_direction_deg')
+    wind_cardinal = degrees_to_cardinal(wind_deg) if isinstance(wind_deg, (float, int)) else "Unknown"
+    return f"""
 You're a surf forecaster.
 
 Give a **short and sharp** summary of the surf quality at {spot['name']} on {forecast['date']}, based on the forecast and spot compatibility.
@@ -632,69 +653,360 @@ Use the info below:
 
 Keep it to 1-2 sentences max, and be direct about whether it's good or not.
 """
-        logger.info(f"[get_quick_summary] GPT Context prepared: {context}")
 
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": context}],
-            temperature=0.5,
-        )
+@metrics_config.timed('quick_summary', cached=True)
+@st.cache_data(ttl=21600, show_spinner=False)  # Cache for 6 hours, hide spinner
+def _cached_quick_summary(spot, forecast):
+    """Cached body of get_quick_summary. Failures raise, so that they are not cached and the next call retries."""
+    logger.info(f"[get_quick_summary] Starting for spot: {spot.get('name')} on date: {forecast.get('date')}")
+    logger.info(f"[get_quick_summary] Input forecast data: {json.dumps(forecast, indent=2)}")
+
+    context = build_quick_summary_prompt(spot, forecast)
+    logger.info(f"[get_quick_summary] GPT Context prepared: {context}")
+
+    cache_key = cache_config.versioned_key('forecast', 'quick_summary', context)
+    cached = cache_config.cache_get('forecast', cache_key)
+    if cached:
+        logger.info(f"[get_quick_summary] Persistent cache hit for {spot['name']}")
+        return cached
+
+    metrics_config.count_api_call('openai')
+    response = client.chat.completions.create(
+        model=GPT_MODEL,
+        messages=[{"role": "user", "content": context}],
+        temperature=0.5,
+    )
 
-        logger.info(f"[GPT Raw Output - {spot['name']} on {forecast['date']}] {response.choices[0].message.content}")
-        logger.info(f"[get_quick_summary] GPT Response received for {spot['name']}")
+    logger.info(f"[GPT Raw Output - {spot['name']} on {forecast['date']}] {response.choices[0].message.content}")
+    logger.info(f"[get_quick_summary] GPT Response received for {spot['name']}")
 
-        return response.choices[0].message.content.strip()
+    summary = response.choices[0].message.content.strip()
+    cache_config.cache_set('forecast', cache_key, summary,
+                           spot_id=get_spot_id(spot), forecast_date=forecast['date'])
+    return summary
 
+def get_quick_summary(spot, forecast):
+    """
+    Generate a quick 1-2 sentence summary of why this spot is recommended today.
+    Cached for 6 hours based on spot name and forecast date; "Summary not available." on failure (not cached).
+    """
+    try:
+        return _cached_quick_summary(spot, forecast)
     except Exception as e:
         logger.error(f"[get_quick_summary] Error generating quick summary for {spot.get('name')}: {str(e)}")
         return "Summary not available."
 
-def load_forecast_data(address: str, day_list: list, coordinates: list) -> list:
+get_quick_summary.clear = _cached_quick_summary.clear
+
+def load_candidate_spots(coordinates: Optional[list], radius_km: float = SEARCH_RADIUS_KM,
+                         min_spots: int = MIN_NEARBY_SPOTS) -> list:
+    """
+    Spots that can match a search: only those of the catalog shards around coordinates
+    (see catalog_config.ShardedCatalog). An uploaded catalog, or missing coordinates,
+    fall back to load_lisbon_spots.
+    """
+    if st.session_state.get('surf_spots_data'):
+        return load_lisbon_spots()
+    try:
+        lat, lon = float(coordinates[0]), float(coordinates[1])
+    except (TypeError, ValueError, IndexError):
+        return load_lisbon_spots()
+    try:
+        return catalog_config.get_sharded_catalog().spots_for_search(lat, lon, radius_km, min_spots)
+    except Exception as e:
+        logger.error(f"Error loading catalog shards, using the full catalog: {str(e)}")
+        return load_lisbon_spots()
+
+def select_nearby_spots(spots: list, coordinates: Optional[list], radius_km: float = SEARCH_RADIUS_KM,
+                        min_spots: int = MIN_NEARBY_SPOTS) -> list:
+    """
+    Spots within radius_km of coordinates (falling back to the min_spots nearest), nearest first,
+    with their 'distance_km'. Without usable coordinates every spot is returned unchanged.
+    """
+    try:
+        lat, lon = float(coordinates[0]), float(coordinates[1])
+    except (TypeError, ValueError, IndexError):
+        logger.warning(f"No usable coordinates ({coordinates}), processing all {len(spots)} spots")
+        return spots
+    nearby = geo_config.spots_near(spots, lat, lon, radius_km, min_spots)
+    logger.info(f"{len(nearby)} of {len(spots)} spots selected within {radius_km} km of ({lat}, {lon})")
+    return nearby
+
+def load_nearby_spots(coordinates: Optional[list], radius_km: float = SEARCH_RADIUS_KM,
+                      min_spots: int = MIN_NEARBY_SPOTS) -> list:
+    """
+    Spots near coordinates, as select_nearby_spots(load_candidate_spots(...)). Catalog searches
+    are answered by the column-backed spatial index of the catalog shards; uploaded catalogs,
+    missing coordinates or an unreadable catalog go through the JSON spots.
+    """
+    if not st.session_state.get('surf_spots_data'):
+        try:
+            lat, lon = float(coordinates[0]), float(coordinates[1])
+            nearby = catalog_config.get_sharded_catalog().spots_near(lat, lon, radius_km, min_spots)
+            logger.info(f"{len(nearby)} catalog spots selected within {radius_km} km of ({lat}, {lon})")
+            return nearby
+        except (TypeError, ValueError, IndexError):
+            pass
+        except Exception as e:
+            logger.error(f"Error searching the catalog shards, using the JSON spots: {str(e)}")
+    return select_nearby_spots(load_candidate_spots(coordinates, radius_km, min_spots), coordinates, radius_km, min_spots)
+
+def get_spot_details(spot: dict) -> dict:
+    """
+    Prose fields of a spot (local tips, access, ...), read on demand from the compiled catalog.
+    Spots of an uploaded catalog carry them already.
+    """
+    details = {field: spot[field] for field in catalog_config.PROSE_FIELDS if spot.get(field)}
+    if details or st.session_state.get('surf_spots_data'):
+        return details
+    try:
+        return catalog_config.get_sharded_catalog().prose(get_spot_id(spot))
+    except Exception as e:
+        logger.error(f"Error reading the details of {spot.get('name')}: {str(e)}")
+        return {}
+
+@metrics_config.timed('load_forecast_data')
+def load_forecast_data(address: str, day_list: list, coordinates: list, concurrent: bool = True,
+                       selected_date: Optional[str] = None, lazy_analysis: bool = True) -> list:
     """
     Load forecast data for all spots in the specified area.
+    The 7-day forecast starts at the first day of day_list. With lazy_analysis (default) no GPT
+    analysis is generated here: spots are ranked on their numeric score and only the displayed
+    ones are analysed (stream_day_analysis / ensure_day_analysis). Otherwise the analysis is
+    generated upfront for selected_date (default: the first day) for every spot.
+    With concurrent=True the spots are processed in parallel (see load_forecasts_concurrently),
+    otherwise one after another.
     Returns a list of spots with their forecasts.
     """
     try:
         logger.info("Starting to load forecast data")
         logger.info(f"Input - Address: {address}, Day list: {day_list}, Coordinates: {coordinates}")
         
-        # Load spots from JSON file
-        spots = load_lisbon_spots()
+        # Only spots near the user's location go through the forecast pipeline
+        spots = load_nearby_spots(coordinates)
         if not spots:
-            logger.error("No spots found to process")
+            logger.error("No spots found near the given location")
             return []
-            
-        logger.info(f"Loaded {len(spots)} spots from {address} area data")
+        # Scoring profiles come precompiled with the catalog
+        profiles = get_spot_profiles(spots)
+
+        # Nearby spots share Stormglass grid cells, fetched once per run
+        grid_report = get_stormglass_grid_report(spots)
+        st.session_state.stormglass_grid_report = grid_report
+        logger.info(f"[Stormglass] {grid_report['spots']} spots map to {grid_report['cells']} grid cells, "
+                    f"saving {grid_report['requests_saved']} requests this run")
         
-        # Get the selected date
-        selected_date = day_list[0] if day_list and len(day_list) > 0 else datetime.now().strftime('%Y-%m-%d')
-        logger.info(f"Using selected date: {selected_date}")
+        # Get the forecast start date and the date to analyse
+        start_date = day_list[0] if day_list and len(day_list) > 0 else datetime.now().strftime('%Y-%m-%d')
+        selected_date = selected_date or start_date
+        analysis_dates = [] if lazy_analysis else [selected_date]
+        logger.info(f"Using start date: {start_date}, selected date: {selected_date}, lazy analysis: {lazy_analysis}")
         
-        # Process each spot
+        # Process each spot, fetching Stormglass data at most once per spot for this run
+        sg_memo = cache_config.RequestMemo()
         spots_with_forecast = []
         with st.spinner("🔄 Analyzing surf spots..."):
             progress_text = st.empty()
-            for i, spot in enumerate(spots):
-                try:
-                    progress_text.markdown(f"⏳ Analyzing {spot.get('name', 'Spot')} ({i+1}/{len(spots)})")
-                    # Generate forecast for the spot
-                    forecast = generate_forecast_for_spot(spot, selected_date)
-                    
+            if concurrent:
+                forecasts = load_forecasts_concurrently(
+                    spots,
+                    start_date,
+                    progress_callback=lambda done, total, name: progress_text.markdown(f"⏳ Analyzed {name} ({done}/{total})"),
+                    sg_memo=sg_memo,
+                    analysis_dates=analysis_dates
+                )
+                for spot, forecast in zip(spots, forecasts):
                     # Create a copy of the spot with forecast
                     spot_with_forecast = spot.copy()
                     spot_with_forecast['forecast'] = forecast
-                    
                     spots_with_forecast.append(spot_with_forecast)
-                except Exception as e:
-                    logger.error(f"Error processing spot {spot.get('name', 'unknown')}: {str(e)}")
-                    continue
+            else:
+                for i, spot in enumerate(spots):
+                    try:
+                        progress_text.markdown(f"⏳ Analyzing {spot.get('name', 'Spot')} ({i+1}/{len(spots)})")
+                        # Generate forecast for the spot
+                        forecast = generate_forecast_for_spot(spot, start_date, sg_memo=sg_memo,
+                                                              analysis_dates=analysis_dates)
+                    
+                        # Create a copy of the spot with forecast
+                        spot_with_forecast = spot.copy()
+                        spot_with_forecast['forecast'] = forecast
+                    
+                        spots_with_forecast.append(spot_with_forecast)
+                    except Exception as e:
+                        logger.error(f"Error processing spot {spot.get('name', 'unknown')}: {str(e)}")
+                        continue
             progress_text.empty()
+
+        # Score every spot-day in one vectorized pass (Stormglass data is already in the run memo)
+        apply_batch_scores(spots_with_forecast, sg_memo, profiles=profiles)
         
         return spots_with_forecast
     except Exception as e:
         logger.error(f"Error loading forecast data: {str(e)}")
         return []
 
+def _attach_script_run_ctx(ctx):
+    """Thread initializer attaching the Streamlit script context of the caller to a worker thread."""
+    if ctx is not None and add_script_run_ctx is not None:
+        add_script_run_ctx(threading.current_thread(), ctx)
+
+def run_coroutine_sync(coro):
+    """
+    Run a coroutine to completion from synchronous code.
+    Streamlit script threads have no running event loop, so a fresh one is used.
+    If the caller is already inside an event loop, the coroutine runs on a helper thread instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+    with ThreadPoolExecutor(max_workers=1, initializer=_attach_script_run_ctx, initargs=(ctx,)) as pool:
+        return pool.submit(metrics_config.bind_context(asyncio.run), coro).result()
+
+async def generate_forecast_for_spot_async(spot: dict, selected_date: str, semaphore: asyncio.Semaphore,
+                                           executor: ThreadPoolExecutor,
+                                           openai_client: Optional[AsyncOpenAI] = None,
+                                           sg_memo: Optional[cache_config.RequestMemo] = None,
+                                           analysis_dates: Optional[list] = None) -> list:
+    """
+    Async version of generate_forecast_for_spot.
+    The base GPT forecast is awaited with get_surf_forecast_async, the blocking Stormglass
+    and analysis stages run on the executor. The semaphore bounds how many spots are in flight.
+    """
+    try:
+        async with semaphore:
+            with metrics_config.span('gpt_forecast'):
+                forecast_data = await get_surf_forecast_async(spot, selected_date, openai_client=openai_client)
+            if not forecast_data:
+                logger.error(f"[generate_forecast_for_spot_async] Failed to get base forecast for {spot.get('name')}")
+                return None
+
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                executor, metrics_config.bind_context(generate_forecast_for_spot),
+                spot, selected_date, forecast_data, sg_memo, analysis_dates
+            )
+    except Exception as e:
+        logger.error(f"[generate_forecast_for_spot_async] Error for {spot.get('name', 'Unknown')}: {str(e)}")
+        return None
+
+async def _load_forecasts_async(spots: list, selected_date: str, max_concurrent_calls: int,
+                                progress_callback=None, script_ctx=None, sg_memo=None,
+                                analysis_dates=None) -> list:
+    """Fan out generate_forecast_for_spot_async over all spots, keeping the input order."""
+    # Created inside the running loop so that they are never shared between loops
+    semaphore = asyncio.Semaphore(max_concurrent_calls)
+    completed = 0
+
+    async def run_spot(spot, openai_client):
+        nonlocal completed
+        forecast = await generate_forecast_for_spot_async(
+            spot, selected_date, semaphore, executor, openai_client, sg_memo, analysis_dates
+        )
+        completed += 1
+        if progress_callback:
+            try:
+                progress_callback(completed, len(spots), spot.get('name', 'Spot'))
+            except Exception as e:
+                logger.warning(f"Progress callback failed: {str(e)}")
+        return forecast
+
+    with ThreadPoolExecutor(max_workers=max_concurrent_calls,
+                            initializer=_attach_script_run_ctx,
+                            initargs=(script_ctx,)) as executor:
+        if async_client is None:
+            return await asyncio.gather(*(run_spot(spot, None) for spot in spots))
+        # The async OpenAI client holds connections bound to the current loop: one pool per run
+        async with AsyncOpenAI(api_key=secrets_config.get_secret("OPENAI_API_KEY"),
+                               base_url=secrets_config.OPENAI_BASE_URL, timeout=http_config.OPENAI_TIMEOUT,
+                               http_client=http_config.new_async_client(http_config.OPENAI_TIMEOUT)) as openai_client:
+            return await asyncio.gather(*(run_spot(spot, openai_client) for spot in spots))
+
+def load_forecasts_concurrently(spots: list, selected_date: str,
+                                max_concurrent_calls: int = MAX_CONCURRENT_CALLS,
+                                progress_callback=None,
+                                sg_memo: Optional[cache_config.RequestMemo] = None,
+                                analysis_dates: Optional[list] = None) -> list:
+    """
+    Run generate_forecast_for_spot for all spots concurrently with at most
+    max_concurrent_calls spots in flight. A request-scoped Stormglass memo is
+    created for the run unless one is given.
+    Returns the forecasts in the same order as the input spots (None for failed spots).
+    Safe to call from a Streamlit script thread.
+    """
+    if not spots:
+        return []
+    script_ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+    try:
+        return run_coroutine_sync(
+            _load_forecasts_async(spots, selected_date, max_concurrent_calls, progress_callback, script_ctx,
+                                  sg_memo if sg_memo is not None else cache_config.RequestMemo(), analysis_dates)
+        )
+    except Exception as e:
+        logger.error(f"Error in concurrent forecast loading: {str(e)}")
+        return [None] * len(spots)
+
+def build_stormglass_cube(spots: list, sg_memo: Optional[cache_config.RequestMemo] = None) -> cube_config.ForecastCube:
+    """Gather the Stormglass daily forecasts of several spots into one ForecastCube."""
+    return cube_config.ForecastCube.from_records({
+        get_spot_id(spot): get_stormglass_forecast_for_run(spot, sg_memo) for spot in spots
+    })
+
+def get_spot_profiles(spots: list) -> rating_config.SpotProfiles:
+    """
+    Scoring profiles of spots, in order. Catalog spots use the profiles compiled with their
+    catalog shard; uploaded catalogs are compiled from their scoring fields, once per content.
+    """
+    spot_ids = [get_spot_id(spot) for spot in spots]
+    if not st.session_state.get('surf_spots_data'):
+        try:
+            return catalog_config.get_sharded_catalog().profiles(spot_ids)
+        except Exception as e:
+            logger.info(f"Spots outside the sharded catalog, compiling their profiles: {str(e)}")
+    return rating_config.compile_spot_profiles(spots, spot_ids)
+
+@metrics_config.timed('scoring')
+def apply_batch_scores(spots_with_forecast: list, sg_memo: Optional[cache_config.RequestMemo] = None,
+                       sg_cube: Optional[cube_config.ForecastCube] = None,
+                       profiles: Optional[rating_config.SpotProfiles] = None) -> Optional[cube_config.ForecastCube]:
+    """
+    Score all spots over all forecast days in one vectorized call (rating_config.score_cube),
+    using Stormglass wave height and wind/swell directions and the tide state of the base forecast.
+    profiles (see get_spot_profiles) must cover the spots; they are looked up when not given.
+    Stores each score as day['spot_score'] (out of 10) and returns the cube that was scored.
+    """
+    try:
+        if not spots_with_forecast:
+            return None
+        sg_cube = sg_cube or build_stormglass_cube(spots_with_forecast, sg_memo)
+        profiles = profiles if profiles is not None else get_spot_profiles(spots_with_forecast)
+
+        # Tide states come from the base forecast days, aligned on the cube spots and dates
+        days_by_id = {}
+        for spot in spots_with_forecast:
+            days_by_id.setdefault(get_spot_id(spot), {day.get('date'): day for day in (spot.get('forecast') or [])})
+        tide_state = np.array([
+            [rating_config.tide_state_index((days_by_id.get(spot_id, {}).get(date) or {}).get('tide_state'))
+             for date in sg_cube.dates]
+            for spot_id in sg_cube.spot_ids
+        ], dtype=int).reshape(len(sg_cube), len(sg_cube.dates))
+
+        scores = rating_config.score_cube(profiles, sg_cube, tide_state)
+        for spot in spots_with_forecast:
+            spot_idx = sg_cube.spot_index.get(get_spot_id(spot))
+            for day in (spot.get('forecast') or []):
+                date_idx = sg_cube.date_index.get(day.get('date'))
+                score = scores[spot_idx, date_idx] if spot_idx is not None and date_idx is not None else np.nan
+                day['spot_score'] = None if np.isnan(score) else float(score)
+        logger.info(f"Scored {scores.size} spot-days for {len(spots_with_forecast)} spots")
+        return sg_cube
+    except Exception as e:
+        logger.error(f"Error computing batch scores: {str(e)}")
+        return None
+
 def get_dayList_forecast():
     """Get list of next 7 days for forecast."""
     days = []
@@ -707,65 +1019,84 @@ def get_dayList_forecast():
         })
     return days
 
-def generate_forecast_for_spot(spot: dict, selected_date: str) -> list:
+def is_unsuitable_conditions(forecast_for_day: dict) -> bool:
+    """True when Stormglass conditions are clearly unsurfable (too small or too windy)."""
+    return forecast_for_day['wave_height_m'] < 0.3 or forecast_for_day['wind_speed_m_s'] > 10
+
+def add_day_analysis(spot: dict, day: dict, sg_cube: cube_config.ForecastCube) -> dict:
     """
-    Generate a complete 7-day forecast for a spot by combining base forecast with conditions analysis.
-    Only generates GPT analysis for the selected date to optimize API usage.
+    Fill the GPT conditions analysis and quick summary of one forecast day, in place.
+    Clearly unsuitable conditions (too small or too windy) skip the GPT calls.
+    """
+    spot_id = get_spot_id(spot)
+    forecast_for_day = sg_cube.day(spot_id, day["date"])
+    if not forecast_for_day:
+        logger.warning(f"[add_day_analysis] No Stormglass data for {spot.get('name')} on {day['date']}")
+        day['wave_direction_deg'] = 'N/A'
+        day['wind_direction_deg'] = 'N/A'
+        day['conditions_analysis'] = None
+        day['quick_summary'] = None
+        return day
+
+    # Inject wave and wind direction data
+    day['wave_direction_deg'] = forecast_for_day.get('wave_direction_deg', 270)
+    day['wind_direction_deg'] = forecast_for_day.get('wind_direction_deg', 90)
+
+    # Check for unsuitable conditions before calling GPT
+    if is_unsuitable_conditions(forecast_for_day):
+        logger.info(f"[add_day_analysis] Unsuitable conditions detected for {spot.get('name')}")
+        day['conditions_analysis'] = "Conditions clearly unsuitable: too small or too windy."
+        day['quick_summary'] = "Not surfable today - waves too small or too windy."
+    else:
+        # Add conditions analysis
+        logger.info(f"[add_day_analysis] Getting conditions analysis for {spot.get('name')}")
+        day['conditions_analysis'] = get_conditions_analysis(spot, day['date'], _sg_forecasts=sg_cube)
+        # Add quick summary
+        logger.info(f"[add_day_analysis] Getting quick summary for {spot.get('name')}")
+        day['quick_summary'] = get_quick_summary(spot, day)
+
+        logger.info(f"[add_day_analysis] Analysis and summary added for {spot.get('name')}:")
+        logger.info(f"Analysis: {day['conditions_analysis']}")
+        logger.info(f"Summary: {day['quick_summary']}")
+    return day
+
+def generate_forecast_for_spot(spot: dict, selected_date: str, forecast_data: Optional[list] = None,
+                               sg_memo: Optional[cache_config.RequestMemo] = None,
+                               analysis_dates: Optional[list] = None) -> list:
+    """
+    Generate a complete 7-day forecast for a spot, starting at selected_date, by combining base forecast
+    with conditions analysis.
+    Only generates GPT analysis for analysis_dates (default: the selected date) to optimize API usage.
+    forecast_data can be passed when the base GPT forecast was already fetched (e.g. asynchronously).
+    sg_memo shares Stormglass fetches between all stages of one pipeline run.
     """
     try:
         logger.info(f"[generate_forecast_for_spot] Starting for spot: {spot.get('name')} on date: {selected_date}")
+        analysis_dates = [selected_date] if analysis_dates is None else analysis_dates
         
         # Get base 7-day forecast
-        forecast_data = get_surf_forecast(spot, selected_date)
-        #logger.info(f"[generate_forecast_for_spot] Base forecast data: {json.dumps(forecast_data, indent=2) if forecast_data else None}")
+        if forecast_data is None:
+            forecast_data = get_surf_forecast(spot, selected_date)
         
         if not forecast_data:
             logger.error(f"[generate_forecast_for_spot] Failed to get base forecast for {spot.get('name')}")
             return None
             
         # Get Stormglass data once for all days
-        sg_forecasts = get_stormglass_forecast(spot)
+        sg_forecasts = get_stormglass_forecast_for_run(spot, sg_memo) or []
+        spot_id = get_spot_id(spot)
+        sg_cube = cube_config.ForecastCube.from_records({spot_id: sg_forecasts})
             
         # Enrich each day's forecast with analysis
         for day in forecast_data:
             try:
-                # Only generate GPT analysis for selected date
-                if day['date'] == selected_date:
-                    logger.info(f"[generate_forecast_for_spot] Processing selected date {selected_date} for {spot.get('name')}")
-                    
-                    # Get Stormglass data for current date
-                    forecast_for_day = next((f for f in sg_forecasts if f["date"] == day["date"]), None)
-                    if forecast_for_day:
-                        # Inject wave and wind direction data
-                        day['wave_direction_deg'] = forecast_for_day.get('wave_direction_deg', 270)
-                        day['wind_direction_deg'] = forecast_for_day.get('wind_direction_deg', 90)
-                        
-                        # Check for unsuitable conditions before calling GPT
-                        if (forecast_for_day['wave_height_m'] < 0.3 or 
-                            forecast_for_day['wind_speed_m_s'] > 10):
-                            logger.info(f"[generate_forecast_for_spot] Unsuitable conditions detected for {spot.get('name')}")
-                            day['conditions_analysis'] = "Conditions clearly unsuitable: too small or too windy."
-                            day['quick_summary'] = "Not surfable today - waves too small or too windy."
-                        else:
-                            # Add conditions analysis
-                            logger.info(f"[generate_forecast_for_spot] Getting conditions analysis for {spot.get('name')}")
-                            day['conditions_analysis'] = get_conditions_analysis(spot, day['date'])
-                            # Add quick summary
-                            logger.info(f"[generate_forecast_for_spot] Getting quick summary for {spot.get('name')}")
-                            day['quick_summary'] = get_quick_summary(spot, day)
-                            
-                            logger.info(f"[generate_forecast_for_spot] Analysis and summary added for {spot.get('name')}:")
-                            logger.info(f"Analysis: {day['conditions_analysis']}")
-                            logger.info(f"Summary: {day['quick_summary']}")
-                    else:
-                        logger.warning(f"[generate_forecast_for_spot] No Stormglass data for {spot.get('name')} on {day['date']}")
-                        day['wave_direction_deg'] = 'N/A'
-                        day['wind_direction_deg'] = 'N/A'
-                        day['conditions_analysis'] = None
-                        day['quick_summary'] = None
+                # Only generate GPT analysis for the requested dates
+                if day['date'] in analysis_dates:
+                    logger.info(f"[generate_forecast_for_spot] Processing selected date {day['date']} for {spot.get('name')}")
+                    add_day_analysis(spot, day, sg_cube)
                 else:
-                    # For non-selected dates, only add Stormglass data if available
-                    forecast_for_day = next((f for f in sg_forecasts if f["date"] == day["date"]), None)
+                    # For other dates, only add Stormglass data if available
+                    forecast_for_day = sg_cube.day(spot_id, day["date"])
                     if forecast_for_day:
                         day['wave_direction_deg'] = forecast_for_day.get('wave_direction_deg', 270)
                         day['wind_direction_deg'] = forecast_for_day.get('wind_direction_deg', 90)
@@ -787,81 +1118,310 @@ def generate_forecast_for_spot(spot: dict, selected_date: str) -> list:
         logger.error(f"[generate_forecast_for_spot] Error for {spot.get('name', 'Unknown')}: {str(e)}")
         return None
 
-@st.cache_data(ttl=21600)  # Cache for 6 hours
-def get_stormglass_forecast(spot):
+def get_day_rating(day: Optional[dict]) -> float:
     """
-    Retrieves 7-day hourly surf forecast from Stormglass API for a given spot.
-    Returns a simplified 7-day daily average forecast list or None on failure.
+    Rating used to rank spots on a day: the numeric spot score (see apply_batch_scores)
+    when available, otherwise the GPT daily rating. Needs no GPT analysis.
     """
+    day = day or {}
+    rating = day.get('spot_score')
+    if rating is None:
+        rating = day.get('daily_rating')
     try:
-        logger.info(f"[Stormglass] Starting API request for spot: {spot.get('name')}")
-        base_url = "https://api.stormglass.io/v2/weather/point"
-        lat = spot.get("latitude")
-        lon = spot.get("longitude")
-
-        params = {
-            "lat": lat,
-            "lng": lon,
-            "params": "waveHeight,wavePeriod,windSpeed,windDirection",
-            "source": "noaa",
-            "start": int(time.time()),  # now
-            "end": int(time.time()) + 7 * 86400  # 7 days ahead
+        return float(rating or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def select_forecast_day(spots_with_forecast: list, date: str) -> list:
+    """
+    Re-slice loaded 7-day forecasts for one date, without any API call.
+    Returns shallow copies of the spots whose 'forecast' list starts with the requested day
+    (the day dicts themselves are shared, so analyses added later are kept),
+    ranked by rating for that day. Spots without data for the date come last with an empty forecast.
+    """
+    day_spots = []
+    for spot in spots_with_forecast or []:
+        days = spot.get('forecast') or []
+        selected = [day for day in days if day.get('date') == date]
+        spot_for_day = spot.copy()
+        spot_for_day['forecast'] = selected + [day for day in days if day.get('date') != date] if selected else []
+        day_spots.append(spot_for_day)
+    return sorted(
+        day_spots,
+        key=lambda spot: get_day_rating(spot['forecast'][0]) if spot['forecast'] else -1,
+        reverse=True
+    )
+
+def ensure_day_analysis(day_spots: list, date: str, max_concurrent_calls: int = MAX_CONCURRENT_CALLS) -> list:
+    """
+    Generate the GPT analysis and quick summary of date for the given spots (typically the ones
+    displayed) when they do not have it yet. Stormglass data comes from the caches.
+    Spots are processed concurrently; results are stored in the shared day dicts.
+    """
+    pending = [
+        spot for spot in day_spots
+        if spot.get('forecast') and spot['forecast'][0].get('date') == date
+        and spot['forecast'][0].get('conditions_analysis') is None
+    ]
+    if not pending:
+        return day_spots
+
+    def analyse(spot):
+        try:
+            sg_cube = cube_config.ForecastCube.from_records({get_spot_id(spot): get_stormglass_forecast(spot)})
+            add_day_analysis(spot, spot['forecast'][0], sg_cube)
+        except Exception as e:
+            logger.error(f"[ensure_day_analysis] Error for {spot.get('name', 'Unknown')} on {date}: {str(e)}")
+
+    logger.info(f"[ensure_day_analysis] Generating analysis for {len(pending)} spots on {date}")
+    script_ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+    with ThreadPoolExecutor(max_workers=max_concurrent_calls,
+                            initializer=_attach_script_run_ctx, initargs=(script_ctx,)) as executor:
+        list(executor.map(metrics_config.bind_context(analyse), pending))
+    return day_spots
+
+def stream_gpt_completion(prompt: str, kind: str, spot: dict, date: str) -> Iterator[str]:
+    """
+    Stream a GPT completion for a single-message prompt, yielding the text received so far.
+    Uses the same persistent cache entries as get_conditions_analysis / get_quick_summary
+    (kind is 'conditions_analysis' or 'quick_summary'): a cached text is yielded at once,
+    a streamed one is stored once complete.
+    """
+    cache_key = cache_config.versioned_key('forecast', kind, prompt)
+    cached = cache_config.cache_get('forecast', cache_key)
+    if cached:
+        logger.info(f"[stream_gpt_completion] Persistent cache hit for {kind} of {spot.get('name')}")
+        yield cached
+        return
+
+    metrics_config.count_api_call('openai')
+    stream = client.chat.completions.create(
+        model=GPT_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.5,
+        stream=True,
+    )
+    text = ""
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            text += chunk.choices[0].delta.content
+            yield text
+
+    text = text.strip()
+    logger.info(f"[GPT Streamed Output - {spot.get('name')} on {date}] {text}")
+    if text:
+        cache_config.cache_set('forecast', cache_key, text, spot_id=get_spot_id(spot), forecast_date=date)
+    yield text
+
+def stream_day_analysis(spot: dict, day: dict,
+                        sg_cube: Optional[cube_config.ForecastCube] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Streaming counterpart of add_day_analysis for the UI.
+    Yields (field, text so far) pairs, the quick summary first and then the conditions analysis,
+    and stores the final texts in the day dict. Cases that need no GPT call
+    (no Stormglass data, unsuitable conditions) yield their final text directly.
+    """
+    fallbacks = {'quick_summary': "Summary not available.", 'conditions_analysis': "Error generating analysis."}
+    try:
+        if sg_cube is None:
+            sg_cube = cube_config.ForecastCube.from_records({get_spot_id(spot): get_stormglass_forecast(spot)})
+        forecast_for_day = sg_cube.day(get_spot_id(spot), day['date'])
+        if not forecast_for_day or is_unsuitable_conditions(forecast_for_day):
+            add_day_analysis(spot, day, sg_cube)
+            for field in ('quick_summary', 'conditions_analysis'):
+                yield field, day[field] or fallbacks[field]
+            return
+
+        day['wave_direction_deg'] = forecast_for_day.get('wave_direction_deg', 270)
+        day['wind_direction_deg'] = forecast_for_day.get('wind_direction_deg', 90)
+        prompts = {
+            'quick_summary': build_quick_summary_prompt(spot, day),
+            'conditions_analysis': build_conditions_analysis_prompt(spot, day['date'], forecast_for_day),
         }
+    except Exception as e:
+        logger.error(f"[stream_day_analysis] Error preparing analysis for {spot.get('name', 'Unknown')}: {str(e)}")
+        return
 
-        headers = {"Authorization": STORMGLASS_API_KEY}
-        logger.info(f"[Stormglass] Making request for coordinates: {lat}, {lon}")
-        response = httpx.get(base_url, params=params, headers=headers, timeout=10)
+    for field, prompt in prompts.items():
+        text = ""
+        try:
+            for text in stream_gpt_completion(prompt, field, spot, day['date']):
+                yield field, text
+        except Exception as e:
+            logger.error(f"[stream_day_analysis] GPT {field} failed for {spot.get('name')} on {day['date']}: {e}")
+            text = fallbacks[field]
+            yield field, text
+        day[field] = text or fallbacks[field]
 
-        if response.status_code != 200:
-            logger.error(f"Stormglass API error {response.status_code}: {response.text}")
-            return None
+def snap_to_stormglass_grid(lat: float, lon: float,
+                            resolution: float = None) -> Tuple[float, float]:
+    """
+    Snap coordinates to the nearest node of the Stormglass source model grid. For a coastal spot
+    that node can be inland, without marine data (see fetch_spot_stormglass).
+    """
+    resolution = resolution or STORMGLASS_GRID_RESOLUTION_DEG
+    return (round(round(float(lat) / resolution) * resolution, 4),
+            round(round(float(lon) / resolution) * resolution, 4))
 
-        data = response.json().get("hours", [])
-        logger.info(f"[Stormglass] Received {len(data)} hours of data for {spot.get('name')}")
-        
-        if not data:
-            logger.warning(f"No Stormglass data returned for {spot.get('name')}")
-            return None
+def get_stormglass_grid_report(spots: list) -> dict:
+    """
+    Report how many Stormglass requests grid snapping saves for a set of spots:
+    one request per distinct grid cell instead of one per spot.
+    """
+    cells = {}
+    for spot in spots:
+        try:
+            cell = snap_to_stormglass_grid(spot['latitude'], spot['longitude'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        cells.setdefault(cell, []).append(spot.get('name', 'Unknown'))
+    spot_count = sum(len(names) for names in cells.values())
+    return {
+        'spots': spot_count,
+        'cells': len(cells),
+        'requests_saved': spot_count - len(cells),
+        'resolution_deg': STORMGLASS_GRID_RESOLUTION_DEG,
+        'shared_cells': {f"{lat},{lon}": names for (lat, lon), names in cells.items() if len(names) > 1}
+    }
 
-        # Group by date and calculate daily averages
-        daily_data = {}
-        for hour in data:
-            date = hour["time"][:10]
-            if date not in daily_data:
-                daily_data[date] = {
-                    "wave_height": [],
-                    "wave_period": [],
-                    "wind_speed": [],
-                    "wind_direction": []
-                }
-            sg = daily_data[date]
-            sg["wave_height"].append(hour["waveHeight"]["noaa"])
-            sg["wave_period"].append(hour["wavePeriod"]["noaa"])
-            sg["wind_speed"].append(hour["windSpeed"]["noaa"])
-            sg["wind_direction"].append(hour["windDirection"]["noaa"])
-
-        # Compute daily averages
-        forecasts = []
-        for date, values in daily_data.items():
-            if not all(values.values()):
-                continue
-            forecasts.append({
-                "date": date,
-                "wave_height_m": round(sum(values["wave_height"]) / len(values["wave_height"]), 1),
-                "wave_period_s": round(sum(values["wave_period"]) / len(values["wave_period"]), 1),
-                "wind_speed_m_s": round(sum(values["wind_speed"]) / len(values["wind_speed"]), 1),
-                "wind_direction_deg": round(sum(values["wind_direction"]) / len(values["wind_direction"]), 1)
-            })
-        
-        logger.info(f"[Stormglass] Successfully processed {len(forecasts)} days of forecasts for {spot.get('name')}")
-        if forecasts:
-            logger.info(f"[Stormglass] Sample forecast data for {spot.get('name')}: {json.dumps(forecasts[0])}")
+def stormglass_fallback_cell(spot: dict) -> Tuple[float, float]:
+    """Unsnapped coordinates of a spot, queried when its grid node has no marine data."""
+    return round(float(spot["latitude"]), 4), round(float(spot["longitude"]), 4)
 
+def fetch_spot_stormglass(spot: dict, fetch_cell: Optional[Callable] = None):
+    """
+    Stormglass forecast of a spot from its grid node, or from the spot's own coordinates when the
+    node has no marine data (an empty day list: the nearest node of a coastal spot can be inland).
+    fetch_cell(lat, lon) defaults to fetch_stormglass_cell. API failures (None) are not retried.
+    """
+    fetch_cell = fetch_cell or fetch_stormglass_cell
+    cell = snap_to_stormglass_grid(spot["latitude"], spot["longitude"])
+    forecasts = fetch_cell(*cell)
+    exact = stormglass_fallback_cell(spot)
+    if forecasts is None or forecasts or exact == cell:
         return forecasts
+    logger.warning(f"[Stormglass] No marine data at grid node {cell} for {spot.get('name')}, "
+                   f"using the spot coordinates {exact}")
+    metrics_config.count('stormglass_grid_fallback')
+    return fetch_cell(*exact)
+
+def get_stormglass_forecast_for_run(spot: dict, sg_memo: Optional[cache_config.RequestMemo] = None):
+    """
+    Return the Stormglass forecast for a spot, sharing a single in-flight fetch per
+    grid cell between every stage and every spot of a pipeline run when a request-scoped memo is given.
+    """
+    if sg_memo is None:
+        return get_stormglass_forecast(spot)
+    try:
+        return fetch_spot_stormglass(
+            spot, lambda lat, lon: sg_memo.get_or_compute((lat, lon), lambda: fetch_stormglass_cell(lat, lon)))
+    except (KeyError, TypeError, ValueError):
+        return None
 
+def get_stormglass_forecast(spot):
+    """
+    Retrieves the 7-day Stormglass forecast for a given spot.
+    The spot is snapped to the source model grid so that nearby spots share one request.
+    Returns a simplified 7-day daily average forecast list or None on failure.
+    """
+    try:
+        logger.info(f"[Stormglass] Spot {spot.get('name')} uses grid cell "
+                    f"{snap_to_stormglass_grid(spot['latitude'], spot['longitude'])}")
+        return fetch_spot_stormglass(spot)
     except Exception as e:
         logger.error(f"Error in get_stormglass_forecast for {spot.get('name', 'Unknown')}: {str(e)}")
         return None
 
+@metrics_config.timed('stormglass', cached=True)
+@st.cache_data(ttl=21600)  # Cache for 6 hours
+def _fetch_stormglass_cell(lat: float, lon: float):
+    """
+    Cached body of fetch_stormglass_cell. API failures raise, so that they are not cached and
+    the next call retries.
+    """
+    logger.info(f"[Stormglass] Starting API request for cell: {lat}, {lon}")
+    base_url = f"{secrets_config.STORMGLASS_BASE_URL}/weather/point"
+
+    # Stormglass data is refreshed at most every 6 hours, keyed on the grid cell
+    cache_key = cache_config.versioned_key('stormglass', lat, lon)
+    cached = cache_config.cache_get('stormglass', cache_key)
+    if cached is not None:
+        logger.info(f"[Stormglass] Persistent cache hit for cell {lat}, {lon}")
+        return cached
+
+    params = {
+        "lat": lat,
+        "lng": lon,
+        "params": STORMGLASS_PARAMS,
+        "source": STORMGLASS_SOURCE,
+        "start": int(time.time()),  # now
+        "end": int(time.time()) + 7 * 86400  # 7 days ahead
+    }
+
+    headers = {"Authorization": STORMGLASS_API_KEY}
+    logger.info(f"[Stormglass] Making request for coordinates: {lat}, {lon}")
+    metrics_config.count_api_call('stormglass')
+    response = http_config.get_client().get(base_url, params=params, headers=headers)
+
+    if response.status_code != 200:
+        raise RuntimeError(f"Stormglass API error {response.status_code}: {response.text}")
+
+    data = response.json().get("hours", [])
+    logger.info(f"[Stormglass] Received {len(data)} hours of data for cell {lat}, {lon}")
+    
+    if not data:
+        raise RuntimeError(f"No Stormglass data returned for cell {lat}, {lon}")
+
+    # Columnar per-day statistics, with circular means for directions
+    forecasts = aggregation_config.aggregate_daily(data, STORMGLASS_PARAMS.split(","), STORMGLASS_SOURCE)
+    
+    logger.info(f"[Stormglass] Successfully processed {len(forecasts)} days of forecasts for cell {lat}, {lon}")
+    if forecasts:
+        logger.info(f"[Stormglass] Sample forecast data for cell {lat}, {lon}: {json.dumps(forecasts[0])}")
+    # An empty list (no marine data at this point) is cached too, so inland nodes are not requeried
+    if forecasts is not None:
+        cache_config.cache_set('stormglass', cache_key, forecasts, spot_id=f"{lat},{lon}",
+                               forecast_date=forecasts[0]['date'] if forecasts else None)
+
+    return forecasts
+
+def fetch_stormglass_cell(lat: float, lon: float):
+    """
+    Retrieves 7-day hourly surf forecast from Stormglass API for a grid cell.
+    Returns a simplified 7-day daily average forecast list or None on failure (not cached); the
+    list is empty when the point has no marine data (days without wave data are dropped).
+    """
+    try:
+        return _fetch_stormglass_cell(lat, lon)
+    except Exception as e:
+        logger.error(f"Error in fetch_stormglass_cell for {lat}, {lon}: {str(e)}")
+        return None
+
+fetch_stormglass_cell.clear = _fetch_stormglass_cell.clear
+
+def get_catalog_fingerprint(json_path: str = os.path.join("data", "lisbon_area_lean.json")) -> str:
+    """Hash of the spot catalog file, used to version forecast caches."""
+    return catalog_config.source_fingerprint(json_path)
+
+def get_prompt_fingerprint() -> str:
+    """Hash of the GPT prompt templates, rendered for a fixed probe spot."""
+    probe_spot = {'name': 'probe', 'region': 'probe', 'latitude': 0, 'longitude': 0}
+    probe_day = {'date': '2000-01-01', 'wave_height_m': 1.0, 'wind_speed_m_s': 1.0, 'wind_direction_deg': 0.0}
+    return cache_config.make_key(
+        build_forecast_messages(probe_spot, probe_day['date']),
+        build_conditions_analysis_prompt(probe_spot, probe_day['date'], probe_day),
+        build_quick_summary_prompt(probe_spot, probe_day)
+    )
+
+# Forecast caches are invalidated when the catalog, the prompt templates or the model change
+cache_config.register_namespace(
+    'forecast', catalog_config.sources_fingerprint(catalog_config.CATALOG_SOURCES), get_prompt_fingerprint(), GPT_MODEL,
+    clear_callbacks=[get_cached_gpt_response.clear, get_conditions_analysis.clear, get_quick_summary.clear]
+)
+cache_config.register_namespace(
+    'stormglass', STORMGLASS_PARAMS, STORMGLASS_SOURCE, STORMGLASS_GRID_RESOLUTION_DEG,
+    clear_callbacks=[fetch_stormglass_cell.clear]
+)
+
 if __name__ == "__main__":
     main()
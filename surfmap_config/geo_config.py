@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import logging
+import math
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import cache_config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG_LAT = math.pi * EARTH_RADIUS_KM / 180
+DEFAULT_BUCKET_DEG = 0.5  # Grid bucket size of the spot index (~55 km in latitude)
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km; arguments are broadcast like NumPy arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def geohash_encode(lat: float, lon: float, precision: int = 6) -> str:
+    """Standard base32 geohash of a point (precision 5 ≈ 5 km cells, 6 ≈ 1 km)."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, use_lon = [], 0, 0, True
+    while len(chars) < precision:
+        value, bounds = (lon, lon_range) if use_lon else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+        use_lon = not use_lon
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+def geohash_bbox(geohash: str) -> Tuple[float, float, float, float]:
+    """Bounding box (min_lat, min_lon, max_lat, max_lon) of a geohash cell."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    use_lon = True
+    for char in geohash:
+        bits = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            bounds = lon_range if use_lon else lat_range
+            mid = (bounds[0] + bounds[1]) / 2
+            if (bits >> shift) & 1:
+                bounds[0] = mid
+            else:
+                bounds[1] = mid
+            use_lon = not use_lon
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+def radius_bbox(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """Bounding box (min_lat, min_lon, max_lat, max_lon) containing the circle of radius_km around a point."""
+    dlat = radius_km / KM_PER_DEG_LAT
+    cos_lat = max(math.cos(math.radians(min(abs(lat) + dlat, 90.0))), 1e-6)
+    dlon = min(radius_km / (KM_PER_DEG_LAT * cos_lat), 180.0)
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+class SpotIndex:
+    """
+    Spatial index over a spot catalog: coordinates as arrays plus a lat/lon grid of buckets.
+    within_radius() only computes distances for the buckets overlapping the search circle;
+    nearest() computes all distances in one vectorized pass. Spots without valid
+    coordinates are never returned.
+    """
+
+    def __init__(self, spots: List[dict], bucket_deg: float = DEFAULT_BUCKET_DEG):
+        lats = np.full(len(spots), np.nan)
+        lons = np.full(len(spots), np.nan)
+        for i, spot in enumerate(spots):
+            try:
+                lats[i] = float(spot.get('latitude'))
+                lons[i] = float(spot.get('longitude'))
+            except (TypeError, ValueError):
+                logger.warning(f"Spot without valid coordinates: {spot.get('name', 'unknown')}")
+        self._build(lats, lons, bucket_deg)
+
+    @classmethod
+    def from_coordinates(cls, lats, lons, bucket_deg: float = DEFAULT_BUCKET_DEG) -> 'SpotIndex':
+        """Index over coordinate arrays (NaN for spots without coordinates), e.g. catalog columns."""
+        index = cls.__new__(cls)
+        index._build(np.array(lats, dtype=float), np.array(lons, dtype=float), bucket_deg)
+        return index
+
+    def _build(self, lats: np.ndarray, lons: np.ndarray, bucket_deg: float) -> None:
+        self.bucket_deg = bucket_deg
+        self.lats, self.lons = lats, lons
+        self.valid = np.flatnonzero(~np.isnan(self.lats) & ~np.isnan(self.lons))
+
+        buckets: Dict[Tuple[int, int], List[int]] = {}
+        for i in self.valid:
+            buckets.setdefault(self._bucket(self.lats[i], self.lons[i]), []).append(i)
+        self.buckets = {key: np.array(indices, dtype=int) for key, indices in buckets.items()}
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def _bucket(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.bucket_deg)), int(math.floor(lon / self.bucket_deg))
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Indices of the spots in the buckets overlapping the bounding box of the circle."""
+        min_lat, min_lon, max_lat, max_lon = radius_bbox(lat, lon, radius_km)
+        (row_min, col_min), (row_max, col_max) = self._bucket(min_lat, min_lon), self._bucket(max_lat, max_lon)
+        if (row_max - row_min + 1) * (col_max - col_min + 1) >= len(self.buckets):
+            return self.valid
+        found = [self.buckets[key] for key in
+                 ((row, col) for row in range(row_min, row_max + 1) for col in range(col_min, col_max + 1))
+                 if key in self.buckets]
+        return np.concatenate(found) if found else np.array([], dtype=int)
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> List[Tuple[int, float]]:
+        """(spot index, distance km) of the spots within radius_km, nearest first."""
+        candidates = self._candidates(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self.lats[candidates], self.lons[candidates])
+        inside = distances <= radius_km
+        order = np.argsort(distances[inside], kind='stable')
+        return [(int(i), float(d)) for i, d in zip(candidates[inside][order], distances[inside][order])]
+
+    def nearest(self, lat: float, lon: float, k: int) -> List[Tuple[int, float]]:
+        """(spot index, distance km) of the k nearest spots, nearest first."""
+        if k <= 0 or not self.valid.size:
+            return []
+        distances = haversine_km(lat, lon, self.lats[self.valid], self.lons[self.valid])
+        k = min(k, distances.size)
+        closest = np.argpartition(distances, k - 1)[:k]
+        closest = closest[np.argsort(distances[closest], kind='stable')]
+        return [(int(self.valid[i]), float(distances[i])) for i in closest]
+
+_spot_indexes = {}
+_spot_indexes_lock = threading.Lock()
+MAX_SPOT_INDEXES = 8
+
+def get_spot_index(spots: List[dict]) -> SpotIndex:
+    """Return the spatial index of a catalog, building it only the first time this catalog is seen."""
+    key = cache_config.make_key([(spot.get('name'), spot.get('latitude'), spot.get('longitude')) for spot in spots])
+    with _spot_indexes_lock:
+        index = _spot_indexes.get(key)
+    if index is None:
+        index = SpotIndex(spots)
+        with _spot_indexes_lock:
+            if len(_spot_indexes) >= MAX_SPOT_INDEXES:
+                _spot_indexes.pop(next(iter(_spot_indexes)))
+            _spot_indexes[key] = index
+        logger.info(f"Built spatial index for {len(index)} spots in {len(index.buckets)} buckets")
+    return index
+
+def spots_near(spots: List[dict], lat: float, lon: float, radius_km: float,
+               min_spots: int = 0, index: Optional[SpotIndex] = None) -> List[dict]:
+    """
+    Spots within radius_km of a point, nearest first, as copies carrying 'distance_km'.
+    When fewer than min_spots are inside the radius, the min_spots nearest spots are returned instead.
+    """
+    index = index or get_spot_index(spots)
+    matches = index.within_radius(lat, lon, radius_km)
+    if len(matches) < min_spots:
+        logger.info(f"Only {len(matches)} spots within {radius_km} km, using the {min_spots} nearest")
+        matches = index.nearest(lat, lon, min_spots)
+    return [dict(spots[i], distance_km=round(distance, 1)) for i, distance in matches]
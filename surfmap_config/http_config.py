@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import importlib.util
+import logging
+import os
+import threading
+import weakref
+from typing import Dict
+
+import httpx
+import streamlit as st
+
+from . import metrics_config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# HTTP/2 through the h2 package (httpx[http2] in requirements.txt); HTTP/1.1 keep-alive without it
+HTTP2_ENABLED = (os.environ.get("SURFMAP_HTTP2", "true").lower() not in ("false", "0", "no")
+                 and importlib.util.find_spec("h2") is not None)
+# Stormglass and Google answer in well under a second: fail fast on a dead connection
+HTTP_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+# GPT completions can take a while to generate
+OPENAI_TIMEOUT = httpx.Timeout(60.0, connect=5.0)
+HTTP_LIMITS = httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60.0)
+
+_stats = {'requests': 0, 'new_connections': 0, 'reused_connections': 0, 'http2_responses': 0}
+_stats_lock = threading.Lock()
+_seen_streams = weakref.WeakSet()
+
+def _record_connection(response: httpx.Response) -> None:
+    """
+    Count whether a response came over a new or a kept-alive connection (the same httpcore
+    network stream as an earlier response), process-wide and in the current metrics run.
+    """
+    stream = response.extensions.get("network_stream")
+    with _stats_lock:
+        try:
+            reused = stream is not None and stream in _seen_streams
+            if stream is not None and not reused:
+                _seen_streams.add(stream)
+        except TypeError:  # Stream type without weak reference support
+            reused = False
+        _stats['requests'] += 1
+        _stats['reused_connections' if reused else 'new_connections'] += 1
+        _stats['http2_responses'] += int(response.http_version == "HTTP/2")
+    metrics_config.count('http_connection_reused' if reused else 'http_connection_new')
+
+async def _record_connection_async(response: httpx.Response) -> None:
+    _record_connection(response)
+
+def new_client(timeout: httpx.Timeout = HTTP_TIMEOUT) -> httpx.Client:
+    """A pooled synchronous client (keep-alive, HTTP/2 when available) reporting connection reuse."""
+    return httpx.Client(http2=HTTP2_ENABLED, timeout=timeout, limits=HTTP_LIMITS,
+                        event_hooks={'response': [_record_connection]})
+
+def new_async_client(timeout: httpx.Timeout = HTTP_TIMEOUT) -> httpx.AsyncClient:
+    """
+    A pooled async client. Its connections belong to the event loop it is first used on, so
+    create one per run (asyncio.run) and close it at the end, e.g. with `async with`.
+    """
+    return httpx.AsyncClient(http2=HTTP2_ENABLED, timeout=timeout, limits=HTTP_LIMITS,
+                             event_hooks={'response': [_record_connection_async]})
+
+@st.cache_resource(show_spinner=False)
+def get_client() -> httpx.Client:
+    """Process-wide pooled client shared by every module (Stormglass, Google geocoding...)."""
+    logger.info(f"Creating the shared HTTP client (HTTP/2: {HTTP2_ENABLED})")
+    return new_client()
+
+@st.cache_resource(show_spinner=False)
+def get_openai_http_client() -> httpx.Client:
+    """Process-wide pooled client for the synchronous OpenAI client, with completion-friendly timeouts."""
+    return new_client(OPENAI_TIMEOUT)
+
+def connection_stats() -> Dict[str, float]:
+    """Requests and new/reused connections of this process's pooled clients."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['reuse_rate'] = round(stats['reused_connections'] / stats['requests'], 3) if stats['requests'] else None
+    return stats
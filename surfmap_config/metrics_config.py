@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import bisect
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+HISTOGRAM_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+MAX_SPANS_PER_RUN = 500
+MAX_RECENT_RUNS = 50
+CACHE_COUNTERS = ('cache_hit', 'cache_miss')
+
+class Span:
+    """One timed stage. Counters incremented while it is current (in any thread) are added to it and its parents."""
+
+    def __init__(self, name: str, parent: Optional["Span"] = None):
+        self.name = name
+        self.parent = parent
+        self.started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.counters: Dict[str, int] = {}
+
+class RunMetrics:
+    """Spans and counters of one run (a page load, a batch or warmer pass...), safe to update from threads."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.counters: Dict[str, int] = {}
+        self.stages: Dict[str, dict] = {}
+        self.spans: List[dict] = []
+        self._lock = threading.Lock()
+
+    def add_span(self, span: Span) -> None:
+        with self._lock:
+            stage = self.stages.setdefault(span.name, {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'counters': {}})
+            stage['calls'] += 1
+            stage['total_ms'] += span.duration_ms
+            stage['max_ms'] = max(stage['max_ms'], span.duration_ms)
+            with _span_lock:
+                counters = dict(span.counters)
+            for counter, value in counters.items():
+                stage['counters'][counter] = stage['counters'].get(counter, 0) + value
+            if len(self.spans) < MAX_SPANS_PER_RUN:
+                self.spans.append({
+                    'name': span.name,
+                    'parent': span.parent.name if span.parent else None,
+                    'start_ms': round((span.started - self.started) * 1000, 1),
+                    'duration_ms': round(span.duration_ms, 1),
+                    'counters': counters,
+                })
+
+    def count(self, counter: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def summary(self) -> dict:
+        """Machine-readable summary of the run."""
+        with self._lock:
+            duration_ms = self.duration_ms if self.duration_ms is not None else (time.perf_counter() - self.started) * 1000
+            return {
+                'run_id': self.run_id,
+                'name': self.name,
+                'started_at': round(self.started_at, 3),
+                'duration_ms': round(duration_ms, 1),
+                'counters': dict(self.counters),
+                'stages': {
+                    name: {**stage, 'total_ms': round(stage['total_ms'], 1), 'max_ms': round(stage['max_ms'], 1),
+                           'counters': dict(stage['counters'])}
+                    for name, stage in self.stages.items()
+                },
+                'spans': list(self.spans),
+            }
+
+_current_run: contextvars.ContextVar = contextvars.ContextVar('surfmap_metrics_run', default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar('surfmap_metrics_span', default=None)
+_histograms: Dict[str, List[int]] = {}
+_histogram_totals: Dict[str, dict] = {}
+_recent_runs: deque = deque(maxlen=MAX_RECENT_RUNS)
+_global_lock = threading.Lock()
+_span_lock = threading.Lock()  # Spans are shared with the worker threads they spawn
+
+def _observe(name: str, duration_ms: float) -> None:
+    """Add a span duration to the process-wide histogram of its stage."""
+    with _global_lock:
+        buckets = _histograms.setdefault(name, [0] * (len(HISTOGRAM_BUCKETS_MS) + 1))
+        buckets[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, duration_ms)] += 1
+        totals = _histogram_totals.setdefault(name, {'count': 0, 'total_ms': 0.0})
+        totals['count'] += 1
+        totals['total_ms'] += duration_ms
+
+@contextlib.contextmanager
+def span(name: str, cached: bool = False):
+    """
+    Time a stage. With cached=True, a call that made no persistent cache lookup and no API call
+    is counted as a 'memory_hit' (served by st.cache_data).
+    """
+    current = Span(name, _current_span.get())
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        _current_span.reset(token)
+        current.duration_ms = (time.perf_counter() - current.started) * 1000
+        if cached and not any(current.counters.get(counter) for counter in CACHE_COUNTERS + ('api_calls',)):
+            count('memory_hit')
+        _observe(name, current.duration_ms)
+        run = _current_run.get()
+        if run is not None:
+            run.add_span(current)
+
+def timed(name: str, cached: bool = False) -> Callable:
+    """
+    Decorator running a function inside span(name). Put it above @st.cache_data so cache hits are
+    timed too; the cached function's clear() stays reachable on the wrapper.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, cached=cached):
+                return func(*args, **kwargs)
+        if hasattr(func, 'clear'):
+            wrapper.clear = func.clear
+        return wrapper
+    return decorator
+
+def count(counter: str, value: int = 1) -> None:
+    """Increment a counter on the current span (and its parents) and on the current run."""
+    current = _current_span.get()
+    with _span_lock:
+        while current is not None:
+            current.counters[counter] = current.counters.get(counter, 0) + value
+            current = current.parent
+    run = _current_run.get()
+    if run is not None:
+        run.count(counter, value)
+
+def count_api_call(service: str) -> None:
+    """Count one outgoing API call, in total and per service ('openai', 'stormglass', 'google')."""
+    count('api_calls')
+    count(f'api_calls.{service}')
+
+@contextlib.contextmanager
+def run(name: str, log: bool = True):
+    """
+    Collect the spans and counters of a run. On exit the summary is kept in recent_runs()
+    and, with log, written to the log as one JSON line.
+    """
+    metrics = RunMetrics(name)
+    token = _current_run.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_run.reset(token)
+        metrics.duration_ms = (time.perf_counter() - metrics.started) * 1000
+        summary = metrics.summary()
+        with _global_lock:
+            _recent_runs.append(summary)
+        if log:
+            logger.info(f"[metrics] {json.dumps({key: value for key, value in summary.items() if key != 'spans'})}")
+
+def current_run() -> Optional[RunMetrics]:
+    """The run collecting metrics in this context, if any."""
+    return _current_run.get()
+
+def bind_context(func: Callable) -> Callable:
+    """
+    Carry the caller's metrics context (current run and span) into another thread:
+    wrap functions handed to executors, which do not copy contextvars themselves.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+def recent_runs() -> List[dict]:
+    """Summaries of the last runs of this process, oldest first."""
+    with _global_lock:
+        return list(_recent_runs)
+
+def histograms() -> Dict[str, dict]:
+    """Process-wide latency histograms per stage: bucket upper bounds (ms), counts, total and mean."""
+    bounds = [str(bound) for bound in HISTOGRAM_BUCKETS_MS] + ['inf']
+    with _global_lock:
+        return {
+            name: {
+                'buckets': dict(zip(bounds, buckets)),
+                'count': _histogram_totals[name]['count'],
+                'total_ms': round(_histogram_totals[name]['total_ms'], 1),
+                'mean_ms': round(_histogram_totals[name]['total_ms'] / max(_histogram_totals[name]['count'], 1), 1),
+            }
+            for name, buckets in _histograms.items()
+        }
+
+def reset() -> None:
+    """Forget histograms and recent runs."""
+    with _global_lock:
+        _histograms.clear()
+        _histogram_totals.clear()
+        _recent_runs.clear()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import logging
+import re
+import threading
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from . import cache_config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# 16-point compass, one sector every 22.5°
+COMPASS_POINTS = ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
+                  "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"]
+SECTOR_DEG = 360 / len(COMPASS_POINTS)
+DIRECTION_TOLERANCE_DEG = 22.5  # Directions this close to an ideal one still count as matching
+TIDE_STATES = ["low", "rising", "high", "falling"]
+DEFAULT_TIDE_STATE = TIDE_STATES.index("rising")
+
+# Same weights and penalties as forecast_config.calculate_spot_rating
+WIND_WEIGHT, SWELL_WEIGHT, TIDE_WEIGHT = 0.3, 0.4, 0.3
+WIND_MISMATCH_FACTOR = 0.5
+SWELL_SIZE_MISMATCH_FACTOR = 0.5
+SWELL_DIRECTION_MISMATCH_FACTOR = 0.75
+SCORE_SCALE = 2.0  # Spot qualities are rated 0-5, scores are shown out of 10
+# Catalog fields the profiles are compiled from
+SCORING_FIELDS = ('wind_compatibility', 'swell_compatibility', 'tide_behavior')
+PROFILE_ARRAYS = ('wind_masks', 'swell_masks', 'swell_ranges', 'wind_quality', 'swell_quality', 'tide_quality')
+
+def direction_to_degrees(token: str) -> Optional[float]:
+    """Convert a compass point ('NE', 'WSW'...) to degrees, None if unknown."""
+    token = token.strip().upper()
+    if token in COMPASS_POINTS:
+        return COMPASS_POINTS.index(token) * SECTOR_DEG
+    return None
+
+def direction_sector_mask(description: str, tolerance: float = DIRECTION_TOLERANCE_DEG) -> np.ndarray:
+    """
+    Compile a direction description from the catalog ('E/NE', 'NW to W', 'N') into a
+    boolean mask over the 16 compass sectors. Consecutive directions define an arc
+    (shortest way round), widened by the tolerance on both sides.
+    An unparseable description matches every sector.
+    """
+    tokens = [t for t in re.split(r"\s*(?:/|,|-|–|\bto\b)\s*", str(description or ""), flags=re.IGNORECASE) if t]
+    degrees = [d for d in (direction_to_degrees(t) for t in tokens) if d is not None]
+    if not degrees:
+        return np.ones(len(COMPASS_POINTS), dtype=bool)
+
+    centers = np.arange(len(COMPASS_POINTS)) * SECTOR_DEG
+    mask = np.zeros(len(COMPASS_POINTS), dtype=bool)
+    arcs = list(zip(degrees, degrees[1:])) or [(degrees[0], degrees[0])]
+    for start, end in arcs:
+        span = (end - start) % 360
+        if span > 180:  # Go the short way round
+            start, span = end, 360 - span
+        offset = (centers - (start - tolerance)) % 360
+        mask |= offset <= span + 2 * tolerance + 1e-9
+    return mask
+
+def pack_sector_mask(mask: np.ndarray) -> int:
+    """Sector mask as an integer, bit i set for compass sector i (how catalogs store it)."""
+    return int(np.dot(np.asarray(mask, dtype=int), 1 << np.arange(len(COMPASS_POINTS))))
+
+def unpack_sector_masks(bits) -> np.ndarray:
+    """Boolean sector masks, shaped (n, 16), of integers written by pack_sector_mask."""
+    return ((np.asarray(bits, dtype=np.int64)[:, None] >> np.arange(len(COMPASS_POINTS))) & 1).astype(bool)
+
+def degrees_to_sector(degrees: np.ndarray) -> np.ndarray:
+    """Map directions in degrees (any shape, NaN allowed) to compass sector indices (-1 for NaN)."""
+    degrees = np.asarray(degrees, dtype=float)
+    sectors = np.full(degrees.shape, -1, dtype=int)
+    valid = ~np.isnan(degrees)
+    sectors[valid] = np.round((degrees[valid] % 360) / SECTOR_DEG).astype(int) % len(COMPASS_POINTS)
+    return sectors
+
+def tide_state_index(tide_state) -> int:
+    """Index of a tide state in TIDE_STATES, -1 when unknown."""
+    try:
+        return TIDE_STATES.index(str(tide_state).strip().lower())
+    except ValueError:
+        return -1
+
+class SpotProfiles:
+    """
+    Scoring fields of a set of spots compiled once into arrays:
+    wind and swell direction sector masks, ideal swell size ranges and qualities, tide qualities.
+    """
+
+    def __init__(self, spots: List[dict], spot_ids: Sequence[str]):
+        n = len(spots)
+        self.spot_ids = list(spot_ids)
+        self.spot_index = {spot_id: i for i, spot_id in enumerate(self.spot_ids)}
+        self.wind_masks = np.ones((n, len(COMPASS_POINTS)), dtype=bool)
+        self.swell_masks = np.ones((n, len(COMPASS_POINTS)), dtype=bool)
+        self.swell_ranges = np.full((n, 2), [0.0, np.inf])
+        self.wind_quality = np.zeros(n)
+        self.swell_quality = np.zeros(n)
+        self.tide_quality = np.zeros((n, len(TIDE_STATES)))
+
+        for i, spot in enumerate(spots):
+            try:
+                wind = spot.get('wind_compatibility', {}) or {}
+                swell = spot.get('swell_compatibility', {}) or {}
+                tides = spot.get('tide_behavior', {}) or {}
+                self.wind_masks[i] = direction_sector_mask(wind.get('best_direction'))
+                self.swell_masks[i] = direction_sector_mask(swell.get('ideal_swell_direction'))
+                size_range = swell.get('ideal_swell_size_m') or [0.0, np.inf]
+                self.swell_ranges[i] = [float(size_range[0]), float(size_range[-1])]
+                self.wind_quality[i] = float(wind.get('quality', 0) or 0)
+                self.swell_quality[i] = float(swell.get('quality', 0) or 0)
+                for t, state in enumerate(TIDE_STATES):
+                    self.tide_quality[i, t] = float((tides.get(state) or {}).get('quality', 0) or 0)
+            except Exception as e:
+                logger.error(f"Error compiling scoring profile for {spot.get('name', 'unknown')}: {str(e)}")
+
+    @classmethod
+    def from_arrays(cls, spot_ids: Sequence[str], wind_masks: np.ndarray, swell_masks: np.ndarray,
+                    swell_ranges: np.ndarray, wind_quality: np.ndarray, swell_quality: np.ndarray,
+                    tide_quality: np.ndarray) -> 'SpotProfiles':
+        """
+        Profiles from already compiled arrays (e.g. the columns of a compiled catalog), without
+        parsing any spot dict. Missing values (NaN) get the same defaults as in __init__.
+        """
+        profiles = cls([], [])
+        profiles.spot_ids = list(spot_ids)
+        profiles.spot_index = {spot_id: i for i, spot_id in enumerate(profiles.spot_ids)}
+        profiles.wind_masks = np.asarray(wind_masks, dtype=bool)
+        profiles.swell_masks = np.asarray(swell_masks, dtype=bool)
+        swell_ranges = np.array(swell_ranges, dtype=float).reshape(-1, 2)
+        swell_ranges[:, 0] = np.nan_to_num(swell_ranges[:, 0], nan=0.0)
+        swell_ranges[:, 1] = np.where(np.isnan(swell_ranges[:, 1]), np.inf, swell_ranges[:, 1])
+        profiles.swell_ranges = swell_ranges
+        profiles.wind_quality = np.nan_to_num(np.asarray(wind_quality, dtype=float), nan=0.0)
+        profiles.swell_quality = np.nan_to_num(np.asarray(swell_quality, dtype=float), nan=0.0)
+        profiles.tide_quality = np.nan_to_num(np.asarray(tide_quality, dtype=float), nan=0.0).reshape(-1, len(TIDE_STATES))
+        return profiles
+
+    def __len__(self) -> int:
+        return len(self.spot_ids)
+
+    def select(self, spot_ids: Sequence[str]) -> 'SpotProfiles':
+        """Profiles of the given spots, in that order, without recompiling (KeyError for an unknown spot)."""
+        rows = [self.spot_index[spot_id] for spot_id in spot_ids]
+        return self if rows == list(range(len(self))) else _select_profiles(self, rows)
+
+def concat_profiles(parts: Sequence[SpotProfiles]) -> SpotProfiles:
+    """Profiles of several compiled sets of spots (e.g. catalog shards) stacked in order."""
+    if len(parts) <= 1:
+        return parts[0] if parts else SpotProfiles([], [])
+    combined = SpotProfiles([], [])
+    combined.spot_ids = [spot_id for part in parts for spot_id in part.spot_ids]
+    combined.spot_index = {spot_id: i for i, spot_id in enumerate(combined.spot_ids)}
+    for name in PROFILE_ARRAYS:
+        setattr(combined, name, np.concatenate([getattr(part, name) for part in parts]))
+    return combined
+
+def score_grid(profiles: SpotProfiles, wave_height: np.ndarray, wind_direction: np.ndarray,
+               wave_direction: Optional[np.ndarray] = None, tide_state: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Score every spot × time step (days or hours) in one pass.
+    Inputs are arrays shaped (n_spots, n_steps) aligned with the profiles; directions in degrees,
+    tide_state as TIDE_STATES indices (-1 = unknown, scored as rising).
+    Unknown directions are not penalised; unknown wave heights give NaN scores.
+    Returns scores out of 10.
+    """
+    wave_height = np.asarray(wave_height, dtype=float)
+    rows = np.arange(len(profiles))[:, None]
+
+    wind_sector = degrees_to_sector(wind_direction)
+    wind_ok = np.where(wind_sector >= 0, profiles.wind_masks[rows, np.maximum(wind_sector, 0)], True)
+    wind_rating = profiles.wind_quality[:, None] * np.where(wind_ok, 1.0, WIND_MISMATCH_FACTOR)
+
+    size_ok = (profiles.swell_ranges[:, :1] <= wave_height) & (wave_height <= profiles.swell_ranges[:, 1:])
+    swell_rating = profiles.swell_quality[:, None] * np.where(size_ok, 1.0, SWELL_SIZE_MISMATCH_FACTOR)
+    if wave_direction is not None:
+        swell_sector = degrees_to_sector(wave_direction)
+        swell_ok = np.where(swell_sector >= 0, profiles.swell_masks[rows, np.maximum(swell_sector, 0)], True)
+        swell_rating = swell_rating * np.where(swell_ok, 1.0, SWELL_DIRECTION_MISMATCH_FACTOR)
+
+    if tide_state is None:
+        tide_state = np.full(wave_height.shape, -1, dtype=int)
+    tide_state = np.asarray(tide_state, dtype=int)
+    tide_rating = profiles.tide_quality[rows, np.where(tide_state >= 0, tide_state, DEFAULT_TIDE_STATE)]
+
+    scores = (wind_rating * WIND_WEIGHT + swell_rating * SWELL_WEIGHT + tide_rating * TIDE_WEIGHT) * SCORE_SCALE
+    return np.where(np.isnan(wave_height), np.nan, np.round(scores, 1))
+
+def score_cube(profiles: SpotProfiles, cube, tide_state: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Score a ForecastCube (spot × day) whose spot ids are in the profiles.
+    Returns scores shaped (len(cube), len(cube.dates)), aligned with the cube.
+    """
+    sub_profiles = profiles.select(cube.spot_ids)
+
+    def variable(name):
+        return cube.variable(name) if name in cube.variable_index else np.full((len(cube), len(cube.dates)), np.nan)
+
+    return score_grid(
+        sub_profiles,
+        variable('wave_height_m'),
+        variable('wind_direction_deg'),
+        variable('wave_direction_deg'),
+        tide_state
+    )
+
+def _select_profiles(profiles: SpotProfiles, rows: List[int]) -> SpotProfiles:
+    """Profiles restricted to the given rows, without recompiling."""
+    selected = SpotProfiles([], [])
+    selected.spot_ids = [profiles.spot_ids[i] for i in rows]
+    selected.spot_index = {spot_id: i for i, spot_id in enumerate(selected.spot_ids)}
+    for name in PROFILE_ARRAYS:
+        setattr(selected, name, getattr(profiles, name)[rows])
+    return selected
+
+_compiled_profiles = {}
+_compiled_profiles_lock = threading.Lock()
+MAX_COMPILED_CATALOGS = 8
+
+def compile_spot_profiles(spots: List[dict], spot_ids: Sequence[str]) -> SpotProfiles:
+    """
+    Return the compiled profiles of spots that do not come from a compiled catalog (see
+    catalog_config.SpotCatalog.profiles), compiling them only the first time their scoring
+    fields are seen in the process. Other fields (forecasts, distances...) are not part of the key.
+    """
+    key = cache_config.make_key(list(spot_ids), [[spot.get(field) for field in SCORING_FIELDS] for spot in spots])
+    with _compiled_profiles_lock:
+        profiles = _compiled_profiles.get(key)
+    if profiles is None:
+        profiles = SpotProfiles(spots, spot_ids)
+        with _compiled_profiles_lock:
+            if len(_compiled_profiles) >= MAX_COMPILED_CATALOGS:
+                _compiled_profiles.pop(next(iter(_compiled_profiles)))
+            _compiled_profiles[key] = profiles
+        logger.info(f"Compiled scoring profiles for {len(profiles)} spots")
+    return profiles
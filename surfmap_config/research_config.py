@@ -10,12 +10,70 @@ import time
 from datetime import datetime
 import json
 import streamlit as st
+import numpy as np
+import hashlib
+import threading
+from collections import Counter
 
 #import des bibliothèques
 from surfmap_config import api_config
+from surfmap_config import catalog_config
+from surfmap_config import geo_config
+from surfmap_config import travel_config
+
+SPOT_INDEX_FIELDS = ('villeSpot', 'paysSpot', 'nomSurfForecast')
+MAX_SPOT_INDEXES = 8
+_spot_indexes = {}
+_spot_indexes_lock = threading.Lock()
+
+def spot_index_version(dfSpots):
+    """Version key of a spot catalog DataFrame: a hash of its content, computed in one vectorized pass."""
+    row_hashes = pd.util.hash_pandas_object(dfSpots.astype(str), index=False).values
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()[:16]
+
+def route_spot_ids(names):
+    """
+    Spot ids (catalog_config.spot_slug) keying the cached routes to the spots named names; None
+    for the names whose id is shared with another one, whose routes stay keyed on their address.
+    """
+    slugs = [catalog_config.spot_slug(name) for name in names]
+    counts = Counter(slugs)
+    return [slug if counts[slug] == 1 else None for slug in slugs]
+
+def register_spot_index(dfSpots):
+    """
+    Build the spot-keyed index of a catalog ({nomSpot: {villeSpot, paysSpot, nomSurfForecast, spotId}},
+    first row of each spot, spotId from route_spot_ids) once per catalog version. Returns the
+    version key to look it up with.
+    """
+    version = spot_index_version(dfSpots)
+    with _spot_indexes_lock:
+        if version in _spot_indexes:
+            return version
+    columns = [column for column in SPOT_INDEX_FIELDS if column in dfSpots.columns]
+    index = {}
+    for row in dfSpots[['nomSpot'] + columns].itertuples(index=False):
+        index.setdefault(row[0], dict(zip(columns, row[1:])))
+    for spot_info, spot_id in zip(index.values(), route_spot_ids(index)):
+        spot_info['spotId'] = spot_id
+    with _spot_indexes_lock:
+        if len(_spot_indexes) >= MAX_SPOT_INDEXES:
+            _spot_indexes.pop(next(iter(_spot_indexes)))
+        _spot_indexes[version] = index
+    return version
+
+def get_spot_index(version):
+    """Spot index registered under a version key (None when unknown)."""
+    with _spot_indexes_lock:
+        return _spot_indexes.get(version)
 
 @st.cache_data
-def add_new_spot_to_dfData(villeSearch, dfData, key_api_gmaps):
+def add_new_spot_to_dfData(villeSearch, dfData, key_api_gmaps, refine_top_k=travel_config.ROUTE_REFINE_TOP_K):
+    """
+    Spots of dfData with their drive from villeSearch. Driving distance, time and costs are
+    estimated offline for every spot (see travel_config) and only the refine_top_k closest spots
+    get a live route (None: every spot); 'isEstimate' tells the rows still holding an estimate.
+    """
     dfData_temp = dfData.drop_duplicates(['nomSpot', 'villeSpot'])
     dfData_temp['villeOrigine'] = villeSearch
 
@@ -34,51 +92,57 @@ def add_new_spot_to_dfData(villeSearch, dfData, key_api_gmaps):
             lambda x: tuple(float(coord) for coord in x) if isinstance(x, (list, tuple)) else x
         )
 
-    # Initialize numeric columns with default values
     numeric_columns = ['drivingDist', 'drivingTime', 'tollCost', 'gazPrice', 'prix']
-    for col in numeric_columns:
-        dfData_temp[col] = 0.0
-
-    # Get route information using Google Maps API
-    dfData_request = dfData_temp[['gpsSpot', 'gpsVilleOrigine']]
-    for row in dfData_request.itertuples():
-        try:
-            # Get spot coordinates and convert to float
-            spot_coords = row.gpsSpot
-            if isinstance(spot_coords, (list, tuple)) and len(spot_coords) == 2:
-                spot_lat, spot_lon = float(spot_coords[0]), float(spot_coords[1])
-            else:
-                continue
-
-            # Get origin coordinates and convert to float
-            origin_coords = row.gpsVilleOrigine
-            if isinstance(origin_coords, (list, tuple)) and len(origin_coords) == 2:
-                origin_lat, origin_lon = float(origin_coords[0]), float(origin_coords[1])
-            else:
-                continue
-
-            # Format coordinates for API call
-            origin = [origin_lat, origin_lon]
-            destination = [spot_lat, spot_lon]
-            
-            route_info = api_config.get_google_route_info(
-                origin,
-                destination,
-                key_api_gmaps
-            )
-            
-            if route_info:
-                # Store route information as float values
-                dfData_temp.loc[row.Index, 'drivingDist'] = float(route_info['distance'])
-                dfData_temp.loc[row.Index, 'drivingTime'] = float(route_info['duration'])
-                dfData_temp.loc[row.Index, 'tollCost'] = float(route_info.get('toll_cost', 0))
-                dfData_temp.loc[row.Index, 'gazPrice'] = float(route_info.get('fuel_cost', 0))
-
-        except Exception as e:
-            continue
-
-    # Calculate total price as sum of toll and fuel costs
-    dfData_temp['prix'] = dfData_temp['tollCost'] + dfData_temp['gazPrice']
+
+    spot_coords = [
+        coords if isinstance(coords, (list, tuple)) and len(coords) == 2 else None
+        for coords in dfData_temp['gpsSpot']
+    ] if 'gpsSpot' in dfData_temp.columns else [None] * len(dfData_temp)
+    lats, lons = np.array([coords if coords else (np.nan, np.nan) for coords in spot_coords],
+                          dtype=float).reshape(-1, 2).T
+    regions = dfData_temp['paysSpot'].tolist() if 'paysSpot' in dfData_temp.columns else None
+
+    # Offline estimate for every spot, no network call
+    origin_lat, origin_lon = gps_data_villeSearch
+    distances, durations = travel_config.estimate_travel(origin_lat, origin_lon, lats, lons, regions)
+    is_estimate = np.ones(len(dfData_temp), dtype=bool)
+
+    # Live routes (batched Distance Matrix requests) for the closest spots only
+    candidates = np.flatnonzero(np.isfinite(durations))
+    candidates = candidates[np.argsort(durations[candidates], kind='stable')]
+    if refine_top_k is not None:
+        candidates = candidates[:max(int(refine_top_k), 0)]
+    spot_ids = route_spot_ids(dfData_temp['nomSpot'].tolist())
+    routes = api_config.get_bulk_route_info(gps_data_villeSearch, [spot_coords[i] for i in candidates],
+                                            [spot_ids[i] for i in candidates])
+    refined = np.array([i for i, route in zip(candidates, routes) if route], dtype=int)
+    if refined.size:
+        distances[refined] = [route['distance'] for route in routes if route]
+        durations[refined] = [route['duration'] for route in routes if route]
+        is_estimate[refined] = False
+        # Re-estimate the other spots with the detour factor observed on the fetched routes
+        straight_km = geo_config.haversine_km(origin_lat, origin_lon, lats[refined], lons[refined])
+        detour_factor = travel_config.calibrate_detour_factor(straight_km, distances[refined])
+        if is_estimate.any():
+            distances[is_estimate], durations[is_estimate] = travel_config.estimate_travel(
+                origin_lat, origin_lon, lats[is_estimate], lons[is_estimate],
+                [regions[i] for i in np.flatnonzero(is_estimate)] if regions is not None else None,
+                detour_factor)
+
+    # Fuel and toll costs of every drive at once (0 when the spot has no coordinates)
+    distances, durations = np.nan_to_num(distances), np.nan_to_num(durations)
+    gaz_price = np.round(distances * api_config.consommation_moyenne / 100 * api_config.prix_essence, 2)
+    toll_cost = np.round(distances * api_config.toll_cost_per_km, 2)
+
+    # Assign each column once; total price is the sum of toll and fuel costs
+    dfData_temp = dfData_temp.assign(
+        drivingDist=np.round(distances, 1),
+        drivingTime=np.round(durations, 2),
+        tollCost=toll_cost,
+        gazPrice=gaz_price,
+        prix=toll_cost + gaz_price,
+        isEstimate=is_estimate,
+    )
 
     # Ensure all numeric columns are float type
     for col in numeric_columns:
@@ -88,16 +152,35 @@ def add_new_spot_to_dfData(villeSearch, dfData, key_api_gmaps):
     return dfData_temp
 
 @st.cache_data
-def get_surfspot_data(start_address, spot, dfSpots, key_api_gmaps):
+def get_surfspot_data(start_address, spot, dfSpots, key_api_gmaps, route_info=None, spot_index_key=None):
+    """
+    Route and forecast information of a spot from start_address. route_info, when already known
+    (see load_surfspot_data), saves the Directions request; api_config.NO_ROUTE means the spot
+    is known to be unroutable (None is returned without a request). With spot_index_key (see
+    register_spot_index), dfSpots can be None: the spot is read from the index, and the
+    DataFrame is neither scanned nor hashed by the cache. An index evicted since is rebuilt
+    from dfSpots; without it, LookupError is raised (and nothing is cached).
+    Returns None for a spot missing from the catalog.
+    """
+    spot_index = get_spot_index(spot_index_key) if spot_index_key is not None else None
+    if spot_index is None:
+        if dfSpots is None:
+            raise LookupError(f"Spot index {spot_index_key} is not registered (evicted?): pass dfSpots to rebuild it")
+        spot_index = get_spot_index(register_spot_index(dfSpots))
+        if spot_index is None:
+            raise LookupError("Spot index evicted right after being registered: too many catalogs in use")
     try:
-        villeSpot = dfSpots[dfSpots['nomSpot'] == spot]['villeSpot'].tolist()[0]
-        paysSpot = dfSpots[dfSpots['nomSpot'] == spot]['paysSpot'].tolist()[0]
-        nomSurfForecast = dfSpots[dfSpots['nomSpot'] == spot]['nomSurfForecast'].tolist()[0]
-    except:
+        spot_info = spot_index[spot]
+        villeSpot = spot_info['villeSpot']
+        paysSpot = spot_info['paysSpot']
+        nomSurfForecast = spot_info['nomSurfForecast']
+    except KeyError:
         return None
 
     try:
-        route_info = api_config.get_google_route_info(start_address, villeSpot, key_api_gmaps)
+        if route_info is None:  # Not answered by the Distance Matrix (NO_ROUTE is falsy but not None)
+            route_info = api_config.get_google_route_info(start_address, villeSpot, key_api_gmaps,
+                                                          spot_id=spot_info.get('spotId'))
         if route_info:
             result_spot = {
                 'drivingDist': route_info['distance'],
@@ -125,9 +208,20 @@ def load_surfspot_data(start_address, dfSpots, key_api_gmaps):
     liste_surf_spots = dfSpots['nomSpot'].tolist()
     result = dict()
 
+    # Spot lookups go through an index built once for this catalog version, not DataFrame scans
+    spot_index_key = register_spot_index(dfSpots)
+    spot_index = get_spot_index(spot_index_key)
+
+    # Drive to every spot town in a few batched Distance Matrix requests instead of one Directions call per spot.
+    # Unroutable spots come back as NO_ROUTE; only the unanswered ones (None) fall back to Directions
+    routes = dict(zip(spot_index, api_config.get_bulk_route_info(
+        start_address, [spot_info.get('villeSpot') for spot_info in spot_index.values()],
+        [spot_info['spotId'] for spot_info in spot_index.values()])))
+
     for spot in liste_surf_spots:
         iteration += 1
-        result[spot] = get_surfspot_data(start_address, spot, dfSpots, key_api_gmaps)
+        result[spot] = get_surfspot_data(start_address, spot, None, key_api_gmaps, route_info=routes.get(spot),
+                                         spot_index_key=spot_index_key)
         progress_bar.progress(nb_percent_complete*iteration + 1)
 
     placeholder_progress_bar.empty()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import logging
+import os
+from typing import Optional
+
+import streamlit as st
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def get_secret(name: str, default: Optional[str] = None) -> Optional[str]:
+    """
+    Read a setting from the Streamlit secrets, falling back to the environment variable of the
+    same name (then its upper-case form) so that batch jobs and benchmarks run without a secrets file.
+    """
+    try:
+        if name in st.secrets:
+            return st.secrets[name]
+    except Exception:  # No secrets file at all
+        pass
+    return os.environ.get(name, os.environ.get(name.upper(), default))
+
+# API endpoints, overridable to point the app at proxies or local stand-ins (see benchmarks/)
+OPENAI_BASE_URL = get_secret("OPENAI_BASE_URL")  # None: the OpenAI default
+STORMGLASS_BASE_URL = get_secret("STORMGLASS_BASE_URL", "https://api.stormglass.io/v2").rstrip("/")
+GOOGLE_MAPS_BASE_URL = get_secret("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com").rstrip("/")
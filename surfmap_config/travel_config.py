@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import logging
+import math
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from unidecode import unidecode
+
+from . import geo_config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Road distance / straight-line distance, typical of coastal European roads; recalibrated
+# from the routes actually fetched (see calibrate_detour_factor)
+DETOUR_FACTOR = 1.3
+MIN_DETOUR_FACTOR, MAX_DETOUR_FACTOR = 1.0, 3.0
+MIN_CALIBRATION_KM = 2.0  # Shorter trips say more about the street grid than about the road network
+# Only the K best estimated spots get a live route
+ROUTE_REFINE_TOP_K = 10
+
+# Average driving speed (km/h) per band of road distance, as (band upper bound km, speed):
+# town streets first, then regional roads, then motorways
+SPEED_PROFILES = {
+    'default': ((10, 35), (50, 60), (150, 80), (math.inf, 95)),
+    'france': ((10, 35), (50, 65), (150, 90), (math.inf, 110)),
+    'portugal': ((10, 35), (50, 60), (150, 85), (math.inf, 100)),
+    'spain': ((10, 35), (50, 65), (150, 90), (math.inf, 105)),
+}
+REGION_ALIASES = {'fr': 'france', 'pt': 'portugal', 'es': 'spain', 'espana': 'spain'}
+
+def profile_name(region) -> str:
+    """Speed profile of a region or country name ('default' when unknown)."""
+    name = unidecode(str(region or '')).strip().lower()
+    name = REGION_ALIASES.get(name, name)
+    return name if name in SPEED_PROFILES else 'default'
+
+def road_duration_h(road_km, profile: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """Driving time (hours) of road distances, each band of the trip at the speed of the profile."""
+    road_km = np.asarray(road_km, dtype=float)
+    hours = np.zeros_like(road_km)
+    lower = 0.0
+    for upper, speed in profile:
+        hours += np.clip(road_km - lower, 0.0, upper - lower) / speed
+        lower = upper
+    return hours
+
+def estimate_travel(origin_lat: float, origin_lon: float, lats, lons, regions: Optional[Sequence] = None,
+                    detour_factor: float = DETOUR_FACTOR) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Estimated road distance (km) and driving time (hours) from an origin to every destination,
+    without any network call: haversine distance × detour_factor, timed with the speed profile of
+    each destination's region. NaN where a destination has no coordinates.
+    """
+    lats, lons = np.asarray(lats, dtype=float), np.asarray(lons, dtype=float)
+    road_km = geo_config.haversine_km(origin_lat, origin_lon, lats, lons) * detour_factor
+    names = np.array([profile_name(region) for region in regions] if regions is not None
+                     else ['default'] * len(road_km))
+    hours = np.full_like(road_km, np.nan)
+    for name in np.unique(names) if len(names) else []:
+        rows = names == name
+        hours[rows] = road_duration_h(road_km[rows], SPEED_PROFILES[name])
+    hours[np.isnan(road_km)] = np.nan
+    return road_km, hours
+
+def calibrate_detour_factor(straight_km, road_km, default: float = DETOUR_FACTOR) -> float:
+    """Median road/straight-line ratio of known routes, within sane bounds; default without usable routes."""
+    straight_km, road_km = np.asarray(straight_km, dtype=float), np.asarray(road_km, dtype=float)
+    usable = (straight_km >= MIN_CALIBRATION_KM) & np.isfinite(road_km) & (road_km > 0)
+    if not usable.any():
+        return default
+    return float(np.clip(np.median(road_km[usable] / straight_km[usable]), MIN_DETOUR_FACTOR, MAX_DETOUR_FACTOR))
@@ -0,0 +1,248 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+"""
+Background cache warmer: refreshes Stormglass data, base forecasts, quick summaries and
+conditions analyses of every catalog spot for the next days into the persistent cache,
+so that interactive searches hit warm data. Spot scores are not warmed: they are one
+vectorized pass over this cached data (rating_config.score_cube), cheap to compute per search.
+
+    python -m surfmap_config.warmer              # run forever, every SURFMAP_WARM_INTERVAL_MIN minutes
+    python -m surfmap_config.warmer --once       # single pass
+    python -m surfmap_config.warmer --status     # coverage and staleness report only
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from . import cache_config
+from . import catalog_config
+from . import cube_config
+from . import forecast_config
+from . import metrics_config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WARM_DAYS = 7
+WARM_INTERVAL_MIN = float(os.environ.get("SURFMAP_WARM_INTERVAL_MIN", 180))
+# Pause after each job that called an API, to stay under the Stormglass and OpenAI rate limits
+WARM_STAGGER_S = float(os.environ.get("SURFMAP_WARM_STAGGER_S", 1.0))
+TEXT_KINDS = ('quick_summary', 'conditions_analysis')
+
+def warm_dates(days: int = WARM_DAYS) -> List[str]:
+    """The dates covered by a warm pass, starting today (as the app does)."""
+    today = datetime.now()
+    return [(today + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+
+def catalog_spots() -> List[dict]:
+    """Every spot of the sharded catalog, as served to interactive searches."""
+    return catalog_config.load_sharded_catalog(catalog_config.CATALOG_SOURCES).all_spots()
+
+def needs_refresh(namespace: str, key: str, horizon_s: float) -> bool:
+    """True when the entry is missing or expires before horizon_s seconds from now."""
+    info = cache_config.cache_entry_info(namespace, key)
+    return info is None or info['expires_at'] - time.time() < horizon_s
+
+def stormglass_key(spot: dict) -> Tuple[tuple, str]:
+    """Grid cell of a spot and the persistent key of its Stormglass data."""
+    cell = forecast_config.snap_to_stormglass_grid(spot['latitude'], spot['longitude'])
+    return cell, cache_config.versioned_key('stormglass', *cell)
+
+def forecast_key(spot: dict, start_date: str) -> str:
+    """Persistent key of the base GPT forecast of a spot starting at start_date."""
+    return cache_config.versioned_key('forecast', 'gpt_forecast', forecast_config.build_forecast_messages(spot, start_date))
+
+def text_keys(spot: dict, day: dict, sg_cube: cube_config.ForecastCube) -> Optional[Dict[str, str]]:
+    """
+    Persistent keys of the quick summary and conditions analysis of a spot-day, exactly as the app
+    builds them (day directions are filled in the process). None when no GPT text is expected:
+    no Stormglass data, or clearly unsuitable conditions.
+    """
+    forecast_for_day = sg_cube.day(forecast_config.get_spot_id(spot), day['date'])
+    if not forecast_for_day or forecast_config.is_unsuitable_conditions(forecast_for_day):
+        return None
+    day['wave_direction_deg'] = forecast_for_day.get('wave_direction_deg', 270)
+    day['wind_direction_deg'] = forecast_for_day.get('wind_direction_deg', 90)
+    return {
+        'quick_summary': cache_config.versioned_key(
+            'forecast', 'quick_summary', forecast_config.build_quick_summary_prompt(spot, day)),
+        'conditions_analysis': cache_config.versioned_key(
+            'forecast', 'conditions_analysis',
+            forecast_config.build_conditions_analysis_prompt(spot, day['date'], forecast_for_day)),
+    }
+
+def cached_spot_data(spot: dict, start_date: str) -> Tuple[Optional[list], cube_config.ForecastCube]:
+    """Base forecast days and Stormglass cube of a spot read from the persistent cache only (no API call)."""
+    cached = cache_config.cache_get('forecast', forecast_key(spot, start_date))
+    days = forecast_config.process_gpt_response(cached['response'], spot['name']) if cached else None
+    records = cache_config.cache_get('stormglass', stormglass_key(spot)[1])
+    if records == []:  # Grid node without marine data: the app falls back to the spot coordinates
+        records = cache_config.cache_get(
+            'stormglass', cache_config.versioned_key('stormglass', *forecast_config.stormglass_fallback_cell(spot)))
+    return days, cube_config.ForecastCube.from_records({forecast_config.get_spot_id(spot): records})
+
+def _clear_local_caches() -> None:
+    """Drop this process's st.cache_data copies so refreshed entries are really refetched."""
+    for cached_function in (forecast_config.fetch_stormglass_cell, forecast_config.get_cached_gpt_response,
+                            forecast_config.get_conditions_analysis, forecast_config.get_quick_summary):
+        cached_function.clear()
+
+def warm_once(spots: Optional[List[dict]] = None, days: int = WARM_DAYS, stagger_s: float = WARM_STAGGER_S,
+              horizon_s: float = WARM_INTERVAL_MIN * 60) -> Dict[str, int]:
+    """
+    One warm pass. Entries missing or expiring within horizon_s (by default, before the next pass)
+    are deleted and recomputed through the regular forecast_config functions, one job at a time
+    with stagger_s seconds between API-calling jobs. Returns per-kind counts of refreshed entries.
+    """
+    spots = catalog_spots() if spots is None else spots
+    dates = warm_dates(days)
+    start_date = dates[0]
+    cache_config.sync_cache_versions()
+    _clear_local_caches()
+    counts = {'stormglass': 0, 'gpt_forecast': 0, 'quick_summary': 0, 'conditions_analysis': 0, 'errors': 0}
+
+    def run_job(kind: str, namespace: str, key: str, job) -> None:
+        if not needs_refresh(namespace, key, horizon_s):
+            return
+        cache_config.cache_delete(namespace, key)
+        try:
+            if job() is None:
+                counts['errors'] += 1
+            else:
+                counts[kind] += 1
+        except Exception as e:
+            logger.error(f"[warmer] {kind} job failed: {str(e)}")
+            counts['errors'] += 1
+        time.sleep(stagger_s)
+
+    # Stormglass first, once per grid cell
+    cells = {}
+    for spot in spots:
+        cell, key = stormglass_key(spot)
+        cells.setdefault(key, cell)
+    for key, (lat, lon) in cells.items():
+        run_job('stormglass', 'stormglass', key, lambda: forecast_config.fetch_stormglass_cell(lat, lon))
+    # Spots whose grid node has no marine data are served from their own coordinates
+    fallback_cells = {}
+    for spot in spots:
+        cell, key = stormglass_key(spot)
+        exact = forecast_config.stormglass_fallback_cell(spot)
+        if exact != cell and cache_config.cache_get('stormglass', key) == []:
+            fallback_cells.setdefault(cache_config.versioned_key('stormglass', *exact), exact)
+    for key, (lat, lon) in fallback_cells.items():
+        run_job('stormglass', 'stormglass', key, lambda: forecast_config.fetch_stormglass_cell(lat, lon))
+
+    # Then base forecasts, summaries and analyses spot by spot
+    for spot in spots:
+        run_job('gpt_forecast', 'forecast', forecast_key(spot, start_date),
+                lambda: forecast_config.get_surf_forecast(spot, start_date))
+        forecast_days, sg_cube = cached_spot_data(spot, start_date)
+        if not forecast_days:
+            continue
+        for day in forecast_days:
+            if day.get('date') not in dates:
+                continue
+            keys = text_keys(spot, day, sg_cube)
+            if not keys:
+                continue
+            run_job('quick_summary', 'forecast', keys['quick_summary'],
+                    lambda: forecast_config.get_quick_summary(spot, day))
+            run_job('conditions_analysis', 'forecast', keys['conditions_analysis'],
+                    lambda: forecast_config.get_conditions_analysis(spot, day['date'], _sg_forecasts=sg_cube))
+
+    logger.info(f"[warmer] Pass done for {len(spots)} spots, {len(cells)} cells: {counts}")
+    return counts
+
+def warm_status(spots: Optional[List[dict]] = None, days: int = WARM_DAYS,
+                horizon_s: float = WARM_INTERVAL_MIN * 60) -> dict:
+    """
+    Coverage and staleness of the warm data, read from the persistent cache without any API call.
+    Per kind: expected and cached entries, coverage, age of the oldest entry and entries expiring
+    within horizon_s. GPT texts are only expected where the base forecast and Stormglass data are cached.
+    """
+    spots = catalog_spots() if spots is None else spots
+    dates = warm_dates(days)
+    now = time.time()
+    report = {kind: {'expected': 0, 'cached': 0, 'expiring': 0, 'oldest_age_s': None}
+              for kind in ('stormglass', 'gpt_forecast') + TEXT_KINDS}
+
+    def record(kind: str, namespace: str, key: str) -> None:
+        stats = report[kind]
+        stats['expected'] += 1
+        info = cache_config.cache_entry_info(namespace, key)
+        if info is None:
+            return
+        stats['cached'] += 1
+        stats['expiring'] += int(info['expires_at'] - now < horizon_s)
+        age = now - info['created_at']
+        stats['oldest_age_s'] = age if stats['oldest_age_s'] is None else max(stats['oldest_age_s'], age)
+
+    for key in {stormglass_key(spot)[1] for spot in spots}:
+        record('stormglass', 'stormglass', key)
+    for spot in spots:
+        record('gpt_forecast', 'forecast', forecast_key(spot, dates[0]))
+        forecast_days, sg_cube = cached_spot_data(spot, dates[0])
+        for day in forecast_days or []:
+            keys = text_keys(spot, day, sg_cube) if day.get('date') in dates else None
+            for kind, key in (keys or {}).items():
+                record(kind, 'forecast', key)
+
+    for stats in report.values():
+        stats['coverage'] = round(stats['cached'] / stats['expected'], 3) if stats['expected'] else None
+        if stats['oldest_age_s'] is not None:
+            stats['oldest_age_s'] = round(stats['oldest_age_s'])
+    return {'generated_at': datetime.now().isoformat(timespec='seconds'), 'spots': len(spots),
+            'dates': dates, 'kinds': report}
+
+def format_status(status: dict) -> str:
+    """Plain-text table of a warm_status report."""
+    lines = [f"Warm status at {status['generated_at']} - {status['spots']} spots, "
+             f"{status['dates'][0]} to {status['dates'][-1]}",
+             f"{'kind':<22}{'cached':>14}{'coverage':>10}{'expiring':>10}{'oldest':>10}"]
+    for kind, stats in status['kinds'].items():
+        coverage = f"{stats['coverage']:.0%}" if stats['coverage'] is not None else "-"
+        oldest = f"{stats['oldest_age_s'] / 3600:.1f}h" if stats['oldest_age_s'] is not None else "-"
+        lines.append(f"{kind:<22}{stats['cached']:>7}/{stats['expected']:<6}{coverage:>10}{stats['expiring']:>10}{oldest:>10}")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the Surfmap forecast caches warm.")
+    parser.add_argument('--once', action='store_true', help="Run a single warm pass and exit")
+    parser.add_argument('--status', action='store_true', help="Only print the coverage/staleness report")
+    parser.add_argument('--json', action='store_true', help="Print the status report as JSON")
+    parser.add_argument('--days', type=int, default=WARM_DAYS, help=f"Days to warm (default: {WARM_DAYS})")
+    parser.add_argument('--interval', type=float, default=WARM_INTERVAL_MIN,
+                        help=f"Minutes between passes (default: {WARM_INTERVAL_MIN:g})")
+    parser.add_argument('--stagger', type=float, default=WARM_STAGGER_S,
+                        help=f"Seconds between API-calling jobs (default: {WARM_STAGGER_S:g})")
+    args = parser.parse_args()
+    horizon_s = args.interval * 60
+
+    def print_status():
+        status = warm_status(days=args.days, horizon_s=horizon_s)
+        print(json.dumps(status, indent=2) if args.json else format_status(status), flush=True)
+
+    if args.status:
+        print_status()
+        return
+    while True:
+        started = time.time()
+        try:
+            with metrics_config.run('warm'):
+                warm_once(days=args.days, stagger_s=args.stagger, horizon_s=horizon_s)
+        except Exception as e:
+            logger.error(f"[warmer] Pass failed: {str(e)}")
+        print_status()
+        if args.once:
+            return
+        time.sleep(max(0.0, horizon_s - (time.time() - started)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# Keep the persistent cache and compiled catalogs of the test run out of data/
+_work_dir = tempfile.mkdtemp(prefix="surfmap-tests-")
+os.environ.setdefault("SURFMAP_CACHE_DIR", os.path.join(_work_dir, "cache"))
+os.environ.setdefault("SURFMAP_CATALOG_DIR", os.path.join(_work_dir, "catalog"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
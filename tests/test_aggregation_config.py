@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from surfmap_config import aggregation_config
+
+PARAMS = ['waveHeight', 'waveDirection', 'windSpeed']
+
+
+def hour(time, wave_height=None, wave_direction=None, wind_speed=None):
+    values = {'waveHeight': wave_height, 'waveDirection': wave_direction, 'windSpeed': wind_speed}
+    return dict({'time': time}, **{param: {'noaa': value} for param, value in values.items() if value is not None})
+
+
+def test_circular_mean_wraps_around_north():
+    stats = aggregation_config.grouped_stats(np.array([0, 0]), np.array([350.0, 10.0]), 1, circular=True)
+    assert np.cos(np.deg2rad(stats['mean'][0])) == pytest.approx(1.0)  # 0°, possibly written 360°
+    assert stats['spread'][0] == pytest.approx(10.0, abs=0.1)
+
+
+def test_circular_mean_of_opposite_quadrants():
+    stats = aggregation_config.grouped_stats(np.array([0, 0, 1, 1]), np.array([80.0, 100.0, 260.0, 280.0]), 2,
+                                             circular=True)
+    assert stats['mean'] == pytest.approx([90.0, 270.0])
+
+
+def test_linear_stats_per_group_ignore_nan():
+    stats = aggregation_config.grouped_stats(np.array([0, 0, 0, 1, 2]), np.array([1.0, 3.0, 2.0, np.nan, 5.0]), 3)
+    assert stats['mean'][0] == pytest.approx(2.0)
+    assert (stats['min'][0], stats['max'][0]) == (1.0, 3.0)
+    assert stats['p10'][0] == pytest.approx(1.2)
+    assert stats['p90'][0] == pytest.approx(2.8)
+    assert np.isnan(stats['mean'][1])  # Only a missing value
+    assert stats['mean'][2] == stats['min'][2] == stats['max'][2] == 5.0
+
+
+def test_aggregate_daily_groups_hours_by_utc_date():
+    hours = [
+        hour('2026-01-01T00:00:00+00:00', 1.0, 350.0, 4.0),
+        hour('2026-01-01T12:00:00+00:00', 2.0, 10.0, 6.0),
+        hour('2026-01-02T00:00:00+00:00', 3.0, 180.0, 8.0),
+    ]
+    records = aggregation_config.aggregate_daily(hours, PARAMS)
+    assert [record['date'] for record in records] == ['2026-01-01', '2026-01-02']
+    assert records[0]['wave_height_m'] == 1.5
+    assert records[0]['wave_direction_deg'] in (0.0, 360.0)
+    assert records[0]['wind_speed_m_s'] == 5.0
+    assert records[0]['stats']['wave_height_m']['max'] == 2.0
+    assert records[1]['wave_direction_deg'] == 180.0
+
+
+def test_days_missing_a_parameter_are_skipped():
+    hours = [hour('2026-01-01T00:00:00+00:00', wind_speed=4.0, wave_direction=90.0),
+             hour('2026-01-02T00:00:00+00:00', 1.0, 90.0, 4.0)]
+    assert [record['date'] for record in aggregation_config.aggregate_daily(hours, PARAMS)] == ['2026-01-02']
+    assert aggregation_config.aggregate_daily([], PARAMS) == []
+
+
+def test_aggregate_daily_many_matches_single_payloads():
+    payloads = [
+        [hour('2026-01-01T00:00:00+00:00', 1.0, 90.0, 2.0)],
+        [hour('2026-01-01T06:00:00+00:00', 2.0, 270.0, 3.0), hour('2026-01-02T06:00:00+00:00', 4.0, 270.0, 5.0)],
+    ]
+    dates, daily = aggregation_config.aggregate_daily_many(payloads, PARAMS)
+    assert list(dates) == ['2026-01-01', '2026-01-02']
+    assert daily['waveHeight']['mean'].shape == (2, 2)
+    for idx, payload in enumerate(payloads):
+        assert aggregation_config.daily_records(dates, daily, idx) == aggregation_config.aggregate_daily(payload, PARAMS)
@@ -0,0 +1,129 @@
+import pytest
+
+from surfmap_config import cache_config
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """A fresh persistent cache installed as the process-wide one, with no registered namespace."""
+    cache = cache_config.PersistentCache(str(tmp_path / "cache.sqlite3"), max_bytes=1000)
+    monkeypatch.setattr(cache_config, "_persistent_cache", cache)
+    monkeypatch.setattr(cache_config, "_namespaces", {})
+    monkeypatch.setattr(cache_config, "_seen_versions", {})
+    return cache
+
+
+def test_set_get_roundtrip(cache):
+    cache.set('forecast', 'a', {'rating': 7.5, 'days': [1, 2]})
+    assert cache.get('forecast', 'a') == {'rating': 7.5, 'days': [1, 2]}
+    assert cache.get('forecast', 'missing') is None
+    assert cache.get('stormglass', 'a') is None
+
+
+def test_none_is_never_stored(cache):
+    cache.set('forecast', 'a', None)
+    cache.set_many('forecast', [('b', None, None), ('c', 1, 'spot')])
+    assert cache.stats() == {'forecast': {'entries': 1, 'bytes': 1}}
+
+
+def test_expired_entries_are_misses(cache, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(cache_config.time, 'time', lambda: now)
+    cache.set('forecast', 'a', 'value', ttl=60)
+    now += 59
+    assert cache.get('forecast', 'a') == 'value'
+    now += 2
+    assert cache.get('forecast', 'a') is None
+    assert cache.entry_info('forecast', 'a') is None
+
+
+def test_lru_eviction_keeps_recently_read_entries(cache, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(cache_config.time, 'time', lambda: now)
+    payload = 'x' * 98  # 100 bytes once JSON encoded
+    for i in range(9):
+        now += 1
+        cache.set('forecast', f'k{i}', payload)
+    now += 1
+    assert cache.get('forecast', 'k0') == payload  # k0 becomes the most recently used
+    now += 1
+    cache.set('forecast', 'k9', payload)
+    now += 1
+    cache.set('forecast', 'k10', payload)  # 1100 bytes: evicted down to 900
+
+    assert cache.stats()['forecast'] == {'entries': 9, 'bytes': 900}
+    assert cache.get('forecast', 'k0') == payload
+    assert cache.get('forecast', 'k1') is None
+    assert cache.get('forecast', 'k2') is None
+
+
+def test_set_many_writes_every_entry(cache):
+    cache.set_many('route', [(f'k{i}', {'distance': i}, str(i)) for i in range(5)])
+    assert [cache.get('route', f'k{i}') for i in range(5)] == [{'distance': i} for i in range(5)]
+
+
+def test_get_many_returns_live_hits_only(cache, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(cache_config.time, 'time', lambda: now)
+    monkeypatch.setattr(cache_config, 'GET_MANY_CHUNK_SIZE', 2)  # Several IN (...) queries
+    cache.set_many('route', [(f'k{i}', {'distance': i}, None) for i in range(4)], ttl=60)
+    cache.set('route', 'short', 1, ttl=10)
+    cache.set('forecast', 'k4', 4)
+    now += 30
+
+    keys = ['k0', 'k3', 'k0', 'short', 'k4', 'missing']
+    assert cache.get_many('route', keys) == {'k0': {'distance': 0}, 'k3': {'distance': 3}}
+    assert cache.get_many('route', []) == {}
+    assert cache_config.cache_get_many('route', ['k1', 'missing']) == {'k1': {'distance': 1}}
+
+
+def test_version_change_switches_keys_without_purging(cache):
+    cleared = []
+    cache_config.register_namespace('forecast', 'catalog-v1', clear_callbacks=[lambda: cleared.append(True)])
+    cache_config.sync_cache_versions()
+    key = cache_config.versioned_key('forecast', 'spot', '2026-01-01')
+    cache_config.cache_set('forecast', key, 'v1')
+
+    cache_config.register_namespace('forecast', 'catalog-v2')
+    assert cache_config.sync_cache_versions() == ['forecast']
+    assert cleared == [True]
+    assert cache_config.versioned_key('forecast', 'spot', '2026-01-01') != key
+    # Old-version entries are left to expire, for processes still running that version
+    assert cache_config.cache_get('forecast', key) == 'v1'
+    assert cache.get_versions()['forecast'][0] == cache_config.namespace_version('forecast')
+    # Unchanged versions are left alone
+    assert cache_config.sync_cache_versions() == []
+
+
+def test_concurrent_versions_do_not_invalidate_each_other(cache):
+    cleared = []
+    cache_config.register_namespace('forecast', 'catalog-v2', clear_callbacks=[lambda: cleared.append(True)])
+    cache_config.sync_cache_versions()
+    key = cache_config.versioned_key('forecast', 'spot', '2026-01-01')
+    cache_config.cache_set('forecast', key, 'v2')
+
+    for _ in range(3):
+        # Another process (older deploy, warmer) records its own version between our reruns
+        cache.record_version('forecast', 'some-other-version')
+        assert cache_config.sync_cache_versions() == []
+    assert cleared == []
+    assert cache_config.cache_get('forecast', key) == 'v2'
+
+
+def test_flush_clears_local_caches(cache):
+    cleared = []
+    cache_config.register_namespace('stormglass', 'v1', clear_callbacks=[lambda: cleared.append(True)])
+    cache_config.sync_cache_versions()
+    cache_config.cache_set('stormglass', 'cell', [1, 2, 3])
+    assert cache_config.flush_cache('stormglass') == {'stormglass': 1}
+    assert cleared == [True]
+    assert cache_config.cache_get('stormglass', 'cell') is None
+
+
+def test_request_memo_computes_once():
+    memo = cache_config.RequestMemo()
+    calls = []
+    for _ in range(3):
+        assert memo.get_or_compute('cell', lambda: calls.append(1) or 42) == 42
+    assert calls == [1]
+    assert memo.requests == 3 and len(memo) == 1
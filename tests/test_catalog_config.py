@@ -0,0 +1,104 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from surfmap_config import catalog_config, geo_config, rating_config
+
+LISBON = (38.7223, -9.1393)
+
+
+def spot(name, lat, lon, **fields):
+    return {
+        'name': name, 'latitude': lat, 'longitude': lon,
+        'wind_compatibility': {'best_direction': 'E/NE', 'quality': 4},
+        'swell_compatibility': {'ideal_swell_direction': 'NW to W', 'ideal_swell_size_m': [1, 2.5], 'quality': 3},
+        'tide_behavior': {'low': {'quality': 5}, 'rising': {'quality': 4}, 'high': {'quality': 2}, 'falling': {'quality': 3}},
+        'local_tips': f"Tips for {name}",
+        'access': f"Parking at {name}",
+        **fields,
+    }
+
+
+@pytest.fixture
+def spots():
+    return [
+        spot('Carcavelos', 38.6780, -9.3350),
+        spot('Costa da Caparica', 38.6410, -9.2390),
+        spot('Ericeira', 38.9630, -9.4170, swell_compatibility={'ideal_swell_direction': 'N', 'quality': 5}),
+        spot('Peniche', 39.3560, -9.3810, tide_behavior={}),
+        spot('Nazaré', 39.6020, -9.0710, wind_compatibility={'best_direction': 'anything', 'quality': 2}),
+        spot('Sagres', 37.0090, -8.9400),
+    ]
+
+
+@pytest.fixture
+def source(tmp_path, spots):
+    json_path = tmp_path / "spots.json"
+    json_path.write_text(json.dumps({'spots': spots}), encoding='utf-8')
+    return str(json_path)
+
+
+def test_catalog_round_trip(source, spots, tmp_path):
+    catalog = catalog_config.load_catalog(source, str(tmp_path / "catalog"))
+    assert len(catalog) == len(spots)
+    assert catalog.spot_ids[:2] == ['carcavelos', 'costa-da-caparica']
+    # Prose is stored apart and read back on demand
+    assert all(field not in catalog.spots[0] for field in catalog_config.PROSE_FIELDS)
+    assert catalog.prose('carcavelos') == {'local_tips': "Tips for Carcavelos", 'access': "Parking at Carcavelos"}
+    assert catalog.prose('unknown') == {}
+    assert catalog.columns['latitude'] == pytest.approx([s['latitude'] for s in spots])
+
+
+def test_profiles_from_columns_match_the_json_spots(source, spots, tmp_path):
+    catalog = catalog_config.load_catalog(source, str(tmp_path / "catalog"))
+    expected = rating_config.SpotProfiles(spots, catalog.spot_ids)
+    for name in rating_config.PROFILE_ARRAYS:
+        np.testing.assert_array_equal(getattr(catalog.profiles, name), getattr(expected, name), err_msg=name)
+
+
+def test_sector_masks_pack_round_trip():
+    masks = np.array([rating_config.direction_sector_mask(d) for d in ('E/NE', 'NW to W', 'N', '')])
+    bits = np.array([rating_config.pack_sector_mask(mask) for mask in masks], dtype=np.uint16)
+    np.testing.assert_array_equal(rating_config.unpack_sector_masks(bits), masks)
+
+
+def test_stale_after_source_change(source, tmp_path):
+    catalog_dir = str(tmp_path / "catalog")
+    assert catalog_config.is_stale(source, catalog_dir)
+    catalog_config.compile_catalog(source, catalog_dir)
+    assert not catalog_config.is_stale(source, catalog_dir)
+
+    with open(source, 'w', encoding='utf-8') as f:
+        json.dump({'spots': [spot('Supertubos', 39.3430, -9.3640)]}, f)
+    assert catalog_config.is_stale(source, catalog_dir)
+    catalog = catalog_config.load_catalog(source, catalog_dir)
+    assert catalog.spot_ids == ['supertubos']
+
+
+def test_sources_mtimes_notice_edits(source):
+    before = catalog_config.sources_mtimes([source, source + ".missing"])
+    assert before[1] is None
+    os.utime(source, ns=(before[0] + 10**9, before[0] + 10**9))
+    assert catalog_config.sources_mtimes([source]) != before[:1]
+
+
+def test_shards_open_lazily_and_search_like_the_json(source, tmp_path):
+    sharded = catalog_config.load_sharded_catalog([source], str(tmp_path / "shards"))
+    assert sum(shard['count'] for shard in sharded.shards.values()) == 6
+    assert len(sharded.shards) > 1
+    assert not sharded._open
+
+    nearby = sharded.spots_near(*LISBON, radius_km=40)
+    assert [s['name'] for s in nearby] == ['Costa da Caparica', 'Carcavelos', 'Ericeira']
+    # The Algarve shard is never opened by a Lisbon search
+    assert 'Sagres' not in [s['name'] for shard in sharded._open.values() for s in shard.spots]
+
+    candidates = sharded.spots_for_search(*LISBON, radius_km=40, min_spots=4)
+    expected = geo_config.spots_near(candidates, *LISBON, radius_km=40, min_spots=4)
+    assert sharded.spots_near(*LISBON, radius_km=40, min_spots=4) == expected
+
+    assert sharded.prose('ericeira')['access'] == "Parking at Ericeira"
+    profiles = sharded.profiles(['ericeira', 'carcavelos'])
+    assert profiles.spot_ids == ['ericeira', 'carcavelos']
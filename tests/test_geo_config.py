@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from surfmap_config import geo_config
+
+LISBON = (38.7223, -9.1393)
+
+
+def spot(name, lat, lon):
+    return {'name': name, 'latitude': lat, 'longitude': lon}
+
+
+@pytest.fixture
+def spots():
+    return [
+        spot('Carcavelos', 38.6780, -9.3350),     # ~17 km
+        spot('Costa da Caparica', 38.6410, -9.2390),  # ~12 km
+        spot('Ericeira', 38.9630, -9.4170),       # ~36 km
+        spot('Peniche', 39.3560, -9.3810),        # ~73 km
+        spot('Nazaré', 39.6020, -9.0710),         # ~98 km
+        spot('No coordinates', None, 'n/a'),
+    ]
+
+
+def test_haversine_known_distance():
+    # Lisbon - Porto, about 274 km
+    assert float(geo_config.haversine_km(*LISBON, 41.1579, -8.6291)) == pytest.approx(274, abs=3)
+    assert geo_config.haversine_km(LISBON[0], LISBON[1], [LISBON[0]], [LISBON[1]]) == pytest.approx([0.0])
+
+
+def test_spots_within_radius_nearest_first(spots):
+    nearby = geo_config.spots_near(spots, *LISBON, radius_km=40)
+    assert [s['name'] for s in nearby] == ['Costa da Caparica', 'Carcavelos', 'Ericeira']
+    distances = [s['distance_km'] for s in nearby]
+    assert distances == sorted(distances)
+    assert all(distance <= 40 for distance in distances)
+    # Results are copies: the catalog dicts are left untouched
+    assert 'distance_km' not in spots[0]
+
+
+def test_min_spots_falls_back_to_nearest(spots):
+    nearby = geo_config.spots_near(spots, *LISBON, radius_km=5, min_spots=4)
+    assert [s['name'] for s in nearby] == ['Costa da Caparica', 'Carcavelos', 'Ericeira', 'Peniche']
+
+
+def test_spots_without_coordinates_are_never_returned(spots):
+    nearby = geo_config.spots_near(spots, *LISBON, radius_km=20000, min_spots=10)
+    assert len(nearby) == 5
+    assert 'No coordinates' not in [s['name'] for s in nearby]
+
+
+def test_bucketed_search_matches_brute_force():
+    rng = np.random.default_rng(0)
+    lats, lons = rng.uniform(36, 44, 500), rng.uniform(-10, 3, 500)
+    spots = [spot(str(i), lat, lon) for i, (lat, lon) in enumerate(zip(lats, lons))]
+    index = geo_config.SpotIndex(spots)
+    for lat, lon, radius in ((38.7, -9.1, 50), (43.5, -1.5, 120), (40.0, 0.0, 300)):
+        expected = np.flatnonzero(geo_config.haversine_km(lat, lon, lats, lons) <= radius)
+        assert sorted(i for i, _ in index.within_radius(lat, lon, radius)) == sorted(expected.tolist())
+        nearest = index.nearest(lat, lon, 7)
+        assert [i for i, _ in nearest] == np.argsort(geo_config.haversine_km(lat, lon, lats, lons))[:7].tolist()
+
+
+def test_geohash_roundtrip():
+    geohash = geo_config.geohash_encode(*LISBON, precision=6)
+    assert len(geohash) == 6
+    min_lat, min_lon, max_lat, max_lon = geo_config.geohash_bbox(geohash)
+    assert min_lat <= LISBON[0] <= max_lat and min_lon <= LISBON[1] <= max_lon
+    assert geo_config.geohash_encode(*LISBON, precision=3) == geohash[:3]
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from surfmap_config import forecast_config, rating_config
+
+
+def sectors(mask):
+    return [point for point, matches in zip(rating_config.COMPASS_POINTS, mask) if matches]
+
+
+def test_direction_mask_of_a_pair_covers_the_arc_and_tolerance():
+    # E/NE: the NE-E arc widened by one sector on each side
+    assert sectors(rating_config.direction_sector_mask('E/NE')) == ['NNE', 'NE', 'ENE', 'E', 'ESE']
+
+
+def test_direction_mask_of_a_range():
+    assert sectors(rating_config.direction_sector_mask('NW to W')) == ['WSW', 'W', 'WNW', 'NW', 'NNW']
+    assert sectors(rating_config.direction_sector_mask('sw - w', tolerance=0)) == ['SW', 'WSW', 'W']
+
+
+def test_direction_mask_wraps_around_north():
+    # The short way round from NW to NE goes through N
+    assert sectors(rating_config.direction_sector_mask('NW to NE', tolerance=0)) == ['N', 'NNE', 'NE', 'NW', 'NNW']
+    assert sectors(rating_config.direction_sector_mask('N')) == ['N', 'NNE', 'NNW']
+
+
+def test_unparseable_direction_matches_everything():
+    for description in (None, '', 'offshore', 'anything'):
+        assert rating_config.direction_sector_mask(description).all()
+
+
+def test_sector_masks_pack_and_unpack():
+    descriptions = ('E/NE', 'NW to W', 'N', 'NW to NE', None)
+    masks = np.array([rating_config.direction_sector_mask(d) for d in descriptions])
+    bits = [rating_config.pack_sector_mask(mask) for mask in masks]
+    assert bits[-1] == 0xFFFF
+    assert rating_config.pack_sector_mask(rating_config.direction_sector_mask('N', tolerance=0)) == 1
+    np.testing.assert_array_equal(rating_config.unpack_sector_masks(np.array(bits, dtype=np.uint16)), masks)
+    assert rating_config.unpack_sector_masks([]).shape == (0, len(rating_config.COMPASS_POINTS))
+
+
+def spot(name, wind, wind_quality, swell_range, swell_quality, rising_quality):
+    return {
+        'name': name,
+        'wind_compatibility': {'best_direction': wind, 'quality': wind_quality},
+        'swell_compatibility': {'ideal_swell_direction': 'W', 'ideal_swell_size_m': swell_range, 'quality': swell_quality},
+        'tide_behavior': {'low': {'quality': 1}, 'rising': {'quality': rising_quality},
+                          'high': {'quality': 2}, 'falling': {'quality': 3}},
+    }
+
+
+@pytest.mark.parametrize('wind_direction', ['E', 'W'])
+@pytest.mark.parametrize('wave_height', [0.5, 1.5, 3.0])
+def test_score_grid_matches_calculate_spot_rating(wind_direction, wave_height):
+    spots = [
+        spot('Offshore east', 'E/NE', 4, [1, 2], 4, 5),
+        spot('Big wave spot', 'E', 3, [2.5, 6], 5, 2),
+        spot('Westerly', 'W', 2, [0.3, 1], 3, 4),
+    ]
+    profiles = rating_config.SpotProfiles(spots, [s['name'] for s in spots])
+    degrees = rating_config.direction_to_degrees(wind_direction)
+    scores = rating_config.score_grid(profiles, np.full((3, 1), wave_height), np.full((3, 1), degrees))
+
+    for i, s in enumerate(spots):
+        expected = forecast_config.calculate_spot_rating(s, {
+            'wind_direction': wind_direction,
+            'wave_height_m': {'min': wave_height, 'max': wave_height, 'average': wave_height},
+        })
+        # Same weights and penalties, shown out of 10 instead of 5 (rounded after scaling, hence the 0.1)
+        assert scores[i, 0] == pytest.approx(expected * rating_config.SCORE_SCALE, abs=0.1 + 1e-9)
+
+
+def test_score_grid_unknown_inputs():
+    s = spot('Offshore east', 'E/NE', 4, [1, 2], 4, 5)
+    profiles = rating_config.SpotProfiles([s], ['a'])
+    scores = rating_config.score_grid(profiles, [[1.5, np.nan, 1.5]], [[np.nan, 90.0, 270.0]],
+                                      tide_state=[[0, -1, rating_config.TIDE_STATES.index('high')]])
+    # Unknown wind is not penalised, unknown wave height gives no score
+    assert scores[0, 0] == pytest.approx((4 * 0.3 + 4 * 0.4 + 1 * 0.3) * 2)
+    assert np.isnan(scores[0, 1])
+    assert scores[0, 2] == pytest.approx((2 * 0.3 + 4 * 0.4 + 2 * 0.3) * 2)
@@ -0,0 +1,56 @@
+import math
+
+import numpy as np
+import pytest
+
+from surfmap_config import geo_config, travel_config
+
+LISBON = (38.7223, -9.1393)
+
+
+def test_calibrate_detour_factor_is_the_median_ratio():
+    straight = [10.0, 20.0, 40.0]
+    road = [12.0, 30.0, 56.0]  # Ratios 1.2, 1.5, 1.4
+    assert travel_config.calibrate_detour_factor(straight, road) == pytest.approx(1.4)
+
+
+def test_calibrate_detour_factor_ignores_unusable_routes():
+    # Too short, no road distance, NaN: only the 1.6 ratio is usable
+    straight = [1.0, 10.0, 10.0, 25.0]
+    road = [5.0, 0.0, np.nan, 40.0]
+    assert travel_config.calibrate_detour_factor(straight, road) == pytest.approx(1.6)
+
+
+def test_calibrate_detour_factor_defaults_and_bounds():
+    assert travel_config.calibrate_detour_factor([], []) == travel_config.DETOUR_FACTOR
+    assert travel_config.calibrate_detour_factor([1.0], [3.0], default=1.7) == 1.7
+    assert travel_config.calibrate_detour_factor([10.0], [8.0]) == travel_config.MIN_DETOUR_FACTOR
+    assert travel_config.calibrate_detour_factor([10.0], [100.0]) == travel_config.MAX_DETOUR_FACTOR
+
+
+def test_profile_name():
+    assert travel_config.profile_name('Portugal') == 'portugal'
+    assert travel_config.profile_name(' PT ') == 'portugal'
+    assert travel_config.profile_name('España') == 'spain'
+    assert travel_config.profile_name('Morocco') == 'default'
+    assert travel_config.profile_name(None) == 'default'
+
+
+def test_road_duration_drives_each_band_at_its_speed():
+    profile = ((10, 30), (math.inf, 100))
+    hours = travel_config.road_duration_h([5.0, 10.0, 110.0], profile)
+    assert hours == pytest.approx([5 / 30, 10 / 30, 10 / 30 + 1.0])
+
+
+def test_estimate_travel():
+    lats, lons = [38.9630, np.nan], [-9.4170, -9.0]
+    road_km, hours = travel_config.estimate_travel(*LISBON, lats, lons, ['Portugal', 'Portugal'], detour_factor=1.5)
+    straight_km = float(geo_config.haversine_km(*LISBON, lats[0], lons[0]))
+    assert road_km[0] == pytest.approx(straight_km * 1.5)
+    assert hours[0] == pytest.approx(float(travel_config.road_duration_h(road_km[0], travel_config.SPEED_PROFILES['portugal'])))
+    # No coordinates: no estimate
+    assert np.isnan(road_km[1]) and np.isnan(hours[1])
+
+    # Without regions every destination uses the default profile
+    _, default_hours = travel_config.estimate_travel(*LISBON, lats[:1], lons[:1], detour_factor=1.5)
+    assert default_hours[0] == pytest.approx(float(travel_config.road_duration_h(road_km[0], travel_config.SPEED_PROFILES['default'])))